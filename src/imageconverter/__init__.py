@@ -1,3 +1,17 @@
 """ImageConverter - Cross-platform batch image conversion tool."""
 
+from typing import Any
+
 __version__ = "0.1.0"
+
+__all__ = ["ConversionError", "convert_bytes", "convert_iter"]
+
+
+def __getattr__(name: str) -> Any:
+    # The public API lives in core.converter, which imports Pillow; load it
+    # on first use so importing the package (e.g. for the CLI) stays cheap
+    if name in __all__:
+        from .core import converter
+
+        return getattr(converter, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
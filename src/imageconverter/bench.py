@@ -0,0 +1,542 @@
+"""Benchmark suite for ImageConverter.
+
+Generates a reproducible synthetic corpus, times the main pipeline stages
+and writes a JSON report that can be compared against a saved baseline.
+"""
+
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import click
+from PIL import Image, ImageDraw, ImageFilter
+from rich.console import Console
+
+from .core import plugins
+from .core.animation import ANIMATED_FORMATS
+from .core.converter import ImageConverter, OutputTarget
+from .core.processor import BatchProcessor
+from .core.validator import is_valid_image
+
+console = Console(stderr=True)
+
+# Corpus recipe: kind -> (count, width, height) at scale 1.0
+CORPUS_SPEC = {
+    "photo": (8, 1600, 1200),
+    "graphic": (8, 1200, 800),
+    "alpha": (6, 1024, 768),
+    "palette": (6, 640, 480),
+    "large_tiff": (2, 6000, 4000),
+    "animated": (2, 480, 360),
+}
+
+# Frames per animated GIF (not scaled), and how many consecutive frames show
+# the same picture. Repeats are stored as frames that are partly transparent
+# over the previous one, as screen recorders write them, so they stay
+# separate frames in the file but decode identically
+ANIMATION_FRAMES = 240
+ANIMATION_HOLD = 2
+
+# Module imported by "imgconvert --help"; its import time is the CLI start-up cost
+STARTUP_MODULE = "imageconverter.cli"
+
+# Modules that must not be imported just to parse arguments
+DEFERRED_MODULES = ("PIL.Image", "rich.progress", "pillow_heif", "pillow_jxl")
+
+# Stage metrics compared against a baseline: (key, higher_is_better)
+COMPARED_METRICS = (("images_per_s", True), ("p50_ms", False))
+
+
+def _photo(rng: random.Random, width: int, height: int) -> Image.Image:
+    """Smooth low-frequency colour field with fine grain, like a photo."""
+    base = Image.frombytes("RGB", (16, 12), rng.randbytes(16 * 12 * 3))
+    base = base.resize((width, height), Image.Resampling.BICUBIC)
+    grain = Image.frombytes("L", (width, height), rng.randbytes(width * height))
+    grain = grain.filter(ImageFilter.GaussianBlur(1)).convert("RGB")
+    return Image.blend(base, grain, 0.15)
+
+
+def _graphic(rng: random.Random, width: int, height: int, mode: str = "RGB") -> Image.Image:
+    """Flat-colour shapes, like UI graphics or diagrams."""
+    img = Image.new(mode, (width, height), (255, 255, 255, 0) if mode == "RGBA" else "white")
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        # Shapes are at least 20 px even on tiny (heavily scaled-down) images
+        box = (
+            x0, y0,
+            x0 + rng.randrange(20, max(21, width // 2)),
+            y0 + rng.randrange(20, max(21, height // 2)),
+        )
+        fill = tuple(rng.randrange(256) for _ in range(3)) + (rng.randrange(64, 256),)
+        if rng.random() < 0.5:
+            draw.rectangle(box, fill=fill)
+        else:
+            draw.ellipse(box, fill=fill)
+    return img
+
+
+def _animation(rng: random.Random, width: int, height: int) -> List[Image.Image]:
+    """Frames of a sprite moving over a graphic, like a sticker or screen capture."""
+    background = _graphic(rng, width, height)
+    size = max(8, min(width, height) // 5)
+    frames: List[Image.Image] = []
+    for idx in range(ANIMATION_FRAMES):
+        if idx % ANIMATION_HOLD:
+            colors = len(frames[-1].getpalette()) // 3
+            repeat = frames[-1].remap_palette(list(reversed(range(colors))))
+            repeat.info["transparency"] = repeat.getpixel((0, 0))
+            frames.append(repeat)
+            continue
+        frame = background.copy()
+        x = (idx * 4) % max(1, width - size)
+        y = round((height - size) / 2 * (1 + math.sin(idx / 10)))
+        ImageDraw.Draw(frame).ellipse((x, y, x + size, y + size), fill=(220, 40, 40))
+        frames.append(frame.quantize(64))
+    return frames
+
+
+def generate_corpus(root: Path, seed: int = 0, scale: float = 1.0) -> List[Path]:
+    """Generate a reproducible synthetic image corpus.
+
+    The same seed and scale always produce the same pixels.
+
+    Args:
+        root: Directory to write the corpus into
+        seed: Random seed
+        scale: Multiplier applied to image counts and dimensions
+
+    Returns:
+        Paths of the generated images
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    paths = []
+
+    for kind, (count, width, height) in CORPUS_SPEC.items():
+        count = max(1, round(count * scale))
+        width, height = max(16, round(width * scale)), max(16, round(height * scale))
+        for idx in range(count):
+            if kind == "photo":
+                path = root / f"{kind}_{idx:03d}.jpg"
+                _photo(rng, width, height).save(path, quality=92)
+            elif kind == "graphic":
+                path = root / f"{kind}_{idx:03d}.png"
+                _graphic(rng, width, height).save(path)
+            elif kind == "alpha":
+                path = root / f"{kind}_{idx:03d}.png"
+                _graphic(rng, width, height, mode="RGBA").save(path)
+            elif kind == "palette":
+                path = root / f"{kind}_{idx:03d}.gif"
+                _graphic(rng, width, height).quantize(64).save(path)
+            elif kind == "animated":
+                path = root / f"{kind}_{idx:03d}.gif"
+                frames = _animation(rng, width, height)
+                frames[0].save(
+                    path, save_all=True, append_images=frames[1:],
+                    duration=40, loop=0, disposal=1,
+                )
+            else:
+                path = root / f"{kind}_{idx:03d}.tif"
+                _photo(rng, width, height).save(path, compression="tiff_lzw")
+            paths.append(path)
+
+    return paths
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def _summarize(
+    latencies: List[float],
+    megapixels: float,
+    bytes_out: int | None = None,
+    images: int | None = None,
+) -> Dict[str, Any]:
+    """Build a stage entry from per-item latencies in seconds.
+
+    images overrides the image count used for throughput when one timed
+    item covers many images (e.g. a whole directory walk).
+    """
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    images = len(ordered) if images is None else images
+    stage = {
+        "items": len(ordered),
+        "seconds": round(total, 6),
+        "images_per_s": round(images / total, 3) if total else 0.0,
+        "mp_per_s": round(megapixels / total, 3) if total else 0.0,
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+        "p90_ms": round(_percentile(ordered, 90) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 3),
+    }
+    if bytes_out is not None:
+        stage["bytes_out"] = bytes_out
+    return stage
+
+
+def _time_each(items: List[Any], fn: Callable[[Any], Any], repeat: int) -> List[float]:
+    """Time fn(item) for every item, keeping the best of `repeat` runs each."""
+    latencies = []
+    for item in items:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(item)
+            best = min(best, time.perf_counter() - start)
+        latencies.append(best)
+    return latencies
+
+
+def _package_version(name: str) -> str | None:
+    """Installed version of a distribution, or None if it is not installed."""
+    try:
+        return importlib_metadata.version(name)
+    except importlib_metadata.PackageNotFoundError:
+        return None
+
+
+def measure_startup(repeat: int = 5) -> Dict[str, Any]:
+    """Time CLI start-up in fresh interpreters.
+
+    Args:
+        repeat: Interpreter launches per measurement
+
+    Returns:
+        Stages "startup.import" (cumulative -X importtime of the CLI module)
+        and "startup.help" (wall time of "imgconvert --help"), plus
+        "deferred_imported": DEFERRED_MODULES that the import pulled in
+    """
+    import_times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {STARTUP_MODULE}"],
+            capture_output=True, text=True, check=True,
+        )
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == STARTUP_MODULE:
+                import_times.append(int(fields[1]) / 1e6)
+
+    help_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", STARTUP_MODULE, "--help"], capture_output=True, check=True
+        )
+        help_times.append(time.perf_counter() - start)
+
+    probe = subprocess.run(
+        [
+            sys.executable, "-c",
+            f"import sys, {STARTUP_MODULE}; "
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))",
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    return {
+        "stages": {
+            "startup.import": _summarize(import_times, 0.0),
+            "startup.help": _summarize(help_times, 0.0),
+        },
+        "deferred_imported": [name for name in probe.stdout.strip().split(",") if name],
+    }
+
+
+def run_benchmarks(
+    corpus_dir: Path,
+    formats: List[str],
+    worker_counts: List[int],
+    repeat: int = 3,
+) -> Dict[str, Any]:
+    """Time discovery, validation, encoding and batch processing on a corpus.
+
+    Args:
+        corpus_dir: Directory holding the corpus
+        formats: Output formats to time
+        worker_counts: Worker counts to run process_batch() with
+        repeat: Runs per measurement (the fastest is kept)
+
+    Returns:
+        Benchmark report
+    """
+    processor = BatchProcessor(workers=1)
+    converter = ImageConverter()
+    stages: Dict[str, Any] = {}
+
+    # Discovery: the whole walk is one item
+    images = processor.discover_images(corpus_dir)
+    megapixels = 0.0
+    for path in images:
+        with Image.open(path) as img:
+            megapixels += img.width * img.height / 1e6
+    stages["discover_images"] = _summarize(
+        _time_each([corpus_dir], processor.discover_images, repeat),
+        megapixels,
+        images=len(images),
+    )
+
+    # Validation, full verify() and header-only sniffing
+    stages["is_valid_image.verify"] = _summarize(
+        _time_each(images, is_valid_image, repeat), megapixels
+    )
+    stages["is_valid_image.header"] = _summarize(
+        _time_each(images, lambda path: is_valid_image(path, verify=False), repeat),
+        megapixels,
+    )
+
+    # Encoding, one stage per _get_save_kwargs() format path
+    decoded = []
+    for path in images:
+        with Image.open(path) as img:
+            img.load()
+            decoded.append(img.copy())
+    for fmt in formats:
+        plugins.ensure_format(fmt)
+        pil_format = ImageConverter.SUPPORTED_FORMATS[fmt]
+        save_kwargs = converter._get_save_kwargs(fmt, 85, False)
+        bytes_out = 0
+
+        def encode(img: Image.Image) -> None:
+            nonlocal bytes_out
+            if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            buffer = io.BytesIO()
+            img.save(buffer, format=pil_format, **save_kwargs)
+            bytes_out += buffer.tell()
+
+        try:
+            latencies = _time_each(decoded, encode, repeat)
+        except (KeyError, OSError, ValueError) as e:
+            stages[f"encode.{fmt}"] = {"unavailable": str(e)}
+            continue
+        stages[f"encode.{fmt}"] = _summarize(latencies, megapixels, bytes_out // repeat)
+
+    # Animations: whole conversions (frame scan and dedup, then encode) of
+    # each multi-frame input, to each format that keeps the frames
+    animations: Dict[Path, int] = {}
+    frame_megapixels = 0.0
+    for path in images:
+        with Image.open(path) as img:
+            if getattr(img, "is_animated", False):
+                animations[path] = img.n_frames
+                frame_megapixels += img.width * img.height * img.n_frames / 1e6
+    for fmt in formats:
+        if fmt not in ANIMATED_FORMATS or not animations:
+            continue
+        bytes_out = 0
+        kept = 0
+
+        def convert(path: Path) -> None:
+            nonlocal bytes_out, kept
+            record = converter.convert_multi(path, [OutputTarget(fmt, None)])
+            if not record["success"]:
+                raise OSError(record["message"])
+            bytes_out += record["outputs"][0]["output_bytes"]
+            kept += record["animation"]["kept"]
+
+        try:
+            latencies = _time_each(list(animations), convert, repeat)
+        except OSError as e:
+            stages[f"animation.{fmt}"] = {"unavailable": str(e)}
+            continue
+        stage = _summarize(latencies, frame_megapixels, bytes_out // repeat)
+        stage["frames"] = sum(animations.values())
+        stage["frames_kept"] = kept // repeat
+        stage["frames_per_s"] = round(stage["frames"] / stage["seconds"], 3)
+        stages[f"animation.{fmt}"] = stage
+
+    # End-to-end batches at each worker count
+    for workers in worker_counts:
+        output_dir = Path(tempfile.mkdtemp(prefix="imgconvert-bench-"))
+        try:
+            start = time.perf_counter()
+            results = BatchProcessor(workers=workers).process_batch(
+                images, {"format": formats[0], "output_dir": str(output_dir)}
+            )
+            elapsed = time.perf_counter() - start
+            bytes_out = sum(f.stat().st_size for f in output_dir.iterdir())
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        stages[f"process_batch.workers_{workers}"] = {
+            "items": results["total"],
+            "failures": results["failures"],
+            "seconds": round(elapsed, 6),
+            "images_per_s": round(results["total"] / elapsed, 3),
+            "mp_per_s": round(megapixels / elapsed, 3),
+            "bytes_out": bytes_out,
+        }
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pillow": _package_version("pillow"),
+            "pillow-heif": _package_version("pillow-heif"),
+            "pillow-jxl-plugin": _package_version("pillow-jxl-plugin"),
+        },
+        "corpus": {
+            "images": len(images),
+            "megapixels": round(megapixels, 3),
+            "bytes": sum(path.stat().st_size for path in images),
+        },
+        "stages": stages,
+    }
+
+
+def compare_reports(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> List[str]:
+    """Find stages that got slower than a baseline by more than a threshold.
+
+    Args:
+        current: Report from run_benchmarks()
+        baseline: Previously saved report
+        threshold: Allowed slowdown in percent
+
+    Returns:
+        Human-readable description of each regression
+    """
+    regressions = []
+    for name, stage in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            continue
+        for key, higher_is_better in COMPARED_METRICS:
+            if not stage.get(key) or not base.get(key):
+                continue
+            change = (stage[key] - base[key]) / base[key] * 100
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(
+                    f"{name}: {key} {base[key]} -> {stage[key]} ({change:+.1f}%)"
+                )
+    return regressions
+
+
+def _parse_int_list(value: str) -> List[int]:
+    """Parse a comma-separated list of positive integers."""
+    try:
+        numbers = [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise click.BadParameter(f"expected comma-separated integers, got {value!r}")
+    if not numbers or any(n <= 0 for n in numbers):
+        raise click.BadParameter("values must be positive")
+    return numbers
+
+
+@click.command()
+@click.option("--corpus", type=click.Path(file_okay=False), help="Corpus directory (generated if empty)")
+@click.option("--seed", default=0, type=int, help="Random seed for the synthetic corpus")
+@click.option("--scale", default=0.5, type=float, help="Corpus size multiplier")
+@click.option("--formats", default="webp,jpeg,png,avif,jpeg-xl", help="Formats to time")
+@click.option(
+    "--workers", "worker_counts", default=None,
+    help="Comma-separated worker counts for process_batch (default 1,2,4,... up to CPUs)",
+)
+@click.option("--repeat", default=3, type=int, help="Runs per measurement (fastest kept)")
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the JSON report here")
+@click.option("--compare", type=click.Path(exists=True, dir_okay=False), help="Baseline report")
+@click.option("--threshold", default=10.0, type=float, help="Allowed slowdown in percent")
+@click.option(
+    "--startup-budget", type=float, metavar="MS",
+    help="Fail if median 'imgconvert --help' start-up exceeds this, or if it imports "
+    "Pillow, rich.progress or a format plugin",
+)
+@click.option("--startup-only", is_flag=True, help="Only measure CLI start-up (no corpus)")
+def main(
+    corpus: str | None,
+    seed: int,
+    scale: float,
+    formats: str,
+    worker_counts: str | None,
+    repeat: int,
+    output: str | None,
+    compare: str | None,
+    threshold: float,
+    startup_budget: float | None,
+    startup_only: bool,
+) -> None:
+    """Benchmark ImageConverter on a synthetic corpus.
+
+    Exits with status 1 if --compare finds a regression beyond --threshold,
+    or if start-up exceeds --startup-budget.
+    """
+    if worker_counts:
+        counts = _parse_int_list(worker_counts)
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= (os.cpu_count() or 1):
+            counts.append(counts[-1] * 2)
+    format_list = [fmt.strip() for fmt in formats.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in format_list if fmt not in ImageConverter.SUPPORTED_FORMATS]
+    if unknown:
+        raise click.BadParameter(f"unsupported format(s): {', '.join(unknown)}")
+
+    console.print("[cyan]Measuring start-up...[/cyan]")
+    startup = measure_startup()
+    if startup_only:
+        report = {"stages": {}}
+    else:
+        with tempfile.TemporaryDirectory(prefix="imgconvert-corpus-") as scratch:
+            corpus_dir = Path(corpus) if corpus else Path(scratch)
+            if not corpus_dir.exists() or not any(corpus_dir.iterdir()):
+                console.print(f"[cyan]Generating corpus in {corpus_dir} (seed {seed})...[/cyan]")
+                generate_corpus(corpus_dir, seed=seed, scale=scale)
+
+            console.print("[cyan]Running benchmarks...[/cyan]")
+            report = run_benchmarks(corpus_dir, format_list, counts, repeat=repeat)
+            report["corpus"].update(seed=seed, scale=scale)
+    report["stages"].update(startup["stages"])
+    report["startup_deferred_imported"] = startup["deferred_imported"]
+
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).write_text(text)
+        console.print(f"[green]Report written to {output}[/green]")
+    else:
+        click.echo(text)
+
+    if compare:
+        baseline = json.loads(Path(compare).read_text())
+        regressions = compare_reports(report, baseline, threshold)
+        if regressions:
+            console.print(f"[red]{len(regressions)} regression(s) beyond {threshold}%:[/red]")
+            for regression in regressions:
+                console.print(f"  {regression}")
+            sys.exit(1)
+        console.print(f"[green]No regressions beyond {threshold}%[/green]")
+
+    if startup_budget is not None:
+        help_ms = report["stages"]["startup.help"]["p50_ms"]
+        problems = []
+        if help_ms > startup_budget:
+            problems.append(f"start-up took {help_ms:.0f} ms (budget {startup_budget:.0f} ms)")
+        if startup["deferred_imported"]:
+            problems.append(f"start-up imports {', '.join(startup['deferred_imported'])}")
+        if problems:
+            for problem in problems:
+                console.print(f"[red]{problem}[/red]")
+            sys.exit(1)
+        console.print(f"[green]Start-up {help_ms:.0f} ms, within {startup_budget:.0f} ms[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,298 @@
-"""CLI interface for ImageConverter."""
+"""CLI interface for ImageConverter.
+
+Only what argument parsing needs is imported at module level; the core
+package, Pillow and rich.progress are imported inside the commands so
+"imgconvert --help" and short runs start quickly.
+"""
+
+import json
 
 import click
 from pathlib import Path
-from rich.console import Console
-from rich.progress import (
-    Progress,
-    SpinnerColumn,
-    TextColumn,
-    BarColumn,
-    TimeRemainingColumn,
-)
+from typing import Any
+
+from .core.config import EFFORT_LEVELS, Config
+from .utils.memory import parse_size
+
+
+class _LazyConsole:
+    """Stand-in for a rich Console that imports rich on first use."""
+
+    _console = None
+
+    def get(self) -> Any:
+        """Get the underlying rich Console, creating it if needed."""
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console()
+        return self._console
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+
+console = _LazyConsole()
+
+
+class DefaultCommandGroup(click.Group):
+    """Command group that falls back to a default command.
+
+    Keeps "imgconvert INPUT_DIR [OPTIONS]" working alongside named
+    subcommands such as "imgconvert prune-cache".
+    """
+
+    default_command = "convert"
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args.insert(0, self.default_command)
+        return super().parse_args(ctx, args)
+
 
-from .core.processor import BatchProcessor
+def _parse_sizes(value: str | None) -> list[int] | None:
+    """Parse the --sizes option into a list of positive widths."""
+    if not value:
+        return None
+    try:
+        sizes = [int(width) for width in value.split(",") if width.strip()]
+    except ValueError:
+        raise click.BadParameter(f"expected comma-separated widths, got {value!r}")
+    if any(width <= 0 for width in sizes):
+        raise click.BadParameter("widths must be positive")
+    return sizes
 
-console = Console()
 
+def _parse_memory(value: str | None) -> int | None:
+    """Parse a size option (--max-memory, --target-size) into bytes."""
+    if not value:
+        return None
+    try:
+        return parse_size(value)
+    except ValueError:
+        raise click.BadParameter(f"expected a size such as 512M or 8G, got {value!r}")
 
-@click.command()
+
+def _parse_shard(value: str | None) -> tuple[int, int] | None:
+    """Parse the --shard option ("i/N", 1-based) into (index, count), 0-based."""
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise click.BadParameter(f"expected i/N such as 2/8, got {value!r}")
+    if not 1 <= index <= count:
+        raise click.BadParameter(f"shard must be between 1/{count} and {count}/{count}")
+    return index - 1, count
+
+
+@click.group(cls=DefaultCommandGroup)
+def main() -> None:
+    """Convert images to modern formats.
+
+    Run "imgconvert INPUT_DIR [OPTIONS]" to convert a folder (shorthand
+    for "imgconvert convert INPUT_DIR [OPTIONS]").
+    """
+
+
+@main.command()
 @click.argument("input_dir", type=click.Path(exists=True))
-@click.option("--format", default="webp", help="Output format (webp, jpeg, jpeg-xl, avif, png)")
+@click.option(
+    "--format", default="webp",
+    help="Output format(s), comma-separated (webp, jpeg, jpeg-xl, avif, png)",
+)
 @click.option("--quality", default=85, type=int, help="Quality setting (0-100)")
 @click.option("--lossless", is_flag=True, help="Use lossless compression")
+@click.option(
+    "--effort", type=click.Choice(EFFORT_LEVELS),
+    help="Encoder speed/size trade-off (default: the calibrated setting, else balanced)",
+)
+@click.option(
+    "--target-size", callback=lambda ctx, param, value: _parse_memory(value),
+    help="Instead of --quality, use the highest quality whose output fits this size, e.g. 200K",
+)
+@click.option(
+    "--target-ssim", type=click.FloatRange(0, 1, min_open=True),
+    help="Instead of --quality, use the lowest quality reaching this SSIM, e.g. 0.98 "
+    "(requires NumPy); with --target-size the size cap wins and the SSIM may be missed",
+)
 @click.option("--recursive/--no-recursive", default=True, help="Scan subfolders recursively")
 @click.option("--output", type=click.Path(), help="Output directory")
-@click.option("--workers", type=int, help="Number of worker threads")
+@click.option(
+    "--output-archive", type=click.Path(dir_okay=False),
+    help="Stream outputs into this .zip or .tar[.gz|.bz2|.xz] instead of an output directory",
+)
+@click.option("--workers", type=int, help="Number of worker processes")
+@click.option(
+    "--max-memory", callback=lambda ctx, param, value: _parse_memory(value),
+    help="Memory budget for conversions in flight, e.g. 6G (images over it run alone)",
+)
 @click.option("--dry-run", is_flag=True, help="Preview without converting")
 @click.option("--verbose", is_flag=True, help="Verbose output")
-@click.option("--filename-pattern", help="Filename pattern template")
-def main(
+@click.option(
+    "--filename-pattern",
+    help="Output filename template: {stem}, {parent}, {w}x{h}, {hash8}, e.g. {parent}_{stem}",
+)
+@click.option(
+    "--mirror", is_flag=True, help="Recreate the input subfolder structure in the output directory"
+)
+@click.option(
+    "--sizes", callback=lambda ctx, param, value: _parse_sizes(value),
+    help="Comma-separated output widths, e.g. 320,640,1280 (replaces full-size output)",
+)
+@click.option(
+    "--incremental", is_flag=True,
+    help="Skip inputs unchanged since their last conversion with the same options",
+)
+@click.option(
+    "--color-profile", "color_target", metavar="TARGET",
+    help="Convert embedded ICC profiles (Display P3, Adobe RGB, ...) to TARGET: "
+    "srgb or the path of an .icc file",
+)
+@click.option(
+    "--dedup", type=click.Choice(["link", "copy"]),
+    help="Convert byte-identical inputs once and hard-link (link) or copy (copy) "
+    "the outputs for the duplicates",
+)
+@click.option(
+    "--passthrough", type=click.Choice(["link", "copy"]),
+    help="Keep inputs already in the output format and size instead of re-encoding them: "
+    "link (hard link, else reflink or copy) or copy (reflink or copy)",
+)
+@click.option(
+    "--reencode-threshold", type=click.FloatRange(0, 100), metavar="PCT",
+    help="With --passthrough, re-encode such inputs anyway when that makes them "
+    "more than PCT percent smaller",
+)
+@click.option(
+    "--shard", callback=lambda ctx, param, value: _parse_shard(value),
+    help="Convert only shard i of N (e.g. 2/8) when splitting a batch across machines",
+)
+@click.option(
+    "--balance-shards", is_flag=True,
+    help="Balance shards by image size instead of path hash (all nodes must see the same files)",
+)
+@click.option(
+    "--watch", is_flag=True,
+    help="Keep running and convert images as they are added to or changed in INPUT_DIR",
+)
+@click.option(
+    "--poll-interval", type=float, default=1.0, show_default=True,
+    help="Seconds between scans in --watch mode",
+)
+@click.option(
+    "--settle", type=float, default=2.0, show_default=True,
+    help="Seconds a file must stay unchanged before --watch converts it",
+)
+@click.option(
+    "--stats-file", type=click.Path(dir_okay=False),
+    help="In --watch mode, keep this JSON file updated with throughput and queue counters",
+)
+@click.option(
+    "--journal", type=click.Path(dir_okay=False),
+    help="Append each finished file to this journal so an interrupted run can resume",
+)
+@click.option("--resume", is_flag=True, help="Skip files the --journal lists as converted")
+@click.option(
+    "--fsync", is_flag=True,
+    help="Flush each output to disk before moving it into place (slower, survives power loss)",
+)
+@click.option(
+    "--report", type=click.Path(dir_okay=False),
+    help="Write per-stage timings to a JSON report (.jsonl streams one line per file)",
+)
+@click.option(
+    "--profile", type=click.Path(file_okay=False), envvar="IMAGECONVERTER_PROFILE",
+    help="Profile the run, writing main and per-worker profiles to this directory",
+)
+@click.option(
+    "--profiler", type=click.Choice(["cprofile", "pyinstrument"]), default="cprofile",
+    help="Profiler for the main process (workers always use cProfile)",
+)
+def convert(
     input_dir: str,
     format: str,
     quality: int,
     lossless: bool,
+    effort: str | None,
+    target_size: int | None,
+    target_ssim: float | None,
     recursive: bool,
     output: str | None,
+    output_archive: str | None,
     workers: int | None,
+    max_memory: int | None,
     dry_run: bool,
     verbose: bool,
     filename_pattern: str | None,
+    mirror: bool,
+    sizes: list[int] | None,
+    incremental: bool,
+    color_target: str | None,
+    dedup: str | None,
+    passthrough: str | None,
+    reencode_threshold: float | None,
+    shard: tuple[int, int] | None,
+    balance_shards: bool,
+    watch: bool,
+    poll_interval: float,
+    settle: float,
+    stats_file: str | None,
+    journal: str | None,
+    resume: bool,
+    fsync: bool,
+    report: str | None,
+    profile: str | None,
+    profiler: str,
 ) -> None:
     """Convert PNG images to modern formats.
 
-    INPUT_DIR: Directory containing PNG images to convert
+    INPUT_DIR: Directory containing PNG images to convert, or a .zip or
+    .tar[.gz|.bz2|.xz] archive of them (read without extracting)
     """
     console.print("[bold green]ImageConverter CLI[/bold green]")
     console.print(f"Input directory: {input_dir}")
     console.print(f"Format: {format}")
     console.print(f"Quality: {quality}")
+    effort = effort or Config.load().effort
+    console.print(f"Effort: {effort}")
 
-    # Set up processor
-    processor = BatchProcessor(workers=workers)
-
-    # Discover images
-    console.print(f"[cyan]Scanning {input_dir}...[/cyan]")
-    input_path = Path(input_dir)
-    images = processor.discover_images(input_path, recursive=recursive)
+    from rich.progress import (
+        Progress,
+        SpinnerColumn,
+        TextColumn,
+        BarColumn,
+        TimeRemainingColumn,
+    )
 
-    if not images:
-        console.print("[yellow]No images found[/yellow]")
-        return
+    from .core.archive import archive_image_names, archive_kind, is_archive, iter_archive_images
+    from .core.processor import BatchProcessor
+    from .utils.instrument import RunReport, profile_run
+    from .utils.journal import Journal, summarize_journal
+    from .utils.paths import OutputPathAllocator
 
-    console.print(f"[green]Found {len(images)} images[/green]")
+    # Set up processor
+    processor = BatchProcessor(workers=workers, max_memory=max_memory)
+    input_path = Path(input_dir)
+    archive_input = is_archive(input_path)
+    if archive_input and (incremental or passthrough or dedup or shard or watch):
+        raise click.UsageError(
+            "An archive input cannot be combined with --incremental, --passthrough, "
+            "--dedup, --shard or --watch"
+        )
+    if output_archive:
+        if output:
+            raise click.UsageError("--output-archive replaces --output")
+        if incremental or passthrough or dedup or watch or resume:
+            raise click.UsageError(
+                "--output-archive cannot be combined with --incremental, --passthrough, "
+                "--dedup, --watch or --resume"
+            )
+        if archive_kind(Path(output_archive)) is None:
+            raise click.BadParameter(
+                "expected a .zip, .tar, .tar.gz, .tar.bz2 or .tar.xz file",
+                param_hint="--output-archive",
+            )
 
     # Set up output directory
     if output:
@@ -68,25 +300,116 @@ def main(
     else:
         output_path = Path.home() / "Downloads" / "ImageConverter_Output"
 
-    output_path.mkdir(parents=True, exist_ok=True)
-
-    if dry_run:
-        console.print("[yellow]DRY RUN - No files will be converted[/yellow]")
-        for img in images[:10]:  # Show first 10
-            console.print(f"  {img.name}")
-        if len(images) > 10:
-            console.print(f"  ... and {len(images) - 10} more")
-        return
+    if not output_archive:
+        output_path.mkdir(parents=True, exist_ok=True)
 
-    # Process with progress bar
+    # Processing options
     options = {
         "format": format,
         "quality": quality,
         "lossless": lossless,
+        "effort": effort,
         "output_dir": str(output_path),
     }
     if filename_pattern:
+        try:
+            OutputPathAllocator(output_path, filename_pattern)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--filename-pattern")
         options["filename_pattern"] = filename_pattern
+    if mirror:
+        options["mirror_root"] = str(input_path.resolve())
+    if sizes:
+        options["sizes"] = sizes
+    if incremental:
+        options["incremental"] = True
+    if color_target:
+        from .utils.color import load_target_profile
+
+        try:
+            load_target_profile(color_target)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--color-profile")
+        options["color_target"] = color_target
+    if (target_size or target_ssim) and lossless:
+        raise click.UsageError("--target-size and --target-ssim apply to lossy encoding only")
+    if target_size:
+        options["target_size"] = target_size
+    if target_ssim:
+        from .core.search import ssim_available
+
+        if not ssim_available():
+            raise click.UsageError("--target-ssim requires NumPy (pip install imageconverter[quality])")
+        options["target_ssim"] = target_ssim
+    if dedup:
+        options["dedup"] = dedup
+    if reencode_threshold is not None and not passthrough:
+        raise click.UsageError("--reencode-threshold requires --passthrough")
+    if passthrough:
+        options["passthrough"] = passthrough
+        if reencode_threshold is not None:
+            options["reencode_threshold"] = reencode_threshold
+    if output_archive:
+        options["output_archive"] = output_archive
+    if fsync:
+        options["fsync"] = True
+    profile_dir = Path(profile).resolve() if profile else None
+    if profile_dir:
+        options["profile_dir"] = str(profile_dir)
+    if watch:
+        if shard or journal or dry_run or dedup or max_memory:
+            raise click.UsageError(
+                "--watch cannot be combined with --shard, --journal, --dry-run, --dedup "
+                "or --max-memory"
+            )
+        _watch(input_path, options, workers, recursive, poll_interval, settle, stats_file)
+        return
+
+    # Discover images. An archive's members are streamed to the workers
+    # during the run; only a zip can be listed up front without reading it
+    if archive_input:
+        console.print(f"[cyan]Reading {input_dir}...[/cyan]")
+        try:
+            names = archive_image_names(input_path, recursive, scan=dry_run)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        images = iter_archive_images(input_path, recursive)
+    else:
+        console.print(f"[cyan]Scanning {input_dir}...[/cyan]")
+        images = processor.discover_images(input_path, recursive=recursive)
+        names = [img.name for img in images]
+
+    if names is not None:
+        if not names:
+            console.print("[yellow]No images found[/yellow]")
+            return
+        console.print(f"[green]Found {len(names)} images[/green]")
+
+    if shard:
+        index, count = shard
+        found = len(images)
+        images = processor.shard_images(images, input_path, index, count, balance_shards)
+        names = [img.name for img in images]
+        console.print(f"Shard {index + 1}/{count}: {len(images)} of {found} images")
+        if not images:
+            return
+
+    if dry_run:
+        console.print("[yellow]DRY RUN - No files will be converted[/yellow]")
+        for name in names[:10]:  # Show first 10
+            console.print(f"  {name}")
+        if len(names) > 10:
+            console.print(f"  ... and {len(names) - 10} more")
+        return
+
+    # Process with progress bar
+    run_report = RunReport(Path(report)) if report else None
+    if resume and not journal:
+        raise click.UsageError("--resume requires --journal")
+    try:
+        run_journal = Journal(Path(journal), options, resume=resume) if journal else None
+    except ValueError as e:
+        raise click.UsageError(str(e))
 
     with Progress(
         SpinnerColumn(),
@@ -94,29 +417,361 @@ def main(
         BarColumn(),
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
         TimeRemainingColumn(),
-        console=console,
+        console=console.get(),
     ) as progress:
-        task = progress.add_task("[cyan]Converting images...", total=len(images))
+        task = progress.add_task(
+            "[cyan]Converting images...", total=len(names) if names is not None else None
+        )
 
         def update_progress(current: int, total: int, filename: str = "") -> None:
             progress.update(
                 task, completed=current, description=f"[cyan]Converting {filename}"
             )
 
-        results = processor.process_batch(images, options, update_progress)
+        with profile_run(profile_dir, profiler):
+            try:
+                results = processor.process_batch(
+                    images, options, update_progress, run_report, run_journal
+                )
+            except ValueError as e:
+                # An archive that turns out to be corrupt partway through
+                raise click.ClickException(str(e))
+            finally:
+                if run_journal:
+                    run_journal.close()
+
+    if run_report:
+        run_report.close(results)
 
     # Show summary
     console.print(f"\n[bold green]Conversion Complete![/bold green]")
     console.print(f"Total: {results['total']}")
     console.print(f"[green]Successful: {results['successes']}[/green]")
     console.print(f"[red]Failed: {results['failures']}[/red]")
+    if len(results["formats"]) > 1:
+        for fmt, counts in results["formats"].items():
+            console.print(
+                f"  {fmt}: {counts['successes']} converted, {counts['failures']} failed"
+            )
+    if results.get("peak_rss"):
+        peak = max((rss for rss in results["peak_rss"].values() if rss), default=0)
+        console.print(f"Largest per-image peak RSS: {peak / 1024 ** 2:.0f} MiB")
+    if "passthrough" in results:
+        kept = results["passthrough"]
+        console.print(
+            f"Passed through: {kept['kept']} ({kept['bytes_kept'] / 1024 ** 2:.1f} MiB), "
+            f"re-encoded instead: {kept['reencoded']}"
+        )
+    if "dedup" in results:
+        saved = results["dedup"]
+        console.print(
+            f"Duplicates: {saved['duplicates']} linked, not converted "
+            f"({saved['bytes_saved'] / 1024 ** 2:.1f} MiB of input, "
+            f"{saved['cpu_seconds_saved']:.1f} CPU-s saved)"
+        )
+    if "archive" in results:
+        archive = results["archive"]
+        console.print(
+            f"Archive: {archive['members']} files ({archive['bytes'] / 1024 ** 2:.1f} MiB) "
+            f"written to {archive['path']}"
+        )
+    if "animation" in results:
+        animation = results["animation"]
+        console.print(
+            f"Animations: {animation['animations']} ({animation['frames']} frames, "
+            f"{animation['duplicate_frames']} repeated frames dropped)"
+        )
+    if "search" in results:
+        search = results["search"]
+        console.print(
+            f"Quality search: {search['searched']} outputs, {search['encodes']} full encodes, "
+            f"{search['missed']} missed target"
+        )
+    if "color" in results:
+        color = results["color"]
+        hit_rate = color["cache_hit_rate"]
+        console.print(
+            f"Color: {color['converted']} converted, {color['identity']} already in target, "
+            f"{color['failed']} unusable profiles; transform cache hit rate "
+            + (f"{hit_rate:.1%}" if hit_rate is not None else "n/a")
+        )
+    if resume and not incremental:
+        console.print(f"Skipped (already converted): {results['skipped']}")
+    if incremental:
+        cache_stats = results["cache"]
+        console.print(f"Skipped (unchanged): {results['skipped']}")
+        console.print(
+            f"Cache: {cache_stats['hits']} hits, {cache_stats['misses']} new, "
+            f"{cache_stats['changed']} changed"
+        )
 
     if results["errors"]:
         console.print(f"\n[red]Errors:[/red]")
         for error in results["errors"][:10]:  # Show first 10 errors
-            console.print(f"  {error['file']}: {error['error']}")
-        if len(results["errors"]) > 10:
-            console.print(f"  ... and {len(results['errors']) - 10} more errors")
+            fmt = f" ({error['format']})" if "format" in error else ""
+            console.print(f"  {error['file']}{fmt}: {error['error']}")
+        more = len(results["errors"]) - 10 + results.get("errors_dropped", 0)
+        if more > 0:
+            console.print(f"  ... and {more} more errors")
+
+    if journal:
+        summary = summarize_journal(Path(journal))
+        console.print(
+            f"Journal: {summary['completed']} converted over {summary['runs']} run(s), "
+            f"{summary['output_bytes'] / 1024 ** 2:.1f} MiB written ({journal})"
+        )
+    if report:
+        console.print(f"Report written to {report}")
+    if profile_dir:
+        console.print(f"Profiles written to {profile_dir}")
+
+
+def _watch(
+    input_path: Path,
+    options: dict,
+    workers: int | None,
+    recursive: bool,
+    poll_interval: float,
+    settle: float,
+    stats_file: str | None,
+) -> None:
+    """Run the hot-folder watcher until interrupted."""
+    from .core.watcher import FolderWatcher
+    from .utils.output import OutputWriter
+
+    def on_result(path: Path, record: dict) -> None:
+        if record["success"]:
+            console.print(f"[green]Converted[/green] {path}")
+        else:
+            console.print(f"[red]Failed[/red] {path}: {record['message']}")
+
+    last_stats: dict = {}
+
+    def on_tick(stats: dict) -> None:
+        if stats_file:
+            OutputWriter().write_bytes(Path(stats_file), json.dumps(stats).encode("utf-8"))
+        activity = {key: stats[key] for key in ("converted", "failed", "queue_depth")}
+        if activity != last_stats:
+            last_stats.update(activity)
+            console.print(
+                f"[dim]queue {stats['queue_depth']}, {stats['converted']} converted, "
+                f"{stats['failed']} failed, {stats['throughput_per_min']}/min, "
+                f"p95 latency {stats['latency_p95'] or 0:.1f}s[/dim]"
+            )
+
+    with FolderWatcher(
+        input_path,
+        options,
+        workers=workers,
+        recursive=recursive,
+        poll_interval=poll_interval,
+        settle_time=settle,
+        on_result=on_result,
+    ) as watcher:
+        console.print(f"[cyan]Watching {input_path} (Ctrl+C to stop)...[/cyan]")
+        try:
+            watcher.run(on_tick=on_tick)
+        except KeyboardInterrupt:
+            console.print("[yellow]Stopping; finishing conversions in flight...[/yellow]")
+
+
+@main.command()
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the merged summary as JSON")
+def merge(files: tuple[str, ...], output: str | None) -> None:
+    """Combine per-shard run reports and journals into one summary.
+
+    FILES: Reports (--report) and/or journals (--journal) from each shard
+    """
+    from .utils.instrument import load_report_summary, merge_report_summaries
+    from .utils.journal import is_journal, summarize_journal
+
+    reports, journals = [], []
+    for file in map(Path, files):
+        if is_journal(file):
+            journals.append(summarize_journal(file))
+        else:
+            try:
+                reports.append(load_report_summary(file))
+            except ValueError as e:
+                raise click.BadParameter(str(e), param_hint="FILES")
+
+    merged: dict = {}
+    if reports:
+        merged["report"] = merge_report_summaries(reports)
+        report = merged["report"]
+        results = report["results"]
+        console.print(f"[bold]Reports:[/bold] {len(reports)}")
+        console.print(
+            f"Total: {results.get('total', 0)}, successful: {results.get('successes', 0)}, "
+            f"failed: {results.get('failures', 0)}, skipped: {results.get('skipped', 0)}"
+        )
+        console.print(
+            f"Slowest shard: {report['elapsed_s']:.1f}s "
+            f"(fastest {min(report['run_elapsed_s']):.1f}s), "
+            f"{report['megapixels_per_s']:.1f} MP/s overall"
+        )
+    if journals:
+        merged["journal"] = {
+            key: sum(journal[key] for journal in journals) for key in journals[0]
+        }
+        totals = merged["journal"]
+        console.print(f"[bold]Journals:[/bold] {len(journals)}")
+        console.print(
+            f"Converted: {totals['completed']}, failed in latest runs: {totals['failures']}, "
+            f"{totals['output_bytes'] / 1024 ** 2:.1f} MiB written"
+        )
+
+    if output:
+        Path(output).write_text(json.dumps(merged, indent=2), encoding="utf-8")
+        console.print(f"Merged summary written to {output}")
+
+
+@main.command()
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address to listen on")
+@click.option("--port", default=8765, show_default=True, type=int, help="Port to listen on")
+@click.option("--workers", type=int, help="Number of worker processes")
+@click.option(
+    "--queue-size", type=int,
+    help="Conversions admitted at once before answering 429 (default: 4 per worker)",
+)
+@click.option(
+    "--max-body", default="64M", show_default=True,
+    callback=lambda ctx, param, value: _parse_memory(value),
+    help="Largest accepted upload",
+)
+@click.option(
+    "--effort", type=click.Choice(EFFORT_LEVELS),
+    help="Effort preset for requests without ?effort= (default: the calibrated setting)",
+)
+def serve(
+    host: str,
+    port: int,
+    workers: int | None,
+    queue_size: int | None,
+    max_body: int,
+    effort: str | None,
+) -> None:
+    """Serve conversions over HTTP from a warm worker pool.
+
+    POST an image to /convert?format=webp&quality=85 to get it back
+    converted; GET /metrics for counters and latency percentiles.
+    """
+    from .server import run_server
+
+    console.print(f"[cyan]Serving on http://{host}:{port} (Ctrl+C to stop)...[/cyan]")
+    run_server(
+        host=host,
+        port=port,
+        workers=workers,
+        queue_size=queue_size,
+        max_body=max_body,
+        effort=effort or Config.load().effort,
+    )
+
+
+@main.command()
+@click.argument("input_dir", type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--format", default="webp",
+    help="Output format(s) to calibrate, comma-separated (webp, jpeg, jpeg-xl, avif, png)",
+)
+@click.option("--quality", default=85, type=int, help="Quality setting (0-100)")
+@click.option("--lossless", is_flag=True, help="Use lossless compression")
+@click.option("--recursive/--no-recursive", default=True, help="Scan subfolders recursively")
+@click.option("--sample", default=12, show_default=True, type=int, help="Images to encode")
+@click.option(
+    "--target", "target_mp_s", required=True, type=float, metavar="MP/S",
+    help="Required batch throughput in megapixels per second",
+)
+@click.option(
+    "--workers", type=int, help="Worker processes the batch runs on (default: CPU count - 1)"
+)
+@click.option("--save/--no-save", default=True, help="Store the chosen preset in the config file")
+def calibrate(
+    input_dir: str,
+    format: str,
+    quality: int,
+    lossless: bool,
+    recursive: bool,
+    sample: int,
+    target_mp_s: float,
+    workers: int | None,
+    save: bool,
+) -> None:
+    """Pick the encoder effort preset that meets a throughput target.
+
+    Encodes a sample of INPUT_DIR at every --effort preset, reports
+    megapixels per second against output size, and keeps the slowest
+    (smallest-output) preset that is still fast enough.
+    """
+    import os
+
+    from rich.table import Table
+
+    from .core.calibrate import calibrate as run_calibration, choose_effort, sample_images
+    from .core.discovery import scan_images
+    from .core.processor import parse_formats
+
+    images = sample_images(list(scan_images(Path(input_dir), recursive=recursive)), sample)
+    if not images:
+        console.print("[yellow]No images found[/yellow]")
+        return
+    if workers is None:
+        workers = max(1, os.cpu_count() - 1 if os.cpu_count() else 1)
+
+    formats = parse_formats(format)
+    console.print(
+        f"[cyan]Encoding {len(images)} images as {', '.join(formats)} at each preset...[/cyan]"
+    )
+    results = run_calibration(images, formats, quality, lossless)
+    if not any(entry["images"] for entry in results.values()):
+        console.print("[red]None of the sample images could be converted[/red]")
+        raise SystemExit(1)
+
+    smallest = min(entry["output_bytes"] for entry in results.values()) or 1
+    table = Table(title=f"Effort presets ({workers} workers)")
+    for column in ("Effort", "MP/s per worker", "Batch MP/s", "Output", "vs smallest"):
+        table.add_column(column, justify="left" if column == "Effort" else "right")
+    for effort, entry in results.items():
+        table.add_row(
+            effort,
+            f"{entry['mp_per_s']:.1f}",
+            f"{entry['mp_per_s'] * workers:.1f}",
+            f"{entry['output_bytes'] / 1024:.0f} KiB",
+            f"+{(entry['output_bytes'] / smallest - 1) * 100:.1f}%",
+        )
+    console.print(table)
+
+    choice = choose_effort(results, target_mp_s, workers)
+    if results[choice]["mp_per_s"] * workers < target_mp_s:
+        console.print(f"[yellow]No preset reaches {target_mp_s:g} MP/s; using {choice}[/yellow]")
+    else:
+        console.print(f"[green]Chosen effort: {choice}[/green]")
+
+    if save:
+        config = Config.load()
+        config.effort = choice
+        config_path = Config.default_path()
+        config.save_to_file(config_path)
+        console.print(f"Saved to {config_path}")
+
+
+@main.command("prune-cache")
+@click.option(
+    "--older-than", type=float, metavar="DAYS",
+    help="Also drop entries not refreshed in this many days",
+)
+def prune_cache(older_than: float | None) -> None:
+    """Remove stale entries from the incremental conversion cache.
+
+    An entry is stale when its input or output file no longer exists.
+    """
+    from .utils.cache import ConversionCache
+
+    with ConversionCache() as cache:
+        removed = cache.prune(older_than_days=older_than)
+    console.print(f"[green]Removed {removed} stale cache entries[/green]")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+"""Animated image support: frame scanning, dedup and frame iteration."""
+
+import hashlib
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+from PIL import Image, ImageSequence
+
+# Output formats that keep every frame of an animated input; the others
+# get its first frame
+ANIMATED_FORMATS = {'webp', 'avif', 'jpeg-xl', 'png'}
+
+
+class AnimationFrames(NamedTuple):
+    """The frames of an animation worth encoding, as found by scan_frames()."""
+
+    indices: List[int]  # Source frames kept: the first of each run of identical frames
+    durations: List[int]  # Milliseconds per kept frame, including the frames it stands for
+    loop: int  # Times to play; 0 = forever
+    mode: str  # 'RGBA' if any frame has transparency, else 'RGB'
+    total: int  # Frames in the source
+
+
+def is_animated(img: Image.Image) -> bool:
+    """Whether an opened image has more than one frame."""
+    return bool(getattr(img, 'is_animated', False))
+
+
+def scan_frames(img: Image.Image) -> AnimationFrames:
+    """Read through an animation once, dropping repeats of the previous frame.
+
+    Frames are decoded one at a time (Pillow composites each onto the canvas,
+    applying the previous frame's disposal), hashed and let go, so memory
+    stays at about one frame however long the animation is. A dropped
+    frame's duration is added to the frame it repeats, so timing is kept.
+
+    Args:
+        img: Opened animated image; it is left at its first frame
+
+    Returns:
+        The frames to encode
+    """
+    indices: List[int] = []
+    durations: List[int] = []
+    previous = None
+    alpha = False
+    total = 0
+    for index, frame in enumerate(ImageSequence.Iterator(img)):
+        total += 1
+        duration = int(frame.info.get('duration') or 0)
+        alpha = alpha or frame.mode in ('RGBA', 'LA', 'PA') or 'transparency' in frame.info
+        digest = hashlib.blake2b(frame.convert('RGBA').tobytes(), digest_size=16).digest()
+        if digest == previous:
+            durations[-1] += duration
+            continue
+        previous = digest
+        indices.append(index)
+        durations.append(duration)
+    img.seek(0)
+    # A GIF without a loop extension plays once
+    loop = int(img.info.get('loop', 1))
+    return AnimationFrames(indices, durations, loop, 'RGBA' if alpha else 'RGB', total)
+
+
+def iter_frames(
+    source: Image.Image,
+    frames: AnimationFrames,
+    prepare: Callable[[Image.Image], Image.Image] | None = None,
+    start: int = 0,
+) -> Iterator[Image.Image]:
+    """Decode the kept frames of an animation, in order, prepared for output.
+
+    Each frame is decoded only when the iterator reaches it. Seeking back
+    re-decodes the source from its start, so one iteration should be a
+    single forward pass.
+
+    Args:
+        source: Opened animated image (shared; its position is moved)
+        frames: Frames to include, from scan_frames()
+        prepare: Applied to every frame after mode conversion (e.g. resizing
+            or color management)
+        start: Number of kept frames to skip
+
+    Yields:
+        Each kept frame, converted to frames.mode
+    """
+    for index in frames.indices[start:]:
+        source.seek(index)
+        frame = source.convert(frames.mode)
+        yield prepare(frame) if prepare is not None else frame
+
+
+class _AppendedFrames:
+    """The kept frames after the first, decoded anew on each iteration.
+
+    Pillow's APNG writer iterates append_images twice (once to check modes
+    and sizes, then to write), so a one-shot generator would lose frames.
+    """
+
+    def __init__(
+        self,
+        source: Image.Image,
+        frames: AnimationFrames,
+        prepare: Callable[[Image.Image], Image.Image] | None,
+    ) -> None:
+        self._source = source
+        self._frames = frames
+        self._prepare = prepare
+
+    def __iter__(self) -> Iterator[Image.Image]:
+        return iter_frames(self._source, self._frames, self._prepare, start=1)
+
+
+def prepare_animation(
+    source: Image.Image,
+    frames: AnimationFrames,
+    prepare: Callable[[Image.Image], Image.Image] | None = None,
+) -> Tuple[Image.Image, Dict[str, Any]]:
+    """Get an animation's first frame and the Image.save() arguments for the rest.
+
+    Saving the first frame with these arguments (save_all with
+    append_images) encodes the whole animation. The appended frames are
+    decoded as the encoder asks for them, but Pillow's WebP and AVIF
+    writers collect them all before encoding, so every kept frame is in
+    memory during that save.
+
+    Args:
+        source: Opened animated image (shared; its position is moved)
+        frames: Frames to encode, from scan_frames()
+        prepare: Applied to every frame after mode conversion
+
+    Returns:
+        Tuple of (first frame, save kwargs)
+    """
+    first = next(iter_frames(source, frames, prepare))
+    return first, {
+        'save_all': True,
+        'append_images': _AppendedFrames(source, frames, prepare),
+        'duration': list(frames.durations),
+        'loop': frames.loop,
+    }
@@ -0,0 +1,216 @@
+"""Reading images from, and writing outputs to, zip and tar archives."""
+
+import io
+import os
+import tarfile
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Iterator, List, NamedTuple, Tuple
+
+from .validator import SUPPORTED_EXTENSIONS
+
+# Archive name suffix -> (kind, tar compression)
+ARCHIVE_SUFFIXES = {
+    '.zip': ('zip', ''),
+    '.tar': ('tar', ''),
+    '.tar.gz': ('tar', 'gz'),
+    '.tgz': ('tar', 'gz'),
+    '.tar.bz2': ('tar', 'bz2'),
+    '.tbz2': ('tar', 'bz2'),
+    '.tar.xz': ('tar', 'xz'),
+    '.txz': ('tar', 'xz'),
+}
+
+# Errors raised for truncated or corrupt archives
+_ARCHIVE_ERRORS = (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError)
+
+
+class ArchiveMember(NamedTuple):
+    """An image read from an archive, held in memory."""
+
+    path: Path  # The archive's path joined with the member name
+    data: bytes
+
+
+def archive_kind(path: Path) -> Tuple[str, str] | None:
+    """Get the kind ('zip' or 'tar') and tar compression an archive name implies.
+
+    Returns:
+        Tuple of (kind, compression), or None if the name is not an archive's
+    """
+    name = path.name.lower()
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if name.endswith(suffix):
+            return ARCHIVE_SUFFIXES[suffix]
+    return None
+
+
+def is_archive(path: Path) -> bool:
+    """Whether a path is an existing file with an archive suffix."""
+    return archive_kind(path) is not None and path.is_file()
+
+
+def _is_image_member(name: str, recursive: bool) -> bool:
+    """Whether an archive member name is a visible image to convert.
+
+    Absolute names and names with ".." are skipped: the member name becomes
+    part of the input path, and output paths are derived from it.
+    """
+    if name.startswith('/'):
+        return False
+    parts = PurePosixPath(name).parts
+    if not parts or '..' in parts or parts[0] == '__MACOSX':
+        return False
+    if any(part.startswith('.') for part in parts):
+        return False
+    if not recursive and len(parts) > 1:
+        return False
+    return os.path.splitext(parts[-1])[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def archive_image_names(
+    archive: Path, recursive: bool = True, scan: bool = True
+) -> List[str] | None:
+    """List the images in an archive without reading their data.
+
+    A zip lists its members in a central directory at the end, but a tar has
+    to be read (and decompressed) all the way through to list it.
+
+    Args:
+        archive: Zip or tar archive
+        recursive: Include members in subfolders
+        scan: Read through a tar to list it; if False, None is returned
+            for a tar
+
+    Returns:
+        Member names of the images, in archive order
+
+    Raises:
+        ValueError: If the archive cannot be read
+    """
+    kind, _ = archive_kind(archive) or ('', '')
+    try:
+        if kind == 'zip':
+            with zipfile.ZipFile(archive) as zf:
+                return [
+                    info.filename for info in zf.infolist()
+                    if not info.is_dir() and _is_image_member(info.filename, recursive)
+                ]
+        if not scan:
+            return None
+        with tarfile.open(archive, 'r|*') as tf:
+            return [
+                member.name for member in tf
+                if member.isfile() and _is_image_member(member.name, recursive)
+            ]
+    except _ARCHIVE_ERRORS as e:
+        raise ValueError(f"Cannot read archive {archive}: {e}")
+
+
+def iter_archive_images(archive: Path, recursive: bool = True) -> Iterator[ArchiveMember]:
+    """Read the images in an archive one at a time, in archive order.
+
+    Tars are read as a stream, front to back, so each member is read (and
+    decompressed) exactly once and nothing is extracted to disk. Only the
+    member being yielded is held in memory.
+
+    Args:
+        archive: Zip or tar archive
+        recursive: Include members in subfolders
+
+    Yields:
+        Each image's path (archive / member name) and encoded bytes
+
+    Raises:
+        ValueError: If the archive cannot be read, possibly partway through
+    """
+    kind, _ = archive_kind(archive) or ('', '')
+    try:
+        if kind == 'zip':
+            with zipfile.ZipFile(archive) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and _is_image_member(info.filename, recursive):
+                        yield ArchiveMember(archive / info.filename, zf.read(info))
+        else:
+            with tarfile.open(archive, 'r|*') as tf:
+                for member in tf:
+                    if member.isfile() and _is_image_member(member.name, recursive):
+                        yield ArchiveMember(archive / member.name, tf.extractfile(member).read())
+    except _ARCHIVE_ERRORS as e:
+        raise ValueError(f"Cannot read archive {archive}: {e}")
+
+
+class ArchiveWriter:
+    """Streams output files into a new zip or tar archive.
+
+    Files are appended as they arrive, so outputs never land on disk one by
+    one. Zip members are stored uncompressed, as encoded images do not
+    compress further; a tar is compressed only if its name asks for it
+    (.tar.gz, .tar.bz2, .tar.xz). Like OutputWriter, the archive is written
+    to a hidden temporary file and renamed into place by close(), so an
+    interrupted run never leaves a truncated archive behind.
+    """
+
+    def __init__(self, path: Path, fsync: bool = False) -> None:
+        """Create the archive's temporary file.
+
+        Args:
+            path: Archive to create (replaced if it exists)
+            fsync: Flush the archive to disk before renaming it into place
+
+        Raises:
+            ValueError: If the name is not a zip or tar archive's
+        """
+        kind = archive_kind(path)
+        if kind is None:
+            raise ValueError(
+                f"Unsupported archive type: {path.name} "
+                f"(use {', '.join(ARCHIVE_SUFFIXES)})"
+            )
+        self.path = path
+        self.fsync = fsync
+        self.members = 0
+        self.bytes = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        self._file = open(self._temp_path, 'wb')
+        if kind[0] == 'zip':
+            self._archive = zipfile.ZipFile(self._file, 'w', zipfile.ZIP_STORED)
+        else:
+            self._archive = tarfile.open(fileobj=self._file, mode=f'w:{kind[1]}')
+
+    def add(self, name: str, data: bytes) -> None:
+        """Append a file.
+
+        Args:
+            name: Path of the file inside the archive ('/'-separated)
+            data: File contents
+        """
+        if isinstance(self._archive, zipfile.ZipFile):
+            self._archive.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            self._archive.addfile(info, io.BytesIO(data))
+        self.members += 1
+        self.bytes += len(data)
+
+    def close(self) -> None:
+        """Finish the archive and move it into place."""
+        self._archive.close()
+        if self.fsync:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self) -> None:
+        """Discard the archive, leaving any previous one at the path untouched."""
+        self._file.close()
+        try:
+            os.unlink(self._temp_path)
+        except OSError:
+            pass
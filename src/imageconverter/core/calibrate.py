@@ -0,0 +1,104 @@
+"""Encoder effort calibration on a sample of the user's own images."""
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .config import EFFORT_LEVELS
+from .converter import ImageConverter, OutputTarget
+
+
+def sample_images(images: List[Path], count: int) -> List[Path]:
+    """Pick up to count images spread evenly over the sorted list.
+
+    Args:
+        images: Candidate images
+        count: Sample size
+
+    Returns:
+        The sample, deterministic for a given set of images
+    """
+    images = sorted(images)
+    if len(images) <= count:
+        return images
+    step = len(images) / count
+    return [images[int(i * step)] for i in range(count)]
+
+
+def _add_records(entry: Dict[str, Any], records: List[Dict[str, Any]]) -> None:
+    """Add one image's encodes at a preset to that preset's totals."""
+    entry['images'] += 1
+    for record in records:
+        output = record['outputs'][0]
+        entry['megapixels'] += record['pixels'] / 1e6
+        entry['seconds'] += output['timings'].get('encode', 0.0)
+        entry['output_bytes'] += output['output_bytes']
+
+
+def calibrate(
+    images: List[Path],
+    formats: List[str],
+    quality: int = 85,
+    lossless: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """Encode every image at each effort preset and measure speed and size.
+
+    Only encoder time is counted; decoding and resizing cost the same at
+    every preset. Each output is encoded on its own so the timings are not
+    skewed by encoders competing for cores. An image that fails at any
+    preset is left out of all of them, so every preset is measured on the
+    same images.
+
+    Args:
+        images: Sample images
+        formats: Output formats to measure
+        quality: Quality setting (0-100)
+        lossless: Use lossless compression
+
+    Returns:
+        Mapping of effort preset to a dictionary with images, megapixels,
+        seconds (summed encode time), mp_per_s (per worker) and
+        output_bytes, all summed over formats
+    """
+    converter = ImageConverter()
+    results = {
+        effort: {'images': 0, 'megapixels': 0.0, 'seconds': 0.0, 'output_bytes': 0}
+        for effort in EFFORT_LEVELS
+    }
+    for path in images:
+        measured = {}
+        for effort in EFFORT_LEVELS:
+            records = [
+                converter.convert_multi(path, [OutputTarget(fmt, None)], quality, lossless, effort)
+                for fmt in formats
+            ]
+            if not all(record['success'] for record in records):
+                break  # Unreadable or unencodable; leave the image out at every preset
+            measured[effort] = records
+        else:
+            for effort, records in measured.items():
+                _add_records(results[effort], records)
+
+    for entry in results.values():
+        entry['megapixels'] = round(entry['megapixels'], 3)
+        seconds = entry['seconds']
+        entry['mp_per_s'] = round(entry['megapixels'] / seconds, 2) if seconds else 0.0
+        entry['seconds'] = round(entry['seconds'], 4)
+    return results
+
+
+def choose_effort(results: Dict[str, Dict[str, Any]], target_mp_s: float, workers: int = 1) -> str:
+    """Pick the most thorough preset that still meets a throughput target.
+
+    Args:
+        results: Output of calibrate()
+        target_mp_s: Required batch throughput in megapixels per second
+        workers: Worker processes the batch will run on
+
+    Returns:
+        The slowest preset whose mp_per_s times workers reaches the target,
+        or 'fast' if none does
+    """
+    for effort in reversed(EFFORT_LEVELS):
+        if results[effort]['mp_per_s'] * workers >= target_mp_s:
+            return effort
+    return EFFORT_LEVELS[0]
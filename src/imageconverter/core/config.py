@@ -3,6 +3,11 @@
 from pathlib import Path
 from typing import Any
 
+from ..utils.paths import get_config_dir
+
+# Encoder effort presets, fastest first (see ImageConverter.EFFORT_PRESETS)
+EFFORT_LEVELS = ("fast", "balanced", "max")
+
 
 class Config:
     """Configuration manager for ImageConverter."""
@@ -12,6 +17,7 @@ class Config:
     DEFAULT_LOSSLESS = False
     DEFAULT_RECURSIVE = True
     DEFAULT_PRESERVE_METADATA = True
+    DEFAULT_EFFORT = "balanced"
 
     def __init__(self) -> None:
         """Initialize configuration with defaults."""
@@ -20,6 +26,7 @@ class Config:
         self.lossless = self.DEFAULT_LOSSLESS
         self.recursive = self.DEFAULT_RECURSIVE
         self.preserve_metadata = self.DEFAULT_PRESERVE_METADATA
+        self.effort = self.DEFAULT_EFFORT
         self.output_dir = self._get_default_output_dir()
 
     @staticmethod
@@ -27,14 +34,40 @@ class Config:
         """Get the default output directory."""
         return Path.home() / "Downloads" / "ImageConverter_Output"
 
+    @staticmethod
+    def default_path() -> Path:
+        """Get the per-user configuration file path (see get_config_dir())."""
+        return get_config_dir() / "config.yaml"
+
+    @classmethod
+    def load(cls) -> "Config":
+        """Get the defaults overlaid with the per-user configuration file, if any."""
+        config = cls()
+        path = cls.default_path()
+        if path.exists():
+            config.load_from_file(path)
+        return config
+
     def load_from_file(self, config_path: Path) -> None:
         """Load configuration from a file.
 
+        The file holds one "key: value" pair per line (flat YAML); unknown
+        keys, comments and values of the wrong type are ignored.
+
         Args:
             config_path: Path to the configuration file
         """
-        # TODO: Implement config file loading
-        pass
+        with open(config_path, encoding="utf-8") as f:
+            for line in f:
+                key, sep, value = line.split("#", 1)[0].partition(":")
+                key, value = key.strip(), value.strip().strip("'\"")
+                if sep and hasattr(self, key) and not key.startswith("_"):
+                    try:
+                        setattr(self, key, self._parse(value, getattr(self, key)))
+                    except ValueError:
+                        continue
+        if self.effort not in EFFORT_LEVELS:
+            self.effort = self.DEFAULT_EFFORT
 
     def save_to_file(self, config_path: Path) -> None:
         """Save configuration to a file.
@@ -42,5 +75,27 @@ class Config:
         Args:
             config_path: Path to save the configuration file
         """
-        # TODO: Implement config file saving
-        pass
+        config_path.parent.mkdir(parents=True, exist_ok=True)
+        lines = ["# ImageConverter configuration"]
+        for key in ("format", "quality", "lossless", "recursive", "preserve_metadata",
+                    "effort", "output_dir"):
+            value = getattr(self, key)
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+            lines.append(f"{key}: {value}")
+        config_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    @staticmethod
+    def _parse(value: str, current: Any) -> Any:
+        """Convert a config file value to the type of the current setting."""
+        if isinstance(current, bool):
+            if value.lower() in ("true", "yes", "on", "1"):
+                return True
+            if value.lower() in ("false", "no", "off", "0"):
+                return False
+            raise ValueError(value)
+        if isinstance(current, int):
+            return int(value)
+        if isinstance(current, Path):
+            return Path(value).expanduser()
+        return value
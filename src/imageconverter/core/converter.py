@@ -1,22 +1,78 @@
 """Core image conversion functionality."""
 
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from pathlib import Path
-from typing import Tuple
-from ..utils.metadata import extract_metadata, apply_metadata
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from ..utils.instrument import StageTimer
+from ..utils.metadata import (
+    extract_metadata,
+    metadata_save_kwargs,
+    needs_splice,
+    splice_metadata,
+)
+from ..utils.output import OutputWriter
+from . import plugins
+from .animation import ANIMATED_FORMATS, is_animated, prepare_animation, scan_frames
+from .config import EFFORT_LEVELS
 
-# Register JPEG-XL plugin (auto-registers on import)
-try:
-    import pillow_jxl  # noqa: F401
-except ImportError:
-    pass  # Plugin not available
 
-# Register HEIF/AVIF plugin
-try:
-    from pillow_heif import register_heif_opener
-    register_heif_opener()
-except ImportError:
-    pass  # Plugin not available
+# In-memory image data accepted by convert_buffer()
+Buffer = bytes | bytearray | memoryview
+
+
+class ConversionError(Exception):
+    """Raised by convert_bytes() when an image cannot be converted."""
+
+    def __init__(self, message: str, error_type: str = 'conversion') -> None:
+        super().__init__(message)
+        self.error_type = error_type  # 'validation' or 'conversion'
+
+
+class _BufferReader(io.RawIOBase):
+    """Seekable read-only file over a buffer, so Pillow can decode it in place."""
+
+    def __init__(self, data: bytearray | memoryview) -> None:
+        self._view = memoryview(data).cast('B')
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class OutputTarget(NamedTuple):
+    """One encoded output of a source image."""
+
+    format: str
+    path: Path | None  # None returns the encoded bytes instead of writing them
+    width: int | None = None  # Resize to this width; None keeps the source size
+
+
+class QualityTarget(NamedTuple):
+    """Pick each output's quality to meet a target instead of using a fixed one."""
+
+    max_bytes: int | None = None  # Highest quality whose output fits this size
+    min_ssim: float | None = None  # Lowest quality reaching this SSIM (needs NumPy)
 
 
 class ImageConverter:
@@ -34,6 +90,52 @@ class ImageConverter:
         'png': 'PNG'
     }
 
+    # Encoder settings per effort preset: trade CPU time for output size.
+    # 'balanced', the default, keeps the settings used before presets existed
+    # (WebP and PNG already at their slowest, so 'max' matches it there);
+    # 'max' is the slowest, smallest setting of each encoder; 'fast' spends a
+    # fraction of its time for somewhat larger files.
+    EFFORT_PRESETS = {
+        'webp': {
+            'fast': {'method': 2},
+            'balanced': {'method': 6},
+            'max': {'method': 6},
+        },
+        'jpeg': {
+            'fast': {'optimize': False},
+            'balanced': {'optimize': True},
+            'max': {'optimize': True, 'progressive': True},
+        },
+        'jpeg-xl': {
+            'fast': {'effort': 3},
+            'balanced': {'effort': 7},
+            'max': {'effort': 9},
+        },
+        'avif': {
+            'fast': {'speed': 8},
+            'balanced': {'speed': 6},
+            'max': {'speed': 4},
+        },
+        'png': {
+            'fast': {'compress_level': 1},
+            'balanced': {'optimize': True},
+            'max': {'optimize': True},
+        },
+    }
+
+    # Outputs of images at least this large are encoded straight into a
+    # temporary file instead of an in-memory buffer
+    LARGE_OUTPUT_PIXELS = 40_000_000
+
+    def __init__(self, fsync: bool = False) -> None:
+        """Initialize the converter.
+
+        Args:
+            fsync: fsync each output before moving it into place
+        """
+        self.writer = OutputWriter(fsync=fsync)
+        self._color_caches: Dict[str, Any] = {}
+
     def convert_single(
         self,
         input_path: Path,
@@ -41,6 +143,7 @@ class ImageConverter:
         output_format: str,
         quality: int = 85,
         lossless: bool = False,
+        effort: str = 'balanced',
     ) -> Tuple[bool, str]:
         """Convert a single image file.
 
@@ -50,72 +153,737 @@ class ImageConverter:
             output_format: Output format (webp, jpeg, jpeg-xl, avif, png)
             quality: Quality setting (0-100)
             lossless: Use lossless compression
+            effort: Encoder effort preset (fast, balanced or max)
 
         Returns:
             Tuple of (success, message)
         """
+        record = self.convert_file(
+            input_path, output_path, output_format, quality, lossless, effort
+        )
+        return record['success'], record['message']
+
+    def convert_file(
+        self,
+        input_path: Path,
+        output_path: Path,
+        output_format: str,
+        quality: int = 85,
+        lossless: bool = False,
+        effort: str = 'balanced',
+    ) -> Dict[str, Any]:
+        """Convert a single image file, returning a detailed result record.
+
+        Args:
+            input_path: Path to the input image
+            output_path: Path to save the converted image
+            output_format: Output format (webp, jpeg, jpeg-xl, avif, png)
+            quality: Quality setting (0-100)
+            lossless: Use lossless compression
+            effort: Encoder effort preset (fast, balanced or max)
+
+        Returns:
+            Result record as described in convert_multi()
+        """
+        return self.convert_multi(
+            input_path, [OutputTarget(output_format, output_path)], quality, lossless, effort
+        )
+
+    def convert_multi(
+        self,
+        input_path: Path | BinaryIO,
+        targets: List[OutputTarget],
+        quality: int = 85,
+        lossless: bool = False,
+        effort: str = 'balanced',
+        passthrough: str | None = None,
+        reencode_threshold: float | None = None,
+        color_target: str | None = None,
+        quality_target: QualityTarget | None = None,
+    ) -> Dict[str, Any]:
+        """Decode an image once and encode it to several formats and sizes.
+
+        Images are only header-checked during discovery, so the decode here
+        doubles as the full integrity check; failures are reported with
+        error_type 'validation'. Resized variants are built once each (see
+        _build_variants()) and shared by all formats. When there is more
+        than one output the encoders run on threads, since Pillow releases
+        the GIL while encoding.
+
+        Args:
+            input_path: Path to the input image, or a binary file object
+                holding it (passthrough then never applies)
+            targets: Outputs to produce (format, path and optional width)
+            quality: Quality setting (0-100)
+            lossless: Use lossless compression
+            effort: Encoder effort preset (fast, balanced or max); see
+                EFFORT_PRESETS
+            passthrough: For targets already satisfied by the input (same
+                format, no downscale; see _can_pass_through()), place the
+                input itself at the output path instead of re-encoding it:
+                'link' (hard link, else reflink or copy) or 'copy' (reflink
+                or copy). None always re-encodes.
+            reencode_threshold: With passthrough, still encode such targets
+                and keep the re-encode only if it is more than this many
+                percent smaller than the input. None never re-encodes them.
+            color_target: Convert embedded ICC profiles to this color space
+                ("srgb" or an ICC profile path) before resizing and encoding.
+                Transforms are cached per converter (see TransformCache).
+            quality_target: Search each lossy output's quality for a size
+                cap and/or SSIM floor instead of using quality (see
+                search_quality()). Ignored for lossless, PNG and animated
+                outputs.
+
+        Returns:
+            Dictionary with success, message and error_type ('' on success,
+            otherwise 'validation' or 'conversion'), plus 'outputs': one
+            record per target with its own success/message/error_type and
+            format/width/output_path/output_bytes. Both levels carry
+            'timings' (seconds per stage); the file level also has
+            input_bytes, pixels and the worker's pid. Same-format targets
+            considered for passthrough carry 'action' ('passthrough' with
+            'link' naming the method, or 'reencoded') and, when encoded,
+            'reencode_bytes'. With color_target, the file level has 'color':
+            the profile conversion status and whether its transform was
+            cached (see TransformCache.convert()). With quality_target,
+            searched outputs carry the 'quality' used and the 'search'
+            statistics. Animated inputs are encoded as animations to the
+            formats in ANIMATED_FORMATS (with repeated frames dropped; see
+            scan_frames()) and as their first frame to the others; the file
+            level then has 'animation' (source frames and frames kept) and
+            animated outputs carry their 'frames'.
+
+        Raises:
+            ValueError: If color_target cannot be loaded as a profile
+        """
+        return self._convert(
+            input_path,
+            targets,
+            quality,
+            lossless,
+            effort,
+            passthrough,
+            reencode_threshold,
+            color_target,
+            quality_target
+        )
+
+    def convert_buffer(
+        self,
+        data: Buffer | BinaryIO,
+        output_format: str,
+        quality: int = 85,
+        lossless: bool = False,
+        width: int | None = None,
+        effort: str = 'balanced',
+    ) -> Dict[str, Any]:
+        """Convert an image held in memory, without touching disk.
+
+        Args:
+            data: Encoded input image, as bytes, bytearray, memoryview or a
+                binary file object. Buffers are read in place, not copied.
+            output_format: Output format (webp, jpeg, jpeg-xl, avif, png)
+            quality: Quality setting (0-100)
+            lossless: Use lossless compression
+            width: Downscale to this width (None keeps the source size)
+            effort: Encoder effort preset (fast, balanced or max)
+
+        Returns:
+            Result record as described in convert_multi(); on success its
+            single output carries the encoded image under 'data'
+        """
+        if isinstance(data, bytes):
+            source = io.BytesIO(data)  # Shares the bytes object's storage
+        elif isinstance(data, (bytearray, memoryview)):
+            source = io.BufferedReader(_BufferReader(data))
+        else:
+            source = data
+        return self._convert(
+            source, [OutputTarget(output_format, None, width)], quality, lossless, effort
+        )
+
+    def _convert(
+        self,
+        source: Path | BinaryIO,
+        targets: List[OutputTarget],
+        quality: int,
+        lossless: bool,
+        effort: str = 'balanced',
+        passthrough: str | None = None,
+        reencode_threshold: float | None = None,
+        color_target: str | None = None,
+        quality_target: QualityTarget | None = None,
+    ) -> Dict[str, Any]:
+        """Decode an image from a path or file object and encode every target."""
+        timer = StageTimer()
+        instrumentation = {'timings': timer.timings, 'worker': os.getpid()}
+
+        # 1. Validate and clamp quality parameter
+        quality = max(0, min(100, quality))
+
+        # 2. Load image (full decode; this is where corrupt files surface)
         try:
-            # 1. Validate format
-            pil_format = self.SUPPORTED_FORMATS.get(output_format.lower())
-            if not pil_format:
-                return False, f"Unsupported format: {output_format}"
+            with timer.stage('open'):
+                for target in targets:
+                    plugins.ensure_format(target.format)
+                img = plugins.open_image(source)
+            if isinstance(source, Path):
+                instrumentation['input_bytes'] = source.stat().st_size
+            elif isinstance(source, io.BytesIO):
+                instrumentation['input_bytes'] = source.getbuffer().nbytes
+        except Exception as e:
+            return {**self._invalid(e), **instrumentation}
 
-            # 2. Validate and clamp quality parameter
-            quality = max(0, min(100, quality))
+        # Targets the input already satisfies, judged from its header
+        kept: Dict[OutputTarget, Dict[str, Any]] = {}
+        candidates: Dict[OutputTarget, Tuple[Path, bool, float]] = {}
+        if passthrough and isinstance(source, Path):
+            for target in targets:
+                if self._can_pass_through(img, source, target, lossless, color_target):
+                    if reencode_threshold is None:
+                        kept[target] = self._pass_through(source, target, passthrough == 'link')
+                    else:
+                        candidates[target] = (source, passthrough == 'link', reencode_threshold)
+        if kept and len(kept) == len(targets):
+            # Nothing to encode; the pixels are never decoded
+            img.close()
+            instrumentation['pixels'] = img.width * img.height
+            return self._combine(targets, [kept[target] for target in targets], instrumentation)
+        targets_to_encode = [target for target in targets if target not in kept]
 
-            # 3. Load image
-            with Image.open(input_path) as img:
-                # 4. Extract metadata before conversion
+        with img:
+            # Animated inputs keep every frame in formats that can hold them;
+            # other formats get the first frame
+            animated_targets = []
+            if is_animated(img):
+                animated_targets = [
+                    target for target in targets_to_encode
+                    if target.format.lower() in ANIMATED_FORMATS
+                ]
+            still_targets = [
+                target for target in targets_to_encode if target not in animated_targets
+            ]
+
+            widths = {target.width for target in still_targets}
+            if widths and None not in widths:
+                # Only downscaled variants are wanted; let the JPEG decoder
+                # skip straight to the smallest DCT scale that still covers
+                # the largest one
+                largest = max(widths)
+                img.draft(img.mode, (largest, max(1, img.height * largest // img.width)))
+
+            try:
+                with timer.stage('decode'):
+                    img.load()
+            except Exception as e:
+                return {**self._invalid(e), **instrumentation}
+            instrumentation['pixels'] = img.width * img.height
+
+            animation = None
+            if animated_targets:
+                try:
+                    with timer.stage('frames'):
+                        animation = scan_frames(img)
+                        img.load()
+                except Exception as e:
+                    return {**self._invalid(e), **instrumentation}
+                instrumentation['animation'] = {
+                    'frames': animation.total, 'kept': len(animation.indices)
+                }
+            frames_source = img
+
+            # 3. Extract metadata before conversion
+            with timer.stage('metadata'):
                 metadata = extract_metadata(img)
+            icc_profile = metadata.get('icc_profile')
+
+            # 4. Convert the embedded color profile to the target space
+            if color_target:
+                with timer.stage('color'):
+                    img, instrumentation['color'] = self._color_cache(color_target).convert(
+                        img, metadata
+                    )
+
+            # 5. Build each requested size once
+            with timer.stage('resize'):
+                variants = self._build_variants(img, [w for w in widths if w is not None])
+            variants[None] = img
+
+            # 6. Encode every still target from the shared pixels
+            if len(still_targets) <= 1:
+                encoded = [
+                    self._encode(
+                        variants[target.width],
+                        target,
+                        quality,
+                        lossless,
+                        metadata,
+                        effort,
+                        candidates.get(target),
+                        quality_target
+                    )
+                    for target in still_targets
+                ]
+            else:
+                # Image.save() stores per-call state on the image, so each
+                # thread gets its own copy of the pixel buffer
+                with ThreadPoolExecutor(max_workers=len(still_targets)) as executor:
+                    futures = [
+                        executor.submit(
+                            self._encode,
+                            variants[target.width].copy(),
+                            target,
+                            quality,
+                            lossless,
+                            metadata,
+                            effort,
+                            candidates.get(target),
+                            quality_target
+                        )
+                        for target in still_targets
+                    ]
+                    encoded = [future.result() for future in futures]
+            encoded_by_target = dict(zip(still_targets, encoded))
+
+            # 7. Encode animated targets one at a time, each in one forward
+            #    pass over the source frames (they share its position)
+            for target in animated_targets:
+                first_frame, animation_kwargs = prepare_animation(
+                    frames_source,
+                    animation,
+                    self._frame_preparer(target.width, color_target, icc_profile)
+                )
+                encoded_by_target[target] = self._encode(
+                    first_frame,
+                    target,
+                    quality,
+                    lossless,
+                    metadata,
+                    effort,
+                    candidates.get(target),
+                    None,
+                    animation_kwargs
+                )
+
+        outputs = [kept.get(target) or encoded_by_target[target] for target in targets]
+        return self._combine(targets, outputs, instrumentation)
+
+    @classmethod
+    def _combine(
+        cls,
+        targets: List[OutputTarget],
+        outputs: List[Dict[str, Any]],
+        instrumentation: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Build the file-level result record from its output records."""
+        failed = [output for output in outputs if not output['success']]
+        if failed:
+            record = cls._result(False, failed[0]['message'], failed[0]['error_type'])
+        else:
+            formats = ', '.join(dict.fromkeys(target.format for target in targets))
+            record = cls._result(True, f"Successfully converted to {formats}")
+        record.update(instrumentation, outputs=outputs)
+        return record
 
-                # 5. Handle transparency for JPEG (no alpha support)
-                if output_format.lower() == 'jpeg' and img.mode in ('RGBA', 'LA', 'P'):
+    def _can_pass_through(
+        self,
+        img: Image.Image,
+        source: Path,
+        target: OutputTarget,
+        lossless: bool,
+        color_target: str | None = None,
+    ) -> bool:
+        """Whether an opened (not yet decoded) input already satisfies a target.
+
+        It must be in the target's format and need no downscaling. A lossless
+        request is only satisfied by a lossless input (PNG or lossless WebP),
+        and with color management its profile must already be the target's.
+        """
+        if target.path is None or img.format != self.SUPPORTED_FORMATS.get(target.format.lower()):
+            return False
+        if target.width is not None and target.width < img.width:
+            return False
+        if color_target and not self._color_cache(color_target).is_target(img):
+            return False
+        if lossless:
+            if img.format == 'WEBP':
+                with open(source, 'rb') as f:
+                    return f.read(16)[12:16] == b'VP8L'
+            return img.format == 'PNG'
+        return True
+
+    def _pass_through(
+        self, source: Path, target: OutputTarget, allow_hardlink: bool
+    ) -> Dict[str, Any]:
+        """Place the input itself at a target's path instead of encoding it."""
+        timer = StageTimer()
+        try:
+            with timer.stage('write'):
+                method = self.writer.link(source, target.path, allow_hardlink)
+            record = self._output_record(target, True, f"Kept source {target.format} ({method})")
+            record.update(output_bytes=source.stat().st_size, action='passthrough', link=method)
+        except Exception as e:
+            record = self._output_record(target, False, f"Conversion error: {str(e)}", 'conversion')
+        record['timings'] = timer.timings
+        return record
+
+    def _search_quality(
+        self,
+        img: Image.Image,
+        output_format: str,
+        pil_format: str,
+        quality_target: QualityTarget,
+        metadata: Dict[str, Any],
+        effort: str,
+    ) -> Tuple[int, Dict[str, Any], bytes | None]:
+        """Find the quality meeting a target with in-memory encodes.
+
+        Metadata is added once in the final save, so its size is reserved
+        from the byte budget instead of being encoded on every step.
+
+        Returns:
+            Tuple of (quality, search info, encoded output at that quality
+            or None); see search_quality()
+        """
+        from .search import search_quality  # NumPy is only loaded when used
+
+        def encode(image: Image.Image, quality: int) -> bytes:
+            buffer = io.BytesIO()
+            image.save(
+                buffer,
+                format=pil_format,
+                **self._get_save_kwargs(output_format, quality, False, effort)
+            )
+            return buffer.getvalue()
+
+        max_bytes = quality_target.max_bytes
+        if max_bytes is not None:
+            overhead = sum(
+                len(value) for value in metadata_save_kwargs(metadata, output_format).values()
+                if isinstance(value, bytes)
+            )
+            max_bytes = max(1, max_bytes - overhead)
+        return search_quality(img, encode, max_bytes, quality_target.min_ssim)
+
+    def _color_cache(self, target: str) -> Any:
+        """Get this converter's transform cache for a color target."""
+        cache = self._color_caches.get(target)
+        if cache is None:
+            from ..utils.color import TransformCache  # ImageCms is only loaded when used
+
+            cache = self._color_caches.setdefault(target, TransformCache(target))
+        return cache
+
+    def _frame_preparer(
+        self, width: int | None, color_target: str | None, icc_profile: bytes | None
+    ) -> Callable[[Image.Image], Image.Image]:
+        """Build the per-frame conversion of an animated output.
+
+        Frames go through the same color stage and resizing as still images.
+        """
+        def prepare(frame: Image.Image) -> Image.Image:
+            if color_target and icc_profile:
+                frame, _ = self._color_cache(color_target).convert(
+                    frame, {'icc_profile': icc_profile}
+                )
+            if width is not None:
+                frame = self._build_variants(frame, [width])[width]
+            return frame
+
+        return prepare
+
+    @staticmethod
+    def _build_variants(img: Image.Image, widths: List[int]) -> Dict[int | None, Image.Image]:
+        """Build downscaled copies of an image from a shared pyramid.
+
+        Sizes are produced largest first, each from the nearest larger one
+        rather than from the original. Steps of 2x or more use Image.reduce()
+        (a cheap box filter) before a final Lanczos resize. Widths at or
+        above the source width are not upscaled; they get the source image.
+
+        Args:
+            img: Decoded source image
+            widths: Target widths in pixels
+
+        Returns:
+            Mapping of width to image
+        """
+        variants: Dict[int | None, Image.Image] = {}
+        source = img
+        if widths and img.mode in ('P', '1'):
+            # Palette and bilevel images only resize with nearest-neighbour
+            source = img.convert('RGBA' if img.mode == 'P' else 'L')
+        for width in sorted(set(widths), reverse=True):
+            if width >= source.width:
+                variants[width] = source
+                continue
+            height = max(1, round(img.height * width / img.width))
+            factor = source.width // (width * 2)
+            reduced = source.reduce(factor) if factor >= 2 else source
+            source = reduced.resize((width, height), Image.Resampling.LANCZOS)
+            variants[width] = source
+        return variants
+
+    def _encode(
+        self,
+        img: Image.Image,
+        target: OutputTarget,
+        quality: int,
+        lossless: bool,
+        metadata: Dict[str, Any],
+        effort: str = 'balanced',
+        passthrough: Tuple[Path, bool, float] | None = None,
+        quality_target: QualityTarget | None = None,
+        animation: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
+        """Encode a decoded image to one target and write it.
+
+        Targets without a path are not written; their encoded bytes are
+        returned in the record under 'data'. With animation (save options
+        from prepare_animation()), img is the first frame of an
+        animation and the rest are appended. With passthrough (source path,
+        hard links allowed, threshold percent), the encoded result is only
+        written if it is more than threshold percent smaller than the
+        source; otherwise the source is passed through (see _pass_through()).
+
+        Returns:
+            Result record for this output, including format/width/output_path,
+            output_bytes and per-stage timings
+        """
+        output_format, output_path = target.format.lower(), target.path
+        timer = StageTimer()
+        try:
+            # 1. Validate format
+            pil_format = self.SUPPORTED_FORMATS.get(output_format)
+            if not pil_format:
+                record = self._output_record(
+                    target, False, f"Unsupported format: {target.format}", 'conversion'
+                )
+                record['timings'] = timer.timings
+                return record
+
+            # 2. Handle transparency for JPEG (no alpha support)
+            if output_format == 'jpeg' and img.mode in ('RGBA', 'LA', 'P'):
+                with timer.stage('flatten'):
                     bg = Image.new('RGB', img.size, (255, 255, 255))
                     if img.mode == 'P':
                         img = img.convert('RGBA')
                     bg.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
                     img = bg
 
-                # 6. Prepare format-specific save options
-                save_kwargs = self._get_save_kwargs(output_format.lower(), quality, lossless)
+            # 3. Search the quality that meets the size/SSIM target
+            search = None
+            searched = None
+            if quality_target is not None and not lossless and output_format != 'png':
+                with timer.stage('search'):
+                    quality, search, searched = self._search_quality(
+                        img, output_format, pil_format, quality_target, metadata, effort
+                    )
+
+            # 4. Prepare format-specific save options, embedding metadata
+            #    in the same save so the image is encoded exactly once
+            save_kwargs = self._get_save_kwargs(output_format, quality, lossless, effort)
+            extra_kwargs = metadata_save_kwargs(metadata, output_format)
+            if animation is not None:
+                extra_kwargs.update(animation)
+            save_kwargs.update(extra_kwargs)
+            if extra_kwargs:
+                searched = None  # Saved with other options; encode again
 
-                # 7. Ensure output directory exists
-                output_path.parent.mkdir(parents=True, exist_ok=True)
+            # 5. Encode and write atomically (temporary file + rename), so
+            #    an interrupted run never leaves a truncated output behind
+            if (
+                searched is None
+                and output_path is not None
+                and passthrough is None
+                and img.width * img.height >= self.LARGE_OUTPUT_PIXELS
+                and not needs_splice(metadata, output_format)
+            ):
+                # Too big to buffer; encode straight into the temporary file
+                with timer.stage('encode'), self.writer.open(output_path) as f:
+                    img.save(f, format=pil_format, **save_kwargs)
+                    output_bytes = f.tell()
+            else:
+                if searched is not None:
+                    data = searched  # The search already encoded it with these options
+                else:
+                    with timer.stage('encode'):
+                        buffer = io.BytesIO()
+                        img.save(buffer, format=pil_format, **save_kwargs)
+                        data = buffer.getvalue()
 
-                # 8. Save image with format-specific options
-                img.save(output_path, format=pil_format, **save_kwargs)
+                # 6. Splice in metadata the encoder could not take (no re-encode)
+                with timer.stage('metadata'):
+                    data = splice_metadata(data, metadata, output_format)
 
-            # 9. Apply metadata to saved image
-            apply_metadata(output_path, metadata)
+                # 7. Keep the source instead unless re-encoding saves enough
+                output_bytes = len(data)
+                if passthrough is not None:
+                    source, allow_hardlink, threshold = passthrough
+                    if output_bytes > source.stat().st_size * (1 - threshold / 100):
+                        record = self._pass_through(source, target, allow_hardlink)
+                        record['reencode_bytes'] = output_bytes
+                        record['timings'] = {**timer.timings, **record['timings']}
+                        return record
 
-            return True, f"Successfully converted to {output_format}"
+                # 8. Write to disk in one call
+                if output_path is not None:
+                    with timer.stage('write'):
+                        self.writer.write_bytes(output_path, data)
+
+            record = self._output_record(target, True, f"Successfully converted to {target.format}")
+            record['output_bytes'] = output_bytes
+            if output_path is None:
+                record['data'] = data
+            if passthrough is not None:
+                record.update(action='reencoded', reencode_bytes=output_bytes)
+            if search is not None:
+                record.update(quality=quality, search=search)
+            if animation is not None:
+                record['frames'] = len(animation['duration'])
 
         except Exception as e:
-            return False, f"Conversion error: {str(e)}"
+            record = self._output_record(target, False, f"Conversion error: {str(e)}", 'conversion')
+
+        record['timings'] = timer.timings
+        return record
 
-    def _get_save_kwargs(self, output_format: str, quality: int, lossless: bool) -> dict:
+    @staticmethod
+    def _result(success: bool, message: str, error_type: str = '') -> Dict[str, Any]:
+        """Build a convert_file() result record."""
+        return {'success': success, 'message': message, 'error_type': error_type}
+
+    @classmethod
+    def _output_record(
+        cls, target: OutputTarget, success: bool, message: str, error_type: str = ''
+    ) -> Dict[str, Any]:
+        """Build the result record for one output target."""
+        record = cls._result(success, message, error_type)
+        record.update(format=target.format, width=target.width, output_path=target.path)
+        return record
+
+    @classmethod
+    def _invalid(cls, error: Exception) -> Dict[str, Any]:
+        """Build the result record for an input that fails to decode."""
+        return cls._result(False, f"Corrupted or invalid image: {str(error)}", 'validation')
+
+    def _get_save_kwargs(
+        self, output_format: str, quality: int, lossless: bool, effort: str = 'balanced'
+    ) -> dict:
         """Get format-specific save parameters.
 
         Returns:
             Dictionary of kwargs for Image.save()
+
+        Raises:
+            ValueError: If effort is not a known preset
         """
-        save_kwargs = {}
+        if effort not in EFFORT_LEVELS:
+            raise ValueError(f"Unknown effort preset: {effort}")
+        save_kwargs = dict(self.EFFORT_PRESETS.get(output_format, {}).get(effort, {}))
 
         if output_format == 'webp':
             save_kwargs['quality'] = quality
-            save_kwargs['method'] = 6  # Best compression
             if lossless:
                 save_kwargs['lossless'] = True
         elif output_format == 'jpeg':
             save_kwargs['quality'] = quality
-            save_kwargs['optimize'] = True
         elif output_format == 'jpeg-xl':
             save_kwargs['quality'] = quality
             if lossless:
                 save_kwargs['lossless'] = True
         elif output_format == 'avif':
             save_kwargs['quality'] = quality
-        elif output_format == 'png':
-            save_kwargs['optimize'] = True
 
         return save_kwargs
+
+
+# Converter shared by the module-level functions below
+_default_converter: ImageConverter | None = None
+
+
+def convert_bytes(
+    data: Buffer | BinaryIO,
+    output_format: str = 'webp',
+    quality: int = 85,
+    lossless: bool = False,
+    width: int | None = None,
+    effort: str = 'balanced',
+) -> bytes:
+    """Convert an in-memory image and return the encoded bytes.
+
+    Nothing is written to disk; metadata (EXIF, ICC profile, DPI) is carried
+    over in the same encode, exactly as for file conversions.
+
+    Args:
+        data: Encoded input image (bytes, bytearray, memoryview or a binary
+            file object)
+        output_format: Output format (webp, jpeg, jpeg-xl, avif, png)
+        quality: Quality setting (0-100)
+        lossless: Use lossless compression
+        width: Downscale to this width (None keeps the source size)
+        effort: Encoder effort preset (fast, balanced or max)
+
+    Returns:
+        Encoded output image
+
+    Raises:
+        ConversionError: If the input cannot be decoded or encoded
+    """
+    global _default_converter
+    if _default_converter is None:
+        _default_converter = ImageConverter()
+    record = _default_converter.convert_buffer(
+        data, output_format, quality, lossless, width, effort
+    )
+    if not record['success']:
+        raise ConversionError(record['message'], record['error_type'])
+    return record['outputs'][0]['data']
+
+
+def convert_iter(
+    images: Iterable[Buffer | BinaryIO],
+    output_format: str = 'webp',
+    quality: int = 85,
+    lossless: bool = False,
+    width: int | None = None,
+    workers: int = 1,
+    effort: str = 'balanced',
+) -> Iterator[bytes]:
+    """Convert a stream of in-memory images, yielding results in order.
+
+    Inputs are pulled lazily. With workers > 1, up to twice that many
+    conversions run ahead on threads (Pillow releases the GIL while
+    decoding and encoding).
+
+    Args:
+        images: Encoded input images
+        output_format: Output format (webp, jpeg, jpeg-xl, avif, png)
+        quality: Quality setting (0-100)
+        lossless: Use lossless compression
+        width: Downscale to this width (None keeps the source size)
+        workers: Number of conversion threads
+        effort: Encoder effort preset (fast, balanced or max)
+
+    Yields:
+        Encoded output images, one per input
+
+    Raises:
+        ConversionError: When an input cannot be converted (ending the stream)
+    """
+    def convert(data: Buffer | BinaryIO) -> bytes:
+        return convert_bytes(data, output_format, quality, lossless, width, effort)
+
+    if workers <= 1:
+        for data in images:
+            yield convert(data)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: deque = deque()
+        for data in images:
+            pending.append(executor.submit(convert, data))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
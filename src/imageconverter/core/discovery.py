@@ -0,0 +1,88 @@
+"""Filesystem discovery of candidate image files."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Iterator, List, Set, Tuple
+
+from .validator import SUPPORTED_EXTENSIONS
+
+# Directory listings run concurrently; on network filesystems each scandir is
+# dominated by round-trip latency rather than CPU, so threads overlap well.
+DEFAULT_SCAN_WORKERS = 8
+
+
+def _list_dir(directory: Path, extensions: Set[str]) -> Tuple[List[Path], List[Path]]:
+    """List one directory, skipping hidden entries.
+
+    Args:
+        directory: Directory to list
+        extensions: Lower-case file extensions (with dot) to keep
+
+    Returns:
+        Tuple of (matching files, visible subdirectories)
+    """
+    files: List[Path] = []
+    subdirs: List[Path] = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(Path(entry.path))
+                    elif os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                        files.append(Path(entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        # Unreadable directory (permissions, vanished mount); skip it
+        pass
+    return files, subdirs
+
+
+def scan_images(
+    root_path: Path,
+    recursive: bool = True,
+    extensions: Set[str] = SUPPORTED_EXTENSIONS,
+    workers: int = DEFAULT_SCAN_WORKERS,
+) -> Iterator[Path]:
+    """Walk a directory tree once, yielding files with a supported extension.
+
+    Hidden files and directories (name starting with '.') below root_path are
+    skipped; hidden directories are pruned without being listed. The root
+    itself may live under a hidden parent. Files are yielded as soon as their
+    directory has been listed, in no particular order.
+
+    Args:
+        root_path: Root directory to scan
+        recursive: Descend into subdirectories
+        extensions: Lower-case file extensions (with dot) to keep
+        workers: Number of threads listing directories concurrently
+
+    Yields:
+        Paths of candidate image files
+    """
+    if not recursive:
+        files, _ = _list_dir(root_path, extensions)
+        yield from files
+        return
+
+    if workers <= 1:
+        stack = [root_path]
+        while stack:
+            files, subdirs = _list_dir(stack.pop(), extensions)
+            stack.extend(subdirs)
+            yield from files
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_list_dir, root_path, extensions)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for subdir in subdirs:
+                    pending.add(executor.submit(_list_dir, subdir, extensions))
+                yield from files
@@ -0,0 +1,108 @@
+"""Lazy registration of optional Pillow format plugins.
+
+Importing pillow-jxl-plugin or pillow-heif costs noticeable start-up time,
+so each is loaded only the first time a file or output format needs it.
+"""
+
+import threading
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict
+
+from PIL import Image, UnidentifiedImageError
+
+
+def _load_jxl() -> None:
+    import pillow_jxl  # noqa: F401  (registers itself on import)
+
+
+def _load_heif() -> None:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+
+
+# Plugin name -> loader (raises ImportError if the plugin is not installed)
+PLUGIN_LOADERS: Dict[str, Callable[[], None]] = {
+    'jxl': _load_jxl,
+    'heif': _load_heif,
+}
+
+# Output formats that need a plugin
+FORMAT_PLUGINS = {
+    'jpeg-xl': 'jxl',
+    'avif': 'heif',
+}
+
+# Input file extensions that need a plugin
+EXTENSION_PLUGINS = {
+    '.jxl': 'jxl',
+    '.avif': 'heif',
+    '.heic': 'heif',
+    '.heif': 'heif',
+}
+
+# Plugin name -> whether it loaded; absent until first attempted
+_loaded: Dict[str, bool] = {}
+_lock = threading.Lock()
+
+
+def load_plugin(name: str) -> bool:
+    """Load a plugin once.
+
+    Args:
+        name: Plugin name from PLUGIN_LOADERS
+
+    Returns:
+        True if the plugin is available
+    """
+    if name in _loaded:
+        return _loaded[name]
+    with _lock:
+        if name not in _loaded:
+            try:
+                PLUGIN_LOADERS[name]()
+                _loaded[name] = True
+            except ImportError:
+                _loaded[name] = False  # Plugin not available
+    return _loaded[name]
+
+
+def ensure_format(output_format: str) -> None:
+    """Load the plugin an output format needs, if any."""
+    name = FORMAT_PLUGINS.get(output_format.lower())
+    if name is not None:
+        load_plugin(name)
+
+
+def ensure_path(path: Path) -> None:
+    """Load the plugin needed to open a file, judged by its extension."""
+    name = EXTENSION_PLUGINS.get(path.suffix.lower())
+    if name is not None:
+        load_plugin(name)
+
+
+def load_all() -> bool:
+    """Load every plugin not tried yet, e.g. for input of unknown type.
+
+    Returns:
+        True if any plugin was newly loaded
+    """
+    return any([load_plugin(name) for name in PLUGIN_LOADERS if name not in _loaded])
+
+
+def open_image(source: Path | BinaryIO) -> Image.Image:
+    """Image.open() a file or buffer, loading plugins as needed.
+
+    The plugin a file's extension calls for is loaded up front. If Pillow
+    still cannot identify the image (a buffer, or a misleading extension),
+    the remaining plugins are loaded and the open is retried once.
+    """
+    if isinstance(source, Path):
+        ensure_path(source)
+    try:
+        return Image.open(source)
+    except UnidentifiedImageError:
+        if not load_all():
+            raise
+        if not isinstance(source, Path):
+            source.seek(0)
+        return Image.open(source)
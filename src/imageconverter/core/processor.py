@@ -1,146 +1,1061 @@
 """Batch processing functionality."""
 
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+import hashlib
+import heapq
+import io
 from pathlib import Path
-from typing import List, Callable, Dict, Any
+from typing import List, Callable, Dict, Any, Iterable, Iterator, Set, Sized, Tuple
 import os
-from .converter import ImageConverter
-from .validator import is_valid_image, SUPPORTED_EXTENSIONS
+import time
+from ..utils.cache import ConversionCache, hash_bytes, hash_file, options_key
+from ..utils.dedup import DuplicateIndex
+from ..utils.instrument import RunReport, StageTimer, profile_worker
+from ..utils.journal import Journal
+from ..utils.memory import peak_rss, reset_peak_rss
+from ..utils.output import OutputWriter
+from ..utils.paths import OutputPathAllocator
+from .archive import ArchiveMember, ArchiveWriter
+from .converter import ImageConverter, OutputTarget, QualityTarget
+from .discovery import scan_images
+from .validator import ImageHeader, read_image_header
+
+# A conversion job is (input_path, output targets); its result pairs the
+# input with the ImageConverter.convert_multi() record
+Job = Tuple[Path, List[OutputTarget]]
+JobResult = Tuple[Path, Dict[str, Any]]
+
+# Output file extension of each format
+FORMAT_EXTENSIONS = {
+    'webp': '.webp',
+    'jpeg': '.jpg',
+    'jpeg-xl': '.jxl',
+    'avif': '.avif',
+    'png': '.png'
+}
+
+# Errors kept in the results of a journaled batch (the journal has them all)
+MAX_JOURNAL_ERRORS = 100
+
+# Upper bound on the number of images handed to a worker in one task
+MAX_CHUNK_SIZE = 32
+
+# Chunk size when the batch is a stream of unknown length
+STREAM_CHUNK_SIZE = 4
+
+# Chunks queued per worker process; bounds how far the batch is read ahead
+# of the workers (archive members are held in memory until converted)
+MAX_QUEUED_CHUNKS = 2
+
+# Bytes Pillow allocates per pixel for each mode (multi-band modes are 32-bit)
+BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I;16B': 2, 'I;16L': 2}
+
+# Peak memory of a conversion as multiples of the decoded image size: the
+# source plus an alpha-flattened/converted canvas, then per output its pixel
+# copy and the encoder's working buffers (a single WebP encode peaks at
+# roughly 5x the decoded size)
+DECODE_OVERHEAD = 2
+ENCODE_OVERHEAD = 3
+
+# Animations are decoded a frame at a time, as RGBA canvases, but Pillow's
+# WebP and AVIF writers collect all the frames of an output before encoding
+# (outputs are encoded one after another), and each encoder holds the encoded
+# animation until it finishes; budget this many bytes per pixel per frame for it
+ENCODED_FRAME_BYTES_PER_PIXEL = 0.25
+
+# Animations with more pixels than this over all frames run alone on the
+# pool, like jobs over the memory budget, even without a max_memory
+ANIMATION_PIXEL_BUDGET = 100_000_000
+
+# One converter per worker process, created by the pool initializer
+_worker_converter: ImageConverter | None = None
+
+
+def init_worker(fsync: bool = False) -> None:
+    """Create the per-process ImageConverter used by convert_chunk()."""
+    global _worker_converter
+    _worker_converter = ImageConverter(fsync=fsync)
+
+
+def convert_chunk(
+    jobs: List[Job],
+    options: Dict[str, Any],
+    converter: ImageConverter | None = None,
+    sources: Dict[Path, bytes] | None = None,
+) -> List[JobResult]:
+    """Convert a chunk of images inside a worker process.
+
+    Args:
+        jobs: List of (input_path, output targets) pairs
+        options: Processing options (format, quality, etc.)
+        converter: Converter to use (None = this worker's converter)
+        sources: Encoded contents of inputs that are not on disk (archive
+            members), by input path
+
+    Returns:
+        List of (input_path, result record) tuples, one per job. Records
+        also carry 'cpu_seconds': the process's CPU time for the job,
+        including the encoder threads
+    """
+    converter = converter or _worker_converter or ImageConverter(fsync=options.get('fsync', False))
+    chunk_results = []
+    quality_target = None
+    if options.get('target_size') or options.get('target_ssim'):
+        quality_target = QualityTarget(options.get('target_size'), options.get('target_ssim'))
+    track_memory = options.get('max_memory') is not None
+    with profile_worker(options.get('profile_dir')):
+        for input_path, targets in jobs:
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            if track_memory:
+                reset_peak_rss()
+            data = sources.get(input_path) if sources else None
+            record = converter.convert_multi(
+                input_path if data is None else io.BytesIO(data),
+                targets,
+                options.get('quality', 85),
+                options.get('lossless', False),
+                options.get('effort', 'balanced'),
+                options.get('passthrough'),
+                options.get('reencode_threshold'),
+                options.get('color_target'),
+                quality_target
+            )
+            if track_memory:
+                record['peak_rss'] = peak_rss()
+            if options.get('incremental') and any(
+                output['success'] for output in record.get('outputs', [])
+            ):
+                # Hash here rather than in the parent so it runs in parallel
+                with StageTimer(record['timings']).stage('hash'):
+                    record['content_hash'] = hash_file(input_path)
+            record['timings']['total'] = time.perf_counter() - start
+            # Process-wide, so it includes the encoder threads of convert_multi()
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            chunk_results.append((input_path, record))
+    return chunk_results
+
+
+def _chunk_sources(chunk: List[Job], sources: Dict[Path, bytes]) -> Dict[Path, bytes] | None:
+    """Pick the in-memory inputs of a chunk's jobs, to send along with it."""
+    return {path: sources[path] for path, _ in chunk if path in sources} or None
+
+
+def failed_result(input_path: Path, message: str) -> JobResult:
+    """Build the result for a job that never produced a converter record."""
+    return input_path, {'success': False, 'message': message, 'error_type': 'conversion'}
+
+
+def _duplicate_result(
+    job: Job,
+    representative: Path,
+    representative_record: Dict[str, Any],
+    writer: OutputWriter,
+    allow_hardlink: bool = True,
+) -> JobResult:
+    """Build the result for an input identical to an already converted one.
+
+    Each of the representative's successful outputs is linked (or copied)
+    to the matching output path of the duplicate; nothing is decoded or
+    encoded.
+
+    Args:
+        job: The duplicate's (input_path, output targets)
+        representative: The identical input that was converted
+        representative_record: Its result record
+        writer: Writer that places the outputs
+        allow_hardlink: Permit hard links (else reflink or copy)
+
+    Returns:
+        (input_path, result record) shaped like a converter record, with
+        'duplicate_of' naming the representative
+    """
+    input_path, targets = job
+    start = time.perf_counter()
+    rep_outputs = {
+        (output['format'], output['width']): output
+        for output in representative_record.get('outputs', [])
+    }
+    outputs = []
+    for target in targets:
+        output = {'format': target.format, 'width': target.width, 'output_path': target.path}
+        rep_output = rep_outputs.get((target.format, target.width))
+        timer = StageTimer()
+        if rep_output is None or not rep_output['success']:
+            failed = rep_output or representative_record
+            output.update(
+                success=False,
+                message=f"Duplicate of {representative}: {failed['message']}",
+                error_type=failed['error_type'],
+            )
+        else:
+            try:
+                with timer.stage('write'):
+                    method = writer.link(rep_output['output_path'], target.path, allow_hardlink)
+                output.update(
+                    success=True,
+                    message=f"Duplicate of {representative} ({method})",
+                    error_type='',
+                    output_bytes=rep_output['output_bytes'],
+                    action='duplicate',
+                    link=method,
+                )
+            except OSError as e:
+                output.update(success=False, message=f"Conversion error: {e}", error_type='conversion')
+        output['timings'] = timer.timings
+        outputs.append(output)
+
+    failed = [output for output in outputs if not output['success']]
+    if not outputs:
+        record = {
+            'success': False,
+            'message': f"Duplicate of {representative}: {representative_record['message']}",
+            'error_type': representative_record['error_type'],
+        }
+    elif failed:
+        record = {'success': False, 'message': failed[0]['message'], 'error_type': failed[0]['error_type']}
+    else:
+        record = {'success': True, 'message': f"Duplicate of {representative}", 'error_type': ''}
+    record.update(
+        outputs=outputs,
+        duplicate_of=str(representative),
+        pixels=representative_record.get('pixels'),
+        timings={'total': time.perf_counter() - start},
+    )
+    if representative_record.get('content_hash'):
+        record['content_hash'] = representative_record['content_hash']
+    return input_path, record
+
+
+def estimate_job_memory(header: ImageHeader, n_targets: int = 1) -> int:
+    """Estimate the peak memory needed to convert an image.
+
+    Args:
+        header: Header of the input image
+        n_targets: Number of outputs encoded from it
+
+    Returns:
+        Estimated peak memory in bytes
+    """
+    if header.frames > 1:
+        frame = header.pixels * 4
+        encoded = int(header.pixels * header.frames * ENCODED_FRAME_BYTES_PER_PIXEL)
+        collected = frame * header.frames  # One output's frames, before dedup
+        return (
+            frame * (DECODE_OVERHEAD + ENCODE_OVERHEAD * n_targets)
+            + collected + encoded * n_targets
+        )
+    decoded = header.pixels * BYTES_PER_PIXEL.get(header.mode, 4)
+    return decoded * (DECODE_OVERHEAD + ENCODE_OVERHEAD * n_targets)
+
+
+def is_huge_animation(header: ImageHeader) -> bool:
+    """Whether an animation exceeds ANIMATION_PIXEL_BUDGET over all its frames."""
+    return header.frames > 1 and header.pixels * header.frames > ANIMATION_PIXEL_BUDGET
+
+
+def output_size(
+    source_size: Tuple[int, int] | None, width: int | None
+) -> Tuple[int, int] | None:
+    """Compute the dimensions of an output, as ImageConverter resizes it.
+
+    Args:
+        source_size: (width, height) of the input, or None if unknown
+        width: Requested variant width (None = full size)
+
+    Returns:
+        Output (width, height), or None if the input size is unknown
+    """
+    if source_size is None or width is None or width >= source_size[0]:
+        return source_size
+    return width, max(1, round(source_size[1] * width / source_size[0]))
+
+
+def shard_index(relative_path: str, shard_count: int) -> int:
+    """Assign a path to a shard by a stable hash.
+
+    The hash (BLAKE2b) is independent of the machine, Python version and
+    PYTHONHASHSEED, so every node computes the same assignment.
+
+    Args:
+        relative_path: Path relative to the batch root, with "/" separators
+        shard_count: Number of shards
+
+    Returns:
+        Shard index in [0, shard_count)
+    """
+    digest = hashlib.blake2b(relative_path.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shard_count
+
+
+def partition_images(
+    images: Iterable[Path],
+    root: Path,
+    shard_count: int,
+    weights: Dict[Path, int] | None = None,
+) -> List[List[Path]]:
+    """Split images into shards deterministically.
+
+    Without weights, each image goes to shard_index() of its path relative
+    to root, so adding or removing files never moves the others. With
+    weights (e.g. pixel counts), images are assigned heaviest first to the
+    least-loaded shard, so shards finish at about the same time; this needs
+    every node to see the same set of files.
+
+    Args:
+        images: Image paths under root
+        root: Batch root the relative paths are taken from
+        shard_count: Number of shards
+        weights: Optional cost of each image; missing images weigh 1
+
+    Returns:
+        List of shard_count lists of paths, each in input order
+    """
+    def relative(path: Path) -> str:
+        try:
+            return path.relative_to(root).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    shards: List[List[Path]] = [[] for _ in range(shard_count)]
+    if weights is None:
+        for path in images:
+            shards[shard_index(relative(path), shard_count)].append(path)
+        return shards
+
+    # Longest-processing-time-first; ties are broken by path and shard
+    # index so every node arrives at the same assignment
+    images = list(images)
+    order = sorted(images, key=lambda path: (-weights.get(path, 1), relative(path)))
+    loads = [(0, index) for index in range(shard_count)]
+    assigned: Dict[Path, int] = {}
+    for path in order:
+        load, index = heapq.heappop(loads)
+        assigned[path] = index
+        heapq.heappush(loads, (load + weights.get(path, 1), index))
+    for path in images:
+        shards[assigned[path]].append(path)
+    return shards
+
+
+def parse_formats(output_format: str | List[str]) -> List[str]:
+    """Normalize a format option ("webp", "webp,jpeg-xl" or a list) to a list.
+
+    Args:
+        output_format: Single format, comma-separated formats or a list
+
+    Returns:
+        Lower-case formats in order, without duplicates
+    """
+    if isinstance(output_format, str):
+        output_format = output_format.split(',')
+    formats = [fmt.strip().lower() for fmt in output_format if fmt.strip()]
+    return list(dict.fromkeys(formats))
 
 
 class BatchProcessor:
-    """Handles batch image processing with multiprocessing."""
+    """Handles batch image processing on a pool of worker processes."""
 
-    def __init__(self, workers: int | None = None) -> None:
+    def __init__(self, workers: int | None = None, max_memory: int | None = None) -> None:
         """Initialize the batch processor.
 
         Args:
             workers: Number of worker processes (None = CPU count - 1)
+            max_memory: Memory budget in bytes for conversions in flight
+                (None = unlimited). Images estimated to exceed it run alone.
         """
         if workers is None:
             workers = max(1, os.cpu_count() - 1 if os.cpu_count() else 1)
         self.workers = workers
+        self.max_memory = max_memory
 
-    def discover_images(self, root_path: Path, recursive: bool = True) -> List[Path]:
-        """Discover images of any supported format in a directory.
+        # Headers seen during discovery, reused for memory estimates
+        self._headers: Dict[Path, ImageHeader] = {}
+
+    def iter_image_headers(
+        self, root_path: Path, recursive: bool = True
+    ) -> Iterator[ImageHeader]:
+        """Yield headers of images under a directory as the walk discovers them.
+
+        Only headers are read here; corrupt pixel data is caught when the
+        image is decoded for conversion.
 
         Args:
             root_path: Root directory to scan
             recursive: Scan subdirectories recursively
 
-        Returns:
-            List of discovered image paths
+        Yields:
+            Headers of recognized images, in discovery order
         """
-        images = []
+        for img_path in scan_images(root_path, recursive=recursive):
+            header, _ = read_image_header(img_path)
+            if header is not None:
+                self._headers[img_path] = header
+                yield header
 
-        # Scan for all supported image extensions
-        for ext in SUPPORTED_EXTENSIONS:
-            if recursive:
-                pattern = f"**/*{ext}"
-            else:
-                pattern = f"*{ext}"
+    def iter_images(self, root_path: Path, recursive: bool = True) -> Iterator[Path]:
+        """Yield images under a directory as the walk discovers them.
 
-            for img_path in root_path.glob(pattern):
-                # Skip hidden files/folders
-                if any(part.startswith('.') for part in img_path.parts):
-                    continue
+        Files with a supported extension are yielded even if their header
+        cannot be read, so that, like archive members, they are reported
+        as failed when converted rather than silently left out. Headers
+        that can be read are kept for memory estimates.
+
+        Args:
+            root_path: Root directory to scan
+            recursive: Scan subdirectories recursively
+
+        Yields:
+            Paths of candidate images, in discovery order
+        """
+        for img_path in scan_images(root_path, recursive=recursive):
+            header, _ = read_image_header(img_path)
+            if header is not None:
+                self._headers[img_path] = header
+            yield img_path
 
-                # Validate it's actually a valid image
-                is_valid, _ = is_valid_image(img_path)
-                if is_valid:
-                    images.append(img_path)
+    def discover_images(self, root_path: Path, recursive: bool = True) -> List[Path]:
+        """Discover images of any supported format in a directory.
+
+        Args:
+            root_path: Root directory to scan
+            recursive: Scan subdirectories recursively
 
-        return images
+        Returns:
+            Sorted list of discovered image paths
+        """
+        return sorted(self.iter_images(root_path, recursive=recursive))
 
     def process_batch(
         self,
-        image_list: List[Path],
+        image_list: Iterable[Path | ArchiveMember],
         options: Dict[str, Any],
         progress_callback: Callable[[int, int, str], None] | None = None,
+        report: RunReport | None = None,
+        journal: Journal | None = None,
     ) -> Dict[str, Any]:
         """Process a batch of images.
 
         Args:
-            image_list: List of image paths to process
+            image_list: Image paths to process. May be a generator such as
+                iter_images(), in which case conversion starts before
+                discovery finishes and the progress total grows as it goes.
+                Archive members (see iter_archive_images()) are converted
+                from memory and identified by their archive / member path.
             options: Processing options (format, quality, etc.)
             progress_callback: Optional callback for progress updates
+            report: Optional run report that receives every file's result
+                record; the caller closes it
+            journal: Optional journal that every finished file is appended
+                to; inputs it lists as completed are skipped. The caller
+                closes it.
 
         Returns:
             Dictionary with processing results (successes, failures, etc.)
+
+        options['format'] may name several formats ("webp,jpeg-xl" or a
+        list); each input is then decoded once and encoded to all of them,
+        and per-format counts are returned under 'formats'. An input counts
+        as a success only if every output succeeded.
+
+        options['sizes'] (a list of widths) replaces the full-size output
+        with one downscaled variant per width, per format.
+
+        Output names come from options['filename_pattern'] (see
+        OutputPathAllocator; default "{stem}"), and with options['mirror_root']
+        the input subfolders under that root are recreated in the output
+        directory. Name collisions get a "_N" suffix.
+
+        With a max_memory budget, jobs are admitted only while their
+        estimated memory (see estimate_job_memory()) fits, a sized batch is
+        run largest-first, and each input's peak RSS is returned under
+        'peak_rss'.
+
+        With options['incremental'], outputs unchanged since their last
+        conversion with the same options are skipped (inputs with nothing
+        left to do are counted in 'skipped'), changed ones overwrite their
+        previous output (as do inputs converted to the same place with other
+        encode options, e.g. another quality), and the cache statistics are
+        returned under 'cache'.
+
+        With a journal, inputs converted by an earlier run are counted in
+        'skipped' without being checked again, and only the first
+        MAX_JOURNAL_ERRORS errors are kept in memory (the count of the rest
+        is returned under 'errors_dropped'), so memory stays flat however
+        large the batch.
+
+        With options['passthrough'] ('link' or 'copy'), inputs already in an
+        output's format and size are placed at the output path instead of
+        being re-encoded (with options['reencode_threshold'], only when a
+        re-encode would not be that many percent smaller). Outputs kept
+        this way and outputs re-encoded instead are counted under
+        'passthrough'.
+
+        With options['dedup'] ('link' or 'copy'), inputs byte-identical to
+        an earlier input (same size, then same content hash; see
+        DuplicateIndex) are not converted: the earlier input's outputs are
+        hard-linked or copied to their output paths once it finishes. The
+        count, the input bytes not converted and the CPU-seconds (all threads)
+        the representatives took are returned under 'dedup'.
+
+        With options['target_size'] (bytes) and/or options['target_ssim'],
+        each lossy output's quality is searched to fit that size or reach
+        that SSIM (see ImageConverter.convert_multi()) instead of using
+        options['quality']. Searched outputs, full-resolution encodes spent
+        and targets that could not be met are counted under 'search'.
+
+        Animated inputs are converted frame by frame (see
+        ImageConverter.convert_multi()); their count, source frames and the
+        repeated frames dropped are returned under 'animation'. With a
+        max_memory budget their estimate includes the frame count, and
+        without one huge animations (see is_huge_animation()) run alone.
+
+        With options['color_target'] ("srgb" or an ICC profile path),
+        embedded color profiles are converted to that space. Outcomes and
+        transform-cache hits are counted under 'color'.
+
+        With options['output_archive'] (a .zip or .tar[.gz|.bz2|.xz] path),
+        outputs are streamed into that archive as they complete instead of
+        being written to output_dir; output paths in the results are the
+        archive path joined with the member name. The archive's path, member
+        count and bytes are returned under 'archive'. Archive members and
+        archive outputs are never cached, passed through or deduplicated.
         """
+        formats = parse_formats(options['format'])
         results = {
-            "total": len(image_list),
+            "total": 0,
             "successes": 0,
             "failures": 0,
-            "errors": []
+            "skipped": 0,
+            "errors": [],
+            "formats": {fmt: {"successes": 0, "failures": 0} for fmt in formats},
         }
+        if options.get('passthrough'):
+            results['passthrough'] = {'kept': 0, 'reencoded': 0, 'bytes_kept': 0}
+        if options.get('target_size') or options.get('target_ssim'):
+            results['search'] = {'searched': 0, 'encodes': 0, 'missed': 0}
+        if options.get('color_target'):
+            results['color'] = {
+                'converted': 0, 'identity': 0, 'none': 0, 'failed': 0,
+                'cache_hits': 0, 'cache_misses': 0, 'cache_hit_rate': None,
+            }
+        duplicates = DuplicateIndex() if options.get('dedup') else None
+        if duplicates is not None:
+            results['dedup'] = {'duplicates': 0, 'bytes_saved': 0, 'cpu_seconds_saved': 0.0}
+            dedup_writer = OutputWriter(fsync=options.get('fsync', False))
+        # Per representative input: its outputs by variant, its record once
+        # finished, and the duplicates waiting for it
+        rep_targets: Dict[Path, Dict[Tuple[str, int | None], Path]] = {}
+        rep_records: Dict[Path, Dict[str, Any]] = {}
+        waiting: Dict[Path, List[Job]] = {}
+        known_total = len(image_list) if isinstance(image_list, Sized) else None
+        # Encoded contents of archive members, until their conversion is recorded
+        sources: Dict[Path, bytes] = {}
 
-        converter = ImageConverter()
-
-        # Process images sequentially (multiprocessing can be added later)
-        for idx, input_path in enumerate(image_list):
-            # Generate output path
-            output_path = self.generate_output_path(
-                input_path,
-                Path(options['output_dir']),
-                options['format']
+        # Outputs are named relative to the output archive as if it were a
+        # directory; the allocated paths of each input's outputs are kept
+        # until its results arrive, to name the archive members
+        archive_writer = None
+        archive_paths: Dict[Path, List[Path]] = {}
+        if options.get('output_archive'):
+            archive_writer = ArchiveWriter(
+                Path(options['output_archive']), fsync=options.get('fsync', False)
             )
+        output_root = Path(options.get('output_archive') or options['output_dir'])
 
-            # Convert
-            success, message = converter.convert_single(
-                input_path,
-                output_path,
-                options['format'],
-                options.get('quality', 85),
-                options.get('lossless', False)
-            )
+        # Allocate output paths in this process so parallel workers never race on names
+        allocator = OutputPathAllocator(
+            output_root,
+            options.get('filename_pattern'),
+            Path(options['mirror_root']) if options.get('mirror_root') else None,
+        )
+
+        cache = ConversionCache(options.get('cache_path')) if options.get('incremental') else None
+        widths: List[int | None] = sorted(set(options.get('sizes') or [])) or [None]
+        variants = [(fmt, width) for fmt in formats for width in widths]
+        cache_keys = {
+            (fmt, width): options_key({**options, 'format': fmt, 'width': width})
+            for fmt, width in variants
+        }
+        queued_stats: Dict[Path, os.stat_result] = {}
+
+        completed = 0
+
+        def advance(input_path: Path) -> None:
+            nonlocal completed
+            completed += 1
+            if progress_callback:
+                progress_callback(
+                    completed, known_total or results['total'], str(input_path.name)
+                )
+
+        def iter_jobs() -> Iterator[Job]:
+            for item in image_list:
+                input_path, data = item if isinstance(item, ArchiveMember) else (item, None)
+                results['total'] += 1
+                if journal is not None and journal.is_completed(input_path):
+                    results['skipped'] += 1
+                    advance(input_path)
+                    continue
+                previous_outputs: Dict[Tuple[str, int | None], Path | None] = dict.fromkeys(
+                    variants
+                )
+                if data is not None:
+                    sources[input_path] = data
+                    # Sniff the header now, while the bytes are at hand
+                    header = read_image_header(input_path, data)[0]
+                    if header is not None:
+                        self._headers[input_path] = header
+                elif cache is not None:
+                    stat = input_path.stat()
+                    for variant in variants:
+                        up_to_date, entry = cache.check(input_path, cache_keys[variant], stat)
+                        if up_to_date:
+                            del previous_outputs[variant]
+                        elif entry is not None:
+                            previous_outputs[variant] = entry.output_path
+                    if not previous_outputs:
+                        results['skipped'] += 1
+                        advance(input_path)
+                        continue
+                    queued_stats[input_path] = stat
+
+                source_size = None
+                if allocator.needs_size:
+                    header = self._headers.get(input_path) or read_image_header(input_path)[0]
+                    source_size = (header.width, header.height) if header else None
+                content_hash = None
+                if allocator.needs_hash:
+                    content_hash = hash_file(input_path) if data is None else hash_bytes(data)
+
+                targets = []
+                for (fmt, width), previous_output in previous_outputs.items():
+                    if previous_output is not None:
+                        allocator.reserve(previous_output)
+                        output_path = previous_output
+                    else:
+                        output_path = allocator.allocate(
+                            input_path,
+                            FORMAT_EXTENSIONS.get(fmt, '.webp'),
+                            width,
+                            output_size(source_size, width),
+                            content_hash
+                        )
+                    targets.append(OutputTarget(fmt, output_path, width))
+                if archive_writer is not None:
+                    # Workers return the encoded bytes instead of writing them
+                    archive_paths[input_path] = [target.path for target in targets]
+                    targets = [target._replace(path=None) for target in targets]
+
+                if duplicates is not None and data is None:
+                    representative = duplicates.find(input_path, input_path.stat().st_size)
+                    if representative is None:
+                        rep_targets[input_path] = {
+                            (target.format, target.width): target.path for target in targets
+                        }
+                    elif all(
+                        (target.format, target.width) in rep_targets[representative]
+                        for target in targets
+                    ):
+                        if representative in rep_records:
+                            resolve_duplicate((input_path, targets), representative)
+                        else:
+                            waiting.setdefault(representative, []).append((input_path, targets))
+                        continue
+                yield input_path, targets
+
+        def resolve_duplicate(job: Job, representative: Path) -> None:
+            rep_record = rep_records[representative]
+            dedup = results['dedup']
+            dedup['duplicates'] += 1
+            dedup['bytes_saved'] += job[0].stat().st_size
+            dedup['cpu_seconds_saved'] += rep_record.get('cpu_seconds', 0.0)
+            record(_duplicate_result(
+                job, representative, rep_record, dedup_writer, options['dedup'] == 'link'
+            ))
+
+        def add_error(error: Dict[str, str]) -> None:
+            if journal is not None and len(results['errors']) >= MAX_JOURNAL_ERRORS:
+                results['errors_dropped'] = results.get('errors_dropped', 0) + 1
+            else:
+                results['errors'].append(error)
+
+        def record(job_result: JobResult) -> None:
+            input_path, file_record = job_result
+            stat = queued_stats.pop(input_path, None)
+            sources.pop(input_path, None)
+            outputs = file_record.get('outputs', [])
+            if archive_writer is not None:
+                for output, path in zip(outputs, archive_paths.pop(input_path, [])):
+                    data = output.pop('data', None)
+                    if data is not None:
+                        archive_writer.add(path.relative_to(output_root).as_posix(), data)
+                    output['output_path'] = path
 
             # Update results
-            if success:
+            if file_record['success']:
                 results['successes'] += 1
             else:
                 results['failures'] += 1
-                results['errors'].append({
-                    'file': str(input_path),
-                    'error': message
-                })
+                if not outputs:
+                    # Failed before any format was attempted (e.g. decode)
+                    add_error({
+                        'file': str(input_path),
+                        'error': file_record['message'],
+                        'type': file_record['error_type']
+                    })
+
+            for output in outputs:
+                fmt = output['format']
+                if output['success']:
+                    results['formats'][fmt]['successes'] += 1
+                    if output.get('action') == 'passthrough':
+                        results['passthrough']['kept'] += 1
+                        results['passthrough']['bytes_kept'] += output['output_bytes']
+                    elif output.get('action') == 'reencoded':
+                        results['passthrough']['reencoded'] += 1
+                    if output.get('search') is not None:
+                        results['search']['searched'] += 1
+                        results['search']['encodes'] += output['search']['encodes']
+                        results['search']['missed'] += not output['search']['met']
+                    if cache is not None and stat is not None:
+                        cache.store(
+                            input_path,
+                            cache_keys[(fmt, output['width'])],
+                            stat,
+                            file_record['content_hash'],
+                            output['output_path']
+                        )
+                else:
+                    results['formats'][fmt]['failures'] += 1
+                    add_error({
+                        'file': str(input_path),
+                        'format': fmt if output['width'] is None else f"{fmt}@{output['width']}w",
+                        'error': output['message'],
+                        'type': output['error_type']
+                    })
+
+            animation = file_record.get('animation')
+            if animation is not None:
+                counts = results.setdefault(
+                    'animation', {'animations': 0, 'frames': 0, 'duplicate_frames': 0}
+                )
+                counts['animations'] += 1
+                counts['frames'] += animation['frames']
+                counts['duplicate_frames'] += animation['frames'] - animation['kept']
+
+            color = file_record.get('color')
+            if color is not None:
+                color_counts = results['color']
+                color_counts[color['status']] += 1
+                if color['cache_hit'] is not None:
+                    color_counts['cache_hits' if color['cache_hit'] else 'cache_misses'] += 1
+                    lookups = color_counts['cache_hits'] + color_counts['cache_misses']
+                    color_counts['cache_hit_rate'] = round(color_counts['cache_hits'] / lookups, 4)
+
+            if 'peak_rss' in results:
+                results['peak_rss'][str(input_path)] = file_record.get('peak_rss')
+
+            if report is not None:
+                report.add(input_path, file_record)
+            if journal is not None:
+                journal.record(input_path, file_record)
 
             # Progress callback
-            if progress_callback:
-                progress_callback(idx + 1, len(image_list), str(input_path.name))
+            advance(input_path)
+
+            if input_path in rep_targets:
+                # Keep only what duplicates need; one of these per distinct input
+                rep_records[input_path] = {
+                    key: file_record[key]
+                    for key in (
+                        'success', 'message', 'error_type', 'pixels', 'content_hash', 'cpu_seconds'
+                    )
+                    if key in file_record
+                }
+                rep_records[input_path]['timings'] = {
+                    'total': file_record.get('timings', {}).get('total', 0.0)
+                }
+                rep_records[input_path]['outputs'] = [
+                    {key: output.get(key) for key in (
+                        'format', 'width', 'success', 'message', 'error_type',
+                        'output_path', 'output_bytes'
+                    )}
+                    for output in outputs
+                ]
+                for job in waiting.pop(input_path, []):
+                    resolve_duplicate(job, input_path)
+
+        if self.max_memory is not None:
+            options = {**options, 'max_memory': self.max_memory}
+            results['peak_rss'] = {}
+
+        try:
+            if self.workers <= 1 or (known_total is not None and known_total <= 1):
+                # Not worth paying process start-up; convert in this process,
+                # which the caller profiles as a whole if at all
+                local_options = {**options, 'profile_dir': None}
+                converter = ImageConverter(fsync=options.get('fsync', False))
+                for job in iter_jobs():
+                    for job_result in convert_chunk([job], local_options, converter, sources):
+                        record(job_result)
+            else:
+                if known_total is None:
+                    chunk_size = STREAM_CHUNK_SIZE
+                else:
+                    chunk_size = max(1, min(MAX_CHUNK_SIZE, known_total // (self.workers * 4)))
+
+                jobs: Iterable[Job] = iter_jobs()
+                if self.max_memory is not None and known_total is not None:
+                    # Largest first, so big images don't straggle at the end
+                    jobs = sorted(jobs, key=self._estimate_job, reverse=True)
+                self._run_parallel(jobs, chunk_size, options, record, sources)
+        except BaseException:
+            if archive_writer is not None:
+                archive_writer.abort()
+            raise
+        finally:
+            if cache is not None:
+                cache.close()
+                results['cache'] = dict(cache.stats)
+        if archive_writer is not None:
+            archive_writer.close()
+            results['archive'] = {
+                'path': str(archive_writer.path),
+                'members': archive_writer.members,
+                'bytes': archive_writer.bytes,
+            }
+        if duplicates is not None:
+            results['dedup']['cpu_seconds_saved'] = round(results['dedup']['cpu_seconds_saved'], 3)
+            results['dedup']['hashed'] = duplicates.hashed
 
         return results
 
+    def _run_parallel(
+        self,
+        jobs: Iterable[Job],
+        chunk_size: int,
+        options: Dict[str, Any],
+        record: Callable[[JobResult], None],
+        sources: Dict[Path, bytes] | None = None,
+    ) -> None:
+        """Convert jobs on a process pool, reporting each result as it completes.
+
+        Jobs are submitted in chunks to amortize inter-process overhead, and
+        are pulled from the iterable lazily, at most MAX_QUEUED_CHUNKS per
+        worker ahead of the results. With a memory budget, a chunk is
+        submitted only once its estimate fits alongside those in flight; a
+        chunk larger than the whole budget waits for an idle pool and runs
+        alone. Without one, chunks holding a huge animation (see
+        is_huge_animation()) run alone. If a worker dies (e.g. a decoder segfault), the pool is
+        restarted for the remaining input and the unfinished jobs are retried
+        one at a time so only the offending file is reported as failed.
+
+        Args:
+            jobs: Iterable of (input_path, output targets) pairs
+            chunk_size: Number of jobs per submitted task
+            options: Processing options (format, quality, etc.)
+            record: Callback receiving each job result
+            sources: Encoded contents of inputs that are not on disk, by
+                input path (see convert_chunk())
+        """
+        if sources is None:
+            sources = {}
+        job_iter = iter(jobs)
+        suspects: List[Job] = []
+
+        def collect(future: Future, chunk: List[Job]) -> None:
+            try:
+                chunk_results = future.result()
+            except BrokenProcessPool:
+                suspects.extend(chunk)
+                return
+            except Exception as e:
+                chunk_results = [
+                    failed_result(input_path, f"Conversion error: {str(e)}")
+                    for input_path, _ in chunk
+                ]
+            for job_result in chunk_results:
+                record(job_result)
+
+        broken = True
+        while broken:
+            broken = False
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=init_worker,
+                initargs=(options.get('fsync', False),)
+            ) as executor:
+                futures: Dict[Future, List[Job]] = {}
+                costs: Dict[Future, int] = {}
+                while chunk := list(islice(job_iter, chunk_size)):
+                    # A worker runs its chunk sequentially, so the chunk
+                    # needs as much as its largest job. Without a budget,
+                    # only huge animations are costed, so they run alone
+                    budget, cost = self.max_memory, 0
+                    if budget is not None:
+                        cost = max(map(self._estimate_job, chunk))
+                    else:
+                        budget = 0
+                        cost = int(any(map(self._is_huge_animation, chunk)))
+                    while futures and sum(costs.values()) + cost > budget:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            costs.pop(future)
+                            collect(future, futures.pop(future))
+
+                    try:
+                        future = executor.submit(
+                            convert_chunk, chunk, options, None, _chunk_sources(chunk, sources)
+                        )
+                    except BrokenProcessPool:
+                        suspects.extend(chunk)
+                        broken = True
+                        break
+                    futures[future] = chunk
+                    costs[future] = cost
+                    while len(futures) >= self.workers * MAX_QUEUED_CHUNKS:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            costs.pop(future)
+                            collect(future, futures.pop(future))
+
+                    # Report whatever finished while we were still reading input
+                    for future in [f for f in futures if f.done()]:
+                        costs.pop(future)
+                        collect(future, futures.pop(future))
+
+                for future in as_completed(futures):
+                    collect(future, futures[future])
+
+        if suspects:
+            self._run_isolated(suspects, options, record, sources)
+
+    def shard_images(
+        self,
+        images: List[Path],
+        root: Path,
+        shard: int,
+        shard_count: int,
+        balance: bool = False,
+    ) -> List[Path]:
+        """Select this node's share of a batch (see partition_images()).
+
+        Args:
+            images: All discovered images
+            root: Directory the images were discovered under
+            shard: Index of this shard in [0, shard_count)
+            shard_count: Number of shards
+            balance: Balance shards by pixel count from the image headers
+                instead of hashing paths
+
+        Returns:
+            Images belonging to the shard, in input order
+        """
+        weights = None
+        if balance:
+            weights = {}
+            for path in images:
+                header = self._headers.get(path) or read_image_header(path)[0]
+                weights[path] = header.pixels if header else 1
+        return partition_images(images, root, shard_count, weights)[shard]
+
+    def _estimate_job(self, job: Job) -> int:
+        """Estimate a job's peak memory from its input header.
+
+        Headers cached during discovery are reused; otherwise the header is
+        read now. Unreadable inputs are estimated at zero (they fail fast).
+        """
+        input_path, targets = job
+        header = self._headers.get(input_path)
+        if header is None:
+            header, _ = read_image_header(input_path)
+            if header is None:
+                return 0
+        return estimate_job_memory(header, len(targets))
+
+    def _is_huge_animation(self, job: Job) -> bool:
+        """Whether a job's input is a huge animation, by its cached header.
+
+        Headers are not read here; inputs without one cached from discovery
+        (or archive reading) are treated as still images.
+        """
+        header = self._headers.get(job[0])
+        return header is not None and is_huge_animation(header)
+
+    def _run_isolated(
+        self,
+        jobs: List[Job],
+        options: Dict[str, Any],
+        record: Callable[[JobResult], None],
+        sources: Dict[Path, bytes] | None = None,
+    ) -> None:
+        """Retry jobs from a crashed pool on a single worker, in order.
+
+        With one worker the first job whose future breaks is the one that
+        crashed it; it is reported as failed and the rest are retried.
+
+        Args:
+            jobs: List of (input_path, output targets) pairs
+            options: Processing options (format, quality, etc.)
+            record: Callback receiving each job result
+            sources: Encoded contents of inputs that are not on disk, by
+                input path (see convert_chunk())
+        """
+        if sources is None:
+            sources = {}
+        while jobs:
+            remaining: List[Job] = []
+            with ProcessPoolExecutor(
+                max_workers=1, initializer=init_worker, initargs=(options.get('fsync', False),)
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        convert_chunk, [job], options, None, _chunk_sources([job], sources)
+                    )
+                    for job in jobs
+                ]
+                for idx, future in enumerate(futures):
+                    try:
+                        chunk_results = future.result()
+                    except BrokenProcessPool:
+                        record(failed_result(
+                            jobs[idx][0], "Conversion error: worker process crashed"
+                        ))
+                        remaining = jobs[idx + 1:]
+                        break
+                    except Exception as e:
+                        chunk_results = [failed_result(jobs[idx][0], f"Conversion error: {str(e)}")]
+                    for job_result in chunk_results:
+                        record(job_result)
+            jobs = remaining
+
     def generate_output_path(
-        self, input_path: Path, output_dir: Path, format: str
+        self,
+        input_path: Path,
+        output_dir: Path,
+        format: str,
+        reserved: Set[Path] | None = None,
+        width: int | None = None,
     ) -> Path:
         """Generate output path for a converted image.
 
+        Lists output_dir on every call; batches use one OutputPathAllocator
+        instead (see process_batch()).
+
         Args:
             input_path: Input image path
             output_dir: Output directory
             format: Output format
+            reserved: Paths already handed out in this batch but not yet written
+            width: Width of a resized variant, added to the name as "_{width}w"
 
         Returns:
             Output file path
         """
-        stem = input_path.stem
-
-        # Map format to extension
-        ext_map = {
-            'webp': '.webp',
-            'jpeg': '.jpg',
-            'jpeg-xl': '.jxl',
-            'avif': '.avif',
-            'png': '.png'
-        }
-        ext = ext_map.get(format, '.webp')
-
-        output_path = output_dir / f"{stem}{ext}"
-
-        # Handle name collisions
-        counter = 1
-        while output_path.exists():
-            output_path = output_dir / f"{stem}_{counter}{ext}"
-            counter += 1
-
-        return output_path
+        allocator = OutputPathAllocator(output_dir)
+        for path in reserved or ():
+            allocator.reserve(path)
+        return allocator.allocate(input_path, FORMAT_EXTENSIONS.get(format, '.webp'), width)
@@ -0,0 +1,254 @@
+"""Quality search: find the encoder quality that meets a size or SSIM target."""
+
+import io
+import math
+from typing import Any, Callable, Dict, Tuple
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:  # Optional; only SSIM targets need it
+    np = None
+
+# Early search steps encode a proxy downscaled to about this many pixels
+PROXY_PIXELS = 250_000
+
+# SSIM is computed on a luma plane downsampled to at most this long side
+SSIM_MAX_SIDE = 512
+
+# Side of the (uniform) SSIM window
+SSIM_WINDOW = 8
+
+# Full-resolution steps search this far either side of the proxy's estimate
+REFINE_RADIUS = 6
+
+MIN_QUALITY = 1
+MAX_QUALITY = 100
+
+# Encodes an image at a quality and returns the encoded bytes
+Encoder = Callable[[Image.Image, int], bytes]
+
+
+def ssim_available() -> bool:
+    """Whether SSIM targets can be used (NumPy is installed)."""
+    return np is not None
+
+
+def luma_plane(img: Image.Image, size: Tuple[int, int]) -> Any:
+    """Get an image's luma, resized to size, as a float array."""
+    plane = img.convert('L')
+    if plane.size != size:
+        plane = plane.resize(size, Image.Resampling.BOX)
+    return np.asarray(plane, dtype=np.float64)
+
+
+def ssim(a: Any, b: Any) -> float:
+    """Mean structural similarity of two equally sized luma planes.
+
+    Window statistics use a uniform window computed from integral images,
+    so the cost is a few vectorized passes over the plane.
+    """
+    window = min(SSIM_WINDOW, *a.shape)
+
+    def window_mean(x: Any) -> Any:
+        integral = np.pad(x.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+        total = (
+            integral[window:, window:] - integral[:-window, window:]
+            - integral[window:, :-window] + integral[:-window, :-window]
+        )
+        return total / (window * window)
+
+    mu_a, mu_b = window_mean(a), window_mean(b)
+    var_a = window_mean(a * a) - mu_a * mu_a
+    var_b = window_mean(b * b) - mu_b * mu_b
+    covariance = window_mean(a * b) - mu_a * mu_b
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    index = ((2 * mu_a * mu_b + c1) * (2 * covariance + c2)) / (
+        (mu_a * mu_a + mu_b * mu_b + c1) * (var_a + var_b + c2)
+    )
+    return float(index.mean())
+
+
+def _bisect(lo: int, hi: int, passes: Callable[[int], bool], highest: bool) -> int | None:
+    """Find the highest (or lowest) quality in [lo, hi] that passes.
+
+    passes() must be monotone: true up to some quality and false above it
+    when looking for the highest, the reverse when looking for the lowest.
+    """
+    best = None
+    while lo <= hi:
+        quality = (lo + hi) // 2
+        if passes(quality):
+            best = quality
+            lo, hi = (quality + 1, hi) if highest else (lo, quality - 1)
+        else:
+            lo, hi = (lo, quality - 1) if highest else (quality + 1, hi)
+    return best
+
+
+def _proxy(img: Image.Image) -> Image.Image:
+    """Downscale an image to about PROXY_PIXELS with a cheap box filter."""
+    factor = math.isqrt(img.width * img.height // PROXY_PIXELS)
+    if factor < 2:
+        return img
+    if img.mode in ('P', '1'):
+        img = img.convert('RGBA' if img.mode == 'P' else 'L')
+    return img.reduce(factor)
+
+
+def search_quality(
+    img: Image.Image,
+    encode: Encoder,
+    max_bytes: int | None = None,
+    min_ssim: float | None = None,
+) -> Tuple[int, Dict[str, Any], bytes | None]:
+    """Find the quality that meets a size cap and/or an SSIM floor.
+
+    The search bisects quality on a downscaled proxy first (for a size
+    target, its bytes are scaled by the pixel ratio, calibrated with one
+    full-resolution encode). A full-resolution encode at the proxy's
+    estimate then shows which side of it the answer is on, and bisection
+    continues up to REFINE_RADIUS steps that way, widening only if the
+    estimate was further off. Each search therefore costs a handful of
+    proxy encodes plus typically three to five full ones, one more for the
+    size target's calibration, and up to seven more when the estimate is
+    far off (as on noisy images, which the proxy smooths).
+
+    With both targets, the size cap is searched first and bounds the SSIM
+    search: if the SSIM floor is missed at the size cap's quality, no
+    quality can meet both and the SSIM search stops there. Every full
+    encode is measured for both targets, so neither search repeats an
+    encode of the other.
+
+    Args:
+        img: Image to encode
+        encode: Encodes an image at a quality
+        max_bytes: Highest quality whose output is at most this many bytes
+        min_ssim: Lowest quality whose output reaches this SSIM (needs NumPy)
+
+    Returns:
+        Tuple of (quality, info, data). With both targets the size cap takes
+        precedence: the lower of the two qualities is used, so the output
+        always fits, but if that is below the SSIM target's quality the SSIM
+        floor is missed. info has 'met' (whether every target holds at the
+        chosen quality), 'decided_by' ('size' or 'ssim', the target whose
+        quality was used), 'encodes' and 'proxy_encodes', plus 'ssim' and
+        'bytes' of the chosen full-resolution encode when measured. data
+        is that encode's output, or None if the chosen quality was not
+        encoded at full resolution.
+
+    Raises:
+        ImportError: If min_ssim is given and NumPy is not installed
+    """
+    if min_ssim is not None and np is None:
+        raise ImportError("SSIM targets require NumPy (pip install imageconverter[quality])")
+    info: Dict[str, Any] = {'encodes': 0, 'proxy_encodes': 0}
+    proxy = _proxy(img)
+    scale = (img.width * img.height) / (proxy.width * proxy.height)
+    correction = 1.0
+    measured: Dict[Tuple[bool, int], Tuple[int, float | None]] = {}
+    # Full-resolution outputs that meet a target, any of which can be chosen
+    encoded: Dict[int, bytes] = {}
+
+    ssim_size = None
+    reference = None
+    if min_ssim is not None:
+        side = max(img.width, img.height)
+        ratio = min(1.0, SSIM_MAX_SIDE / side)
+        ssim_size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+        reference = luma_plane(img, ssim_size)
+
+    def measure(on_proxy: bool, quality: int) -> Tuple[int, float | None]:
+        key = (on_proxy, quality)
+        if key not in measured:
+            data = encode(proxy if on_proxy else img, quality)
+            info['proxy_encodes' if on_proxy else 'encodes'] += 1
+            similarity = None
+            if reference is not None:
+                with Image.open(io.BytesIO(data)) as decoded:
+                    similarity = ssim(reference, luma_plane(decoded, ssim_size))
+            measured[key] = (len(data), similarity)
+            if not on_proxy and (
+                (max_bytes is not None and len(data) <= max_bytes)
+                or (similarity is not None and similarity >= min_ssim)
+            ):
+                encoded[quality] = data
+        return measured[key]
+
+    def size_of(on_proxy: bool, quality: int) -> float:
+        size = measure(on_proxy, quality)[0]
+        return size * scale * correction if on_proxy else size
+
+    def search(
+        passes: Callable[[bool, int], bool], highest: bool, top: int = MAX_QUALITY
+    ) -> int | None:
+        def full(q: int) -> bool:
+            return passes(False, q)
+
+        if proxy is img:
+            return _bisect(MIN_QUALITY, top, full, highest)
+        estimate = _bisect(MIN_QUALITY, top, lambda q: passes(True, q), highest)
+        if estimate is None:
+            estimate = MIN_QUALITY if highest else top
+
+        # One full-resolution encode at the estimate tells which side of it
+        # the answer lies on; search REFINE_RADIUS steps on that side
+        if full(estimate) == highest:
+            lo, hi = estimate, min(top, estimate + REFINE_RADIUS)
+        else:
+            lo, hi = max(MIN_QUALITY, estimate - REFINE_RADIUS), estimate
+        quality = _bisect(lo, hi, full, highest)
+
+        # The estimate can be further off; continue past the window if so
+        if quality is None:
+            if highest:
+                quality = _bisect(MIN_QUALITY, lo - 1, full, highest)
+            else:
+                quality = _bisect(hi + 1, top, full, highest)
+        elif highest and quality == hi < top:
+            quality = _bisect(hi, top, full, highest)
+        elif not highest and quality == lo > MIN_QUALITY:
+            quality = _bisect(MIN_QUALITY, lo, full, highest)
+        return quality
+
+    candidates: Dict[str, int] = {}
+    info['met'] = True
+    if max_bytes is not None:
+        def fits(on_proxy: bool, q: int) -> bool:
+            return size_of(on_proxy, q) <= max_bytes
+
+        if proxy is not img:
+            # Bytes per pixel differ between the proxy and the full image;
+            # calibrate the proxy's scale with one full encode at its estimate
+            estimate = _bisect(MIN_QUALITY, MAX_QUALITY, lambda q: fits(True, q), True)
+            estimate = estimate or MIN_QUALITY
+            correction = size_of(False, estimate) / size_of(True, estimate)
+        quality = search(fits, highest=True)
+        info['met'] = info['met'] and quality is not None
+        candidates['size'] = quality if quality is not None else MIN_QUALITY
+    if min_ssim is not None:
+        def similar(on_proxy: bool, q: int) -> bool:
+            return measure(on_proxy, q)[1] >= min_ssim
+
+        # Only qualities up to the size cap's can be chosen; if the floor
+        # is missed there, it is missed at all of them
+        top = candidates.get('size', MAX_QUALITY)
+        quality = None
+        if top == MAX_QUALITY or similar(False, top):
+            quality = search(similar, highest=False, top=top)
+        info['met'] = info['met'] and quality is not None
+        candidates['ssim'] = quality if quality is not None else MAX_QUALITY
+
+    # The size cap wins; below the SSIM target's quality the floor is missed
+    if candidates.get('size', MAX_QUALITY) < candidates.get('ssim', MIN_QUALITY):
+        info['met'] = False
+    if candidates:
+        info['decided_by'] = min(candidates, key=candidates.get)
+    quality = min(candidates.values()) if candidates else MAX_QUALITY
+    if (False, quality) in measured:
+        size, similarity = measured[(False, quality)]
+        info['bytes'] = size
+        if similarity is not None:
+            info['ssim'] = round(similarity, 5)
+    return quality, info, encoded.get(quality)
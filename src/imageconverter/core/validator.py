@@ -1,37 +1,111 @@
 """Image file validation utilities."""
 
+import io
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Tuple
-from PIL import Image
+from .plugins import open_image
 
 
 # Supported image extensions
 SUPPORTED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.avif', '.jxl', '.bmp', '.tiff', '.tif', '.gif'}
 
 
-def is_valid_image(filepath: Path) -> Tuple[bool, str]:
-    """Validate if a file is a valid image (any format supported by PIL).
+@dataclass(frozen=True)
+class ImageHeader:
+    """Lightweight description of an image, read without decoding pixels."""
 
-    Args:
-        filepath: Path to the image file
+    path: Path
+    format: str
+    width: int
+    height: int
+    mode: str
+    file_size: int
+    frames: int = 1
+
+    @property
+    def pixels(self) -> int:
+        """Number of pixels in the (first frame of the) image."""
+        return self.width * self.height
+
+
+def _check_file(filepath: Path) -> str:
+    """Run the filesystem and extension checks shared by all validators.
 
     Returns:
-        Tuple of (is_valid, error_message). If valid, error_message is empty.
+        Error message, or an empty string if the checks pass
     """
-    # Basic checks
     if not filepath.exists():
-        return False, "File does not exist"
+        return "File does not exist"
 
     if not filepath.is_file():
-        return False, "Path is not a file"
+        return "Path is not a file"
 
     # Check if extension is supported
     if filepath.suffix.lower() not in SUPPORTED_EXTENSIONS:
-        return False, f"Unsupported file extension: {filepath.suffix}"
+        return f"Unsupported file extension: {filepath.suffix}"
+
+    return ""
+
+
+def read_image_header(filepath: Path, data: bytes | None = None) -> Tuple[ImageHeader | None, str]:
+    """Sniff an image's format, dimensions, mode and frame count from its header.
+
+    Only the magic bytes and header are read (an animated GIF is read
+    through to count its frames); pixel data is not decoded, so truncated
+    or corrupt image data is not detected here. The full check
+    happens when the image is decoded for conversion.
+
+    Args:
+        filepath: Path to the image file
+        data: The file's contents, for an image not on disk (e.g. an archive
+            member); filepath then only names it
+
+    Returns:
+        Tuple of (header, error_message). If invalid, header is None.
+    """
+    error = _check_file(filepath) if data is None else ""
+    if error:
+        return None, error
+
+    try:
+        with open_image(filepath if data is None else io.BytesIO(data)) as img:
+            header = ImageHeader(
+                path=filepath,
+                format=img.format or "",
+                width=img.width,
+                height=img.height,
+                mode=img.mode,
+                file_size=filepath.stat().st_size if data is None else len(data),
+                frames=img.n_frames if getattr(img, "is_animated", False) else 1,
+            )
+        return header, ""
+    except Exception as e:
+        return None, f"Unrecognized image: {str(e)}"
+
+
+def is_valid_image(filepath: Path, verify: bool = True) -> Tuple[bool, str]:
+    """Validate if a file is a valid image (any format supported by PIL).
+
+    Args:
+        filepath: Path to the image file
+        verify: Run PIL's full integrity check. When False, only the header
+            is sniffed (see read_image_header()).
+
+    Returns:
+        Tuple of (is_valid, error_message). If valid, error_message is empty.
+    """
+    if not verify:
+        header, error = read_image_header(filepath)
+        return header is not None, error
+
+    error = _check_file(filepath)
+    if error:
+        return False, error
 
     # Try to open and verify image with PIL
     try:
-        with Image.open(filepath) as img:
+        with open_image(filepath) as img:
             img.verify()
         return True, ""
     except Exception as e:
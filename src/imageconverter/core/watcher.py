@@ -0,0 +1,391 @@
+"""Hot-folder watching: convert images as they appear in a directory."""
+
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+from ..utils.cache import ConversionCache, hash_file, options_key
+from ..utils.paths import OutputPathAllocator
+from .converter import OutputTarget
+from .discovery import scan_images
+from .processor import (
+    FORMAT_EXTENSIONS,
+    Job,
+    convert_chunk,
+    failed_result,
+    init_worker,
+    output_size,
+    parse_formats,
+)
+from .validator import read_image_header
+
+# A file's (size, mtime_ns); a change in either means it is being written
+Signature = Tuple[int, int]
+
+# An output variant: (format, width or None for full size)
+Variant = Tuple[str, int | None]
+
+# Window over which the running throughput is measured
+THROUGHPUT_WINDOW = 60.0
+
+# Recent conversion latencies kept for percentiles
+LATENCY_SAMPLES = 1000
+
+
+def _init_watch_worker(fsync: bool = False) -> None:
+    """Initialize a worker that leaves Ctrl+C to the watcher process.
+
+    The watcher finishes conversions in flight on interrupt, so the workers
+    must not die with it.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_worker(fsync)
+
+
+class FolderWatcher:
+    """Polls a directory and converts new or changed images on a warm pool.
+
+    A file is converted once its size and modification time have stayed the
+    same for settle_time seconds, so files still being copied in are left
+    alone. Worker processes (and their ImageConverter) are started once and
+    reused for every file. A changed input overwrites its previous outputs.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        options: Dict[str, Any],
+        workers: int | None = None,
+        recursive: bool = True,
+        poll_interval: float = 1.0,
+        settle_time: float = 2.0,
+        on_result: Callable[[Path, Dict[str, Any]], None] | None = None,
+    ) -> None:
+        """Initialize the watcher and start its worker pool.
+
+        Args:
+            root: Directory to watch
+            options: Processing options, as for BatchProcessor.process_batch()
+            workers: Number of worker processes (None = CPU count - 1)
+            recursive: Watch subdirectories too
+            poll_interval: Seconds between directory scans
+            settle_time: Seconds a file must stay unchanged before conversion
+            on_result: Optional callback for each finished (input, result record)
+        """
+        if workers is None:
+            workers = max(1, os.cpu_count() - 1 if os.cpu_count() else 1)
+        self.root = root
+        self.options = options
+        self.workers = workers
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.on_result = on_result
+
+        output_dir = Path(options['output_dir'])
+        self._output_prefix = os.path.join(os.path.abspath(output_dir), '')
+        self._allocator = OutputPathAllocator(
+            output_dir,
+            options.get('filename_pattern'),
+            Path(options['mirror_root']) if options.get('mirror_root') else None,
+        )
+        widths = sorted(set(options.get('sizes') or [])) or [None]
+        self._variants = [(fmt, width) for fmt in parse_formats(options['format']) for width in widths]
+        self._cache = ConversionCache(options.get('cache_path')) if options.get('incremental') else None
+        self._cache_keys = {
+            (fmt, width): options_key({**options, 'format': fmt, 'width': width})
+            for fmt, width in self._variants
+        }
+
+        # Signature each input was last converted at, and where it went
+        self._done: Dict[Path, Signature] = {}
+        self._targets: Dict[Path, Dict[Variant, Path | None]] = {}
+        # Files seen changing: signature and when it last changed
+        self._settling: Dict[Path, Tuple[Signature, float]] = {}
+        self._first_seen: Dict[Path, float] = {}
+        self._ready: Deque[Path] = deque()
+        self._in_flight: Dict[Future, Tuple[Job, Signature]] = {}
+
+        self._counters = {'detected': 0, 'converted': 0, 'failed': 0, 'skipped': 0}
+        self._completions: Deque[float] = deque()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._started = time.monotonic()
+        self._executor = self._start_pool()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        """Start the worker pool and make every worker start up now."""
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_watch_worker,
+            initargs=(self.options.get('fsync', False),)
+        )
+        wait([executor.submit(os.getpid) for _ in range(self.workers)])
+        return executor
+
+    def scan(self) -> Dict[Path, Signature]:
+        """Stat every image under the root, skipping the output directory.
+
+        Returns:
+            Mapping of path to (size, mtime_ns)
+        """
+        snapshot = {}
+        for path in scan_images(self.root, recursive=self.recursive):
+            if os.path.abspath(path).startswith(self._output_prefix):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Removed since it was listed
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def poll(self) -> None:
+        """Scan once, queue settled files and collect finished conversions."""
+        now = time.monotonic()
+        snapshot = self.scan()
+
+        for path, signature in snapshot.items():
+            if self._done.get(path) == signature:
+                continue
+            previous = self._settling.get(path)
+            if previous is None or previous[0] != signature:
+                if path not in self._first_seen:
+                    self._first_seen[path] = now
+                    self._counters['detected'] += 1
+                # A file last modified long enough ago (e.g. present at
+                # start-up) has already settled
+                age = time.time() - signature[1] / 1e9
+                changed_at = now - age if previous is None else now
+                self._settling[path] = (signature, changed_at)
+                previous = self._settling[path]
+            if now - previous[1] >= self.settle_time:
+                del self._settling[path]
+                self._done[path] = signature
+                self._ready.append(path)
+
+        # Forget files that were deleted
+        for path in [path for path in self._settling if path not in snapshot]:
+            del self._settling[path]
+            self._first_seen.pop(path, None)
+
+        self._collect(timeout=0)
+        self._submit()
+
+    def _submit(self) -> None:
+        """Hand ready files to the pool, keeping at most two per worker queued."""
+        while self._ready and len(self._in_flight) < self.workers * 2:
+            path = self._ready.popleft()
+            try:
+                job = self._job(path)
+            except OSError as e:
+                # Moved or deleted since the scan
+                _, record = failed_result(path, f"Conversion error: {str(e)}")
+                self._finish(path, self._done[path], record)
+                continue
+            if job is None:
+                self._counters['skipped'] += 1
+                self._first_seen.pop(path, None)
+                continue
+            try:
+                future = self._executor.submit(convert_chunk, [job], self.options)
+            except BrokenProcessPool:
+                self._restart_pool([])
+                future = self._executor.submit(convert_chunk, [job], self.options)
+            self._in_flight[future] = (job, self._done[path])
+
+    def _job(self, path: Path) -> Job | None:
+        """Build a job, reusing the file's previous output paths if it changed.
+
+        Returns:
+            The job, or None if the incremental cache shows it is up to date
+        """
+        previous = self._targets.get(path)
+        if previous is None:
+            previous = dict.fromkeys(self._variants)
+            if self._cache is not None:
+                # First sight since start-up; an earlier run may have done it
+                try:
+                    stat = path.stat()
+                except OSError:
+                    return None
+                stale = False
+                for variant in self._variants:
+                    up_to_date, entry = self._cache.check(path, self._cache_keys[variant], stat)
+                    stale = stale or not up_to_date
+                    if entry is not None:
+                        previous[variant] = entry.output_path
+                if not stale:
+                    self._targets[path] = previous
+                    return None
+
+        source_size = None
+        if self._allocator.needs_size:
+            header, _ = read_image_header(path)
+            source_size = (header.width, header.height) if header else None
+        content_hash = hash_file(path) if self._allocator.needs_hash else None
+
+        targets = []
+        for (fmt, width), output_path in previous.items():
+            if output_path is None:
+                output_path = self._allocator.allocate(
+                    path,
+                    FORMAT_EXTENSIONS.get(fmt, '.webp'),
+                    width,
+                    output_size(source_size, width),
+                    content_hash
+                )
+            else:
+                self._allocator.reserve(output_path)
+            targets.append(OutputTarget(fmt, output_path, width))
+        self._targets[path] = {(target.format, target.width): target.path for target in targets}
+        return path, targets
+
+    def _collect(self, timeout: float | None) -> None:
+        """Record conversions that have finished."""
+        if not self._in_flight:
+            return
+        done, _ = wait(self._in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        crashed = []
+        for future in done:
+            job, signature = self._in_flight.pop(future)
+            try:
+                (_, record), = future.result()
+            except BrokenProcessPool:
+                crashed.append((job, signature))
+                continue
+            except Exception as e:
+                # E.g. the input was deleted before it could be hashed
+                _, record = failed_result(job[0], f"Conversion error: {str(e)}")
+            self._finish(job[0], signature, record)
+        if crashed:
+            self._restart_pool(crashed)
+
+    def _finish(self, path: Path, signature: Signature, record: Dict[str, Any]) -> None:
+        """Update counters and the cache for one finished file."""
+        now = time.monotonic()
+        self._counters['converted' if record['success'] else 'failed'] += 1
+        self._completions.append(now)
+        first_seen = self._first_seen.pop(path, None)
+        if first_seen is not None:
+            self._latencies.append(now - first_seen)
+
+        if self._cache is not None and record.get('content_hash'):
+            try:
+                stat = path.stat()
+            except OSError:
+                stat = None  # Deleted meanwhile
+            if stat is not None and (stat.st_size, stat.st_mtime_ns) == signature:
+                for output in record.get('outputs', []):
+                    if output['success']:
+                        self._cache.store(
+                            path,
+                            self._cache_keys[(output['format'], output['width'])],
+                            stat,
+                            record['content_hash'],
+                            output['output_path']
+                        )
+                self._cache.commit()
+
+        if self.on_result:
+            self.on_result(path, record)
+
+    def _restart_pool(self, crashed: List[Tuple[Job, Signature]]) -> None:
+        """Replace a broken pool and retry the files that were on it.
+
+        Any of the files in flight may have crashed the worker, so each is
+        converted again on its own (as BatchProcessor._run_isolated() does);
+        only a file that crashes a worker by itself is reported as failed.
+        This blocks polling until the retries finish.
+
+        Args:
+            crashed: Files whose futures already failed with the pool
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        suspects = crashed + list(self._in_flight.values())
+        self._in_flight.clear()
+        self._executor = self._start_pool()
+        for job, signature in suspects:
+            try:
+                (_, record), = self._executor.submit(convert_chunk, [job], self.options).result()
+            except BrokenProcessPool:
+                _, record = failed_result(job[0], "Conversion error: worker process crashed")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._start_pool()
+            except Exception as e:
+                _, record = failed_result(job[0], f"Conversion error: {str(e)}")
+            self._finish(job[0], signature, record)
+
+    def stats(self) -> Dict[str, Any]:
+        """Running counters.
+
+        Returns:
+            Dictionary with detected/converted/failed totals, queue_depth
+            (settling + waiting + converting), in_flight, throughput_per_min
+            over the last minute, latency_p50/p95 (seconds from first
+            detection to finished output) and uptime
+        """
+        now = time.monotonic()
+        while self._completions and now - self._completions[0] > THROUGHPUT_WINDOW:
+            self._completions.popleft()
+        window = min(THROUGHPUT_WINDOW, now - self._started) or 1.0
+        latencies = sorted(self._latencies)
+
+        def percentile(fraction: float) -> float | None:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 3)
+
+        return {
+            **self._counters,
+            'queue_depth': len(self._settling) + len(self._ready) + len(self._in_flight),
+            'in_flight': len(self._in_flight),
+            'throughput_per_min': round(len(self._completions) * 60 / window, 1),
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'uptime': round(now - self._started, 1),
+        }
+
+    def run(
+        self,
+        stop: threading.Event | None = None,
+        on_tick: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> None:
+        """Watch until stopped (or interrupted).
+
+        Args:
+            stop: Event that ends the loop when set (None = run until interrupted)
+            on_tick: Optional callback receiving stats() after every poll
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            deadline = time.monotonic() + self.poll_interval
+            self.poll()
+            # Collect results as they finish until the next scan is due
+            while (remaining := deadline - time.monotonic()) > 0 and not stop.is_set():
+                if self._in_flight:
+                    self._collect(timeout=remaining)
+                    self._submit()
+                else:
+                    stop.wait(remaining)
+            if on_tick:
+                on_tick(self.stats())
+
+    def close(self) -> None:
+        """Finish conversions in flight and stop the worker pool."""
+        while self._in_flight:
+            self._collect(timeout=None)
+        self._executor.shutdown()
+        if self._cache is not None:
+            self._cache.close()
+
+    def __enter__(self) -> "FolderWatcher":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -5,7 +5,7 @@ import tkinter as tk
 from pathlib import Path
 from tkinter import ttk, filedialog, messagebox
 
-from .core.processor import BatchProcessor
+from .core.config import Config
 
 
 class ImageConverterGUI:
@@ -18,8 +18,8 @@ class ImageConverterGUI:
         self.root.geometry("800x600")
         self.root.minsize(600, 400)
 
-        # Processing state
-        self.processor = BatchProcessor()
+        # Processing state (the core package is imported when a conversion
+        # starts, so the window opens without loading Pillow)
         self.processing = False
         self.cancel_processing = False
 
@@ -131,6 +131,8 @@ class ImageConverterGUI:
 
     def _conversion_thread(self) -> None:
         """Background conversion thread."""
+        from .core.processor import BatchProcessor
+
         try:
             folder = Path(self.folder_path.get())
             format_type = self.format_var.get()
@@ -159,6 +161,7 @@ class ImageConverterGUI:
                 'format': format_type,
                 'quality': quality,
                 'lossless': lossless,
+                'effort': Config.load().effort,
                 'output_dir': str(output_dir),
             }
 
@@ -0,0 +1,422 @@
+"""Local HTTP conversion service backed by a persistent worker pool.
+
+POST /convert?format=webp&quality=85&lossless=0&effort=balanced with the image as the
+request body returns the converted image. GET /metrics reports request
+counters and latency percentiles in the Prometheus text format, and
+GET /healthz answers "ok".
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from typing import Any, Deque, Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .core.config import EFFORT_LEVELS
+from .core.converter import ImageConverter
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Largest accepted request body
+DEFAULT_MAX_BODY = 64 * 1024 * 1024
+
+# Conversions admitted per worker (running or waiting) before answering 429
+DEFAULT_QUEUE_PER_WORKER = 4
+
+# Request bodies are read in chunks of this size
+READ_CHUNK_SIZE = 64 * 1024
+
+# Recent request latencies kept for the /metrics percentiles
+LATENCY_SAMPLES = 2048
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+
+MAX_HEADERS = 100
+
+CONTENT_TYPES = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "jpeg-xl": "image/jxl",
+    "avif": "image/avif",
+    "png": "image/png",
+}
+
+# Workers start from a fork server rather than from the server process, so
+# they never inherit open client connections (a pool restarted while
+# connections are open would otherwise keep them from closing)
+_POOL_CONTEXT = (
+    multiprocessing.get_context("forkserver")
+    if "forkserver" in multiprocessing.get_all_start_methods() else None
+)
+
+# One converter per worker process, created by the pool initializer
+_server_converter: ImageConverter | None = None
+
+
+def _init_server_worker() -> None:
+    """Create the worker's ImageConverter; Ctrl+C is left to the server."""
+    global _server_converter
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _server_converter = ImageConverter()
+
+
+def _convert_request(
+    data: bytes, output_format: str, quality: int, lossless: bool, effort: str
+) -> Tuple[bool, bytes | str, str]:
+    """Convert one request body inside a worker process.
+
+    Returns:
+        Tuple of (success, encoded bytes or error message, error_type)
+    """
+    record = _server_converter.convert_buffer(
+        data, output_format, quality, lossless, effort=effort
+    )
+    if record["success"]:
+        return True, record["outputs"][0]["data"], ""
+    return False, record["message"], record["error_type"]
+
+
+class HTTPError(Exception):
+    """An error answered with an HTTP status and a plain-text message.
+
+    Unless body_read is set, the request body may still be unread, so the
+    connection is closed after the response instead of parsing the rest of
+    the body as the next request.
+    """
+
+    def __init__(self, status: HTTPStatus, message: str = "", body_read: bool = False) -> None:
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+        self.body_read = body_read
+
+
+class ConversionServer:
+    """asyncio HTTP server that converts images on a pre-started process pool.
+
+    At most queue_size conversions are admitted at a time (running or
+    waiting for a worker); further requests get 429 before their body is
+    read, so a saturated server sheds load instead of buffering it.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        workers: int | None = None,
+        queue_size: int | None = None,
+        max_body: int = DEFAULT_MAX_BODY,
+        effort: str = "balanced",
+    ) -> None:
+        """Initialize the server.
+
+        Args:
+            host: Address to listen on (localhost by default)
+            port: Port to listen on
+            workers: Number of worker processes (None = CPU count - 1)
+            queue_size: Conversions admitted at once (None = 4 per worker)
+            max_body: Largest accepted request body in bytes
+            effort: Encoder effort preset for requests that do not pass one
+        """
+        if workers is None:
+            workers = max(1, os.cpu_count() - 1 if os.cpu_count() else 1)
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_size = queue_size or workers * DEFAULT_QUEUE_PER_WORKER
+        self.max_body = max_body
+        self.effort = effort
+
+        self._executor: ProcessPoolExecutor | None = None
+        self._admitted = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        self._responses: Dict[int, int] = {}
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._started = time.monotonic()
+
+    def _start_pool(self, block: bool = True) -> ProcessPoolExecutor:
+        """Start the worker pool and make every worker start up now.
+
+        Args:
+            block: Wait until every worker is up; otherwise they start in
+                the background (for restarts from the event loop)
+        """
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=_POOL_CONTEXT, initializer=_init_server_worker
+        )
+        warm_up = [executor.submit(os.getpid) for _ in range(self.workers)]
+        if block:
+            wait(warm_up)
+        return executor
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> None:
+        """Replace a crashed pool, unless another request already did.
+
+        Every request in flight on a crashed pool fails with it; only the
+        first to notice replaces it, so requests already queued on the new
+        pool are not cancelled.
+        """
+        if self._executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._start_pool(block=False)
+
+    async def serve_forever(self) -> None:
+        """Start the pool and serve until cancelled."""
+        self._executor = self._start_pool()
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._executor.shutdown(cancel_futures=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of one (keep-alive) connection."""
+        try:
+            while True:
+                request = await self._read_head(reader)
+                if request is None:
+                    break
+                method, target, headers = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, body, content_type = await self._dispatch(
+                        method, target, headers, reader, writer
+                    )
+                except HTTPError as e:
+                    status, body, content_type = e.status, e.message.encode(), "text/plain"
+                    if not e.body_read:
+                        keep_alive = False
+                await self._respond(writer, status, body, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, HTTPError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_head(
+        self, reader: asyncio.StreamReader
+    ) -> Tuple[str, str, Dict[str, str]] | None:
+        """Read a request line and headers, or None at end of connection."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method.upper(), target, headers
+
+    async def _dispatch(
+        self,
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> Tuple[HTTPStatus, bytes, str]:
+        """Route a request, returning (status, body, content type)."""
+        url = urlsplit(target)
+        if url.path == "/convert":
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            return await self._convert(parse_qs(url.query), headers, reader, writer)
+        if method != "GET":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        if url.path == "/metrics":
+            return HTTPStatus.OK, self.metrics().encode(), "text/plain; version=0.0.4"
+        if url.path == "/healthz":
+            return HTTPStatus.OK, b"ok", "text/plain"
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    async def _convert(
+        self,
+        query: Dict[str, list],
+        headers: Dict[str, str],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> Tuple[HTTPStatus, bytes, str]:
+        """Handle POST /convert."""
+        output_format = query.get("format", ["webp"])[0].lower()
+        if output_format not in ImageConverter.SUPPORTED_FORMATS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unsupported format: {output_format}")
+        try:
+            quality = int(query.get("quality", ["85"])[0])
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "quality must be an integer")
+        lossless = query.get("lossless", ["0"])[0].lower() in ("1", "true", "yes")
+        effort = query.get("effort", [self.effort])[0].lower()
+        if effort not in EFFORT_LEVELS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown effort preset: {effort}")
+
+        # Backpressure: refuse before reading the body
+        if self._admitted >= self.queue_size:
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "Server busy, retry later")
+        self._admitted += 1
+        start = time.monotonic()
+        try:
+            if headers.get("expect", "").lower() == "100-continue":
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            data = await self._read_body(reader, headers)
+            self._bytes_in += len(data)
+
+            loop = asyncio.get_running_loop()
+            executor = self._executor
+            try:
+                success, result, error_type = await loop.run_in_executor(
+                    executor, _convert_request,
+                    data, output_format, quality, lossless, effort
+                )
+            except BrokenProcessPool:
+                self._replace_pool(executor)
+                raise HTTPError(
+                    HTTPStatus.SERVICE_UNAVAILABLE, "Worker process crashed", body_read=True
+                )
+            except asyncio.CancelledError:
+                if self._executor is executor:
+                    raise  # The request itself was cancelled (server shutdown)
+                # Queued on a pool that was replaced after a crash
+                raise HTTPError(
+                    HTTPStatus.SERVICE_UNAVAILABLE, "Worker process crashed", body_read=True
+                )
+        finally:
+            self._admitted -= 1
+
+        if not success:
+            status = (
+                HTTPStatus.UNPROCESSABLE_ENTITY if error_type == "validation"
+                else HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+            raise HTTPError(status, result, body_read=True)
+
+        elapsed = time.monotonic() - start
+        self._latencies.append(elapsed)
+        self._latency_sum += elapsed
+        self._latency_count += 1
+        self._bytes_out += len(result)
+        return HTTPStatus.OK, result, CONTENT_TYPES[output_format]
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+        """Read a request body (Content-Length or chunked) up to max_body."""
+        body = bytearray()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                try:
+                    size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                except (ValueError, asyncio.LimitOverrunError):
+                    # Not hex, or a chunk-size line longer than the stream limit
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed chunk size")
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # Trailers
+                    break
+                if len(body) + size > self.max_body:
+                    raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                body += await reader.readexactly(size)
+                await reader.readline()
+            return bytes(body)
+
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED)
+        if length > self.max_body:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        while len(body) < length:
+            chunk = await reader.read(min(READ_CHUNK_SIZE, length - len(body)))
+            if not chunk:
+                raise asyncio.IncompleteReadError(bytes(body), length)
+            body += chunk
+        return bytes(body)
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        body: bytes,
+        content_type: str,
+        keep_alive: bool,
+    ) -> None:
+        """Write a complete response."""
+        self._responses[status.value] = self._responses.get(status.value, 0) + 1
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status == HTTPStatus.TOO_MANY_REQUESTS:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        writer.write(body)
+        await writer.drain()
+
+    def metrics(self) -> str:
+        """Render counters and latency percentiles in the Prometheus text format."""
+        latencies = sorted(self._latencies)
+        lines = [
+            "# HELP imageconverter_requests_total HTTP responses by status code.",
+            "# TYPE imageconverter_requests_total counter",
+        ]
+        lines += [
+            f'imageconverter_requests_total{{code="{code}"}} {count}'
+            for code, count in sorted(self._responses.items())
+        ]
+        lines += [
+            "# HELP imageconverter_convert_duration_seconds Latency of successful conversions.",
+            "# TYPE imageconverter_convert_duration_seconds summary",
+        ]
+        for quantile in LATENCY_QUANTILES:
+            value = latencies[min(len(latencies) - 1, int(quantile * len(latencies)))] if latencies else 0.0
+            lines.append(
+                f'imageconverter_convert_duration_seconds{{quantile="{quantile}"}} {value:.6f}'
+            )
+        lines += [
+            f"imageconverter_convert_duration_seconds_sum {self._latency_sum:.6f}",
+            f"imageconverter_convert_duration_seconds_count {self._latency_count}",
+            "# TYPE imageconverter_in_flight gauge",
+            f"imageconverter_in_flight {self._admitted}",
+            "# TYPE imageconverter_queue_capacity gauge",
+            f"imageconverter_queue_capacity {self.queue_size}",
+            "# TYPE imageconverter_workers gauge",
+            f"imageconverter_workers {self.workers}",
+            "# TYPE imageconverter_received_bytes_total counter",
+            f"imageconverter_received_bytes_total {self._bytes_in}",
+            "# TYPE imageconverter_sent_bytes_total counter",
+            f"imageconverter_sent_bytes_total {self._bytes_out}",
+            "# TYPE imageconverter_uptime_seconds gauge",
+            f"imageconverter_uptime_seconds {time.monotonic() - self._started:.1f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def run_server(**kwargs: Any) -> None:
+    """Run a ConversionServer until interrupted.
+
+    Args:
+        **kwargs: Arguments for ConversionServer
+    """
+    try:
+        asyncio.run(ConversionServer(**kwargs).serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,287 @@
+"""Persistent index of completed conversions for incremental runs."""
+
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Tuple
+
+from .paths import get_config_dir
+
+# Options that change the encoded output; a change to any of them is a miss
+CACHE_OPTION_KEYS = (
+    'format', 'width', 'quality', 'lossless', 'effort', 'output_dir',
+    'filename_pattern', 'mirror_root', 'passthrough', 'reencode_threshold',
+    'color_target', 'target_size', 'target_ssim',
+)
+
+# Options that decide where an output goes; an entry that shares these with
+# a miss names the output to overwrite instead of allocating a new name
+DESTINATION_OPTION_KEYS = ('format', 'width', 'output_dir', 'filename_pattern', 'mirror_root')
+
+# Directory options, keyed by their resolved absolute path
+PATH_OPTION_KEYS = ('output_dir', 'mirror_root')
+
+# Pending index updates are committed in batches of this size
+COMMIT_INTERVAL = 500
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Files at least this large are hashed through mmap, skipping read() copies
+HASH_MMAP_MIN_SIZE = 4 * HASH_CHUNK_SIZE
+
+
+def hash_file(path: Path) -> str:
+    """Compute a content hash of a file using mmap or chunked reads.
+
+    Args:
+        path: File to hash
+
+    Returns:
+        Hex digest (BLAKE2b, 128-bit)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= HASH_MMAP_MIN_SIZE:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+                return digest.hexdigest()
+            except (OSError, ValueError):
+                digest = hashlib.blake2b(digest_size=16)  # Not mappable; read it instead
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    """Compute the content hash of in-memory data, matching hash_file()."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _option_value(options: Dict[str, Any], key: str) -> Any:
+    """Get an option as it goes into a cache key (directories resolved)."""
+    value = options.get(key)
+    if key in PATH_OPTION_KEYS and value:
+        value = str(Path(value).resolve())
+    return value
+
+
+def options_key(options: Dict[str, Any]) -> str:
+    """Serialize the output-affecting options into a stable cache key.
+
+    Directories are resolved to absolute paths, so "out" and "./out" give
+    the same key.
+    """
+    return json.dumps(
+        {key: _option_value(options, key) for key in CACHE_OPTION_KEYS}, sort_keys=True
+    )
+
+
+def _destination(key: str) -> Tuple[Any, ...]:
+    """Get the options of a cache key that decide where its output goes."""
+    options = json.loads(key)
+    return tuple(_option_value(options, name) for name in DESTINATION_OPTION_KEYS)
+
+
+class CacheEntry(NamedTuple):
+    """A previously completed conversion."""
+
+    size: int
+    mtime_ns: int
+    content_hash: str
+    output_path: Path
+
+
+class ConversionCache:
+    """SQLite index of converted inputs keyed by path and encode options."""
+
+    def __init__(self, db_path: Path | None = None) -> None:
+        """Open (creating if needed) the cache database.
+
+        Args:
+            db_path: Database file (None = cache.sqlite3 in the config directory)
+        """
+        self.db_path = db_path or get_config_dir() / "cache.sqlite3"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversions (
+                input_path TEXT NOT NULL,
+                options_key TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                output_path TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (input_path, options_key)
+            )
+            """
+        )
+        self._pending = 0
+        self.stats = {"hits": 0, "misses": 0, "changed": 0}
+
+    def lookup(self, input_path: Path, key: str) -> CacheEntry | None:
+        """Fetch the previous conversion of an input with the same options.
+
+        Args:
+            input_path: Input image path
+            key: Options key from options_key()
+
+        Returns:
+            The cache entry, or None if the input was never converted
+        """
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, content_hash, output_path FROM conversions "
+            "WHERE input_path = ? AND options_key = ?",
+            (os.path.abspath(input_path), key),
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(row[0], row[1], row[2], Path(row[3]))
+
+    def lookup_destination(self, input_path: Path, key: str) -> CacheEntry | None:
+        """Fetch a conversion of an input to the same place with other encode options.
+
+        An input converted again with, say, another quality should overwrite
+        its earlier output rather than be written next to it under a new
+        name.
+
+        Args:
+            input_path: Input image path
+            key: Options key from options_key()
+
+        Returns:
+            The cache entry whose output is still on disk, or None
+        """
+        destination = _destination(key)
+        for row in self._conn.execute(
+            "SELECT options_key, size, mtime_ns, content_hash, output_path FROM conversions "
+            "WHERE input_path = ? AND options_key != ?",
+            (os.path.abspath(input_path), key),
+        ):
+            if _destination(row[0]) == destination and os.path.exists(row[4]):
+                return CacheEntry(row[1], row[2], row[3], Path(row[4]))
+        return None
+
+    def check(
+        self, input_path: Path, key: str, stat: os.stat_result
+    ) -> Tuple[bool, CacheEntry | None]:
+        """Decide whether an input can be skipped, updating hit statistics.
+
+        An unchanged size and mtime is trusted without reading the file. If
+        only the mtime moved, the content hash decides.
+
+        Args:
+            input_path: Input image path
+            key: Options key from options_key()
+            stat: Current os.stat() of the input
+
+        Returns:
+            Tuple of (up_to_date, previous entry or None). On a miss, the
+            entry is the input's conversion to the same place with other
+            encode options, if any (see lookup_destination()), so its output
+            is overwritten.
+        """
+        entry = self.lookup(input_path, key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return False, self.lookup_destination(input_path, key)
+
+        up_to_date = False
+        if entry.output_path.exists() and entry.size == stat.st_size:
+            if entry.mtime_ns == stat.st_mtime_ns:
+                up_to_date = True
+            elif hash_file(input_path) == entry.content_hash:
+                # Touched but not modified; remember the new mtime
+                self.store(input_path, key, stat, entry.content_hash, entry.output_path)
+                up_to_date = True
+
+        self.stats["hits" if up_to_date else "changed"] += 1
+        return up_to_date, entry
+
+    def store(
+        self,
+        input_path: Path,
+        key: str,
+        stat: os.stat_result,
+        content_hash: str,
+        output_path: Path,
+    ) -> None:
+        """Record a completed conversion.
+
+        Args:
+            input_path: Input image path
+            key: Options key from options_key()
+            stat: os.stat() of the input when it was queued
+            content_hash: Content hash of the input from hash_file()
+            output_path: Path the output was written to
+        """
+        # An entry under other options for the same output now describes
+        # a file that has been overwritten
+        self._conn.execute(
+            "DELETE FROM conversions WHERE input_path = ? AND output_path = ? "
+            "AND options_key != ?",
+            (os.path.abspath(input_path), os.path.abspath(output_path), key),
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                os.path.abspath(input_path),
+                key,
+                stat.st_size,
+                stat.st_mtime_ns,
+                content_hash,
+                os.path.abspath(output_path),
+                time.time(),
+            ),
+        )
+        self._pending += 1
+        if self._pending >= COMMIT_INTERVAL:
+            self.commit()
+
+    def prune(self, older_than_days: float | None = None) -> int:
+        """Remove entries whose input or output no longer exists.
+
+        Args:
+            older_than_days: Also remove entries not refreshed in this many days
+
+        Returns:
+            Number of entries removed
+        """
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        stale = [
+            (input_path, key)
+            for input_path, key, output_path, updated_at in self._conn.execute(
+                "SELECT input_path, options_key, output_path, updated_at FROM conversions"
+            )
+            if (cutoff is not None and updated_at < cutoff)
+            or not os.path.exists(input_path)
+            or not os.path.exists(output_path)
+        ]
+        self._conn.executemany(
+            "DELETE FROM conversions WHERE input_path = ? AND options_key = ?", stale
+        )
+        self._conn.commit()
+        self._conn.execute("VACUUM")
+        return len(stale)
+
+    def commit(self) -> None:
+        """Flush pending updates to disk."""
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        """Commit pending updates and close the database."""
+        self.commit()
+        self._conn.close()
+
+    def __enter__(self) -> "ConversionCache":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
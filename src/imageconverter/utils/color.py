@@ -0,0 +1,186 @@
+"""ICC color management: convert embedded profiles to a target color space."""
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from PIL import Image, ImageCms
+
+# Transforms kept per cache; camera dumps rarely carry more than a few profiles
+TRANSFORM_CACHE_SIZE = 16
+
+# Input mode -> mode of the transformed image
+TRANSFORM_MODES = {
+    'RGB': 'RGB',
+    'RGBA': 'RGBA',
+    'CMYK': 'RGB',
+}
+
+# Cached in place of a transform for profiles ImageCms cannot use
+_UNUSABLE = object()
+
+
+def load_target_profile(target: str) -> ImageCms.ImageCmsProfile:
+    """Load a color-management target.
+
+    Args:
+        target: "srgb", or the path of an ICC profile file
+
+    Returns:
+        The target profile
+
+    Raises:
+        ValueError: If the target is not "srgb" and cannot be read as a profile
+    """
+    if target.lower() == 'srgb':
+        return ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB'))
+    try:
+        return ImageCms.ImageCmsProfile(str(Path(target).expanduser()))
+    except (OSError, ImageCms.PyCMSError) as e:
+        raise ValueError(f"Cannot load ICC profile {target}: {e}")
+
+
+class TransformCache:
+    """LRU cache of ImageCms transforms to one target profile.
+
+    Building a transform (parsing the source profile and precomputing the
+    conversion) costs far more than applying it, and a batch usually shares
+    a handful of profiles across thousands of files. Transforms are keyed by
+    a hash of the source profile bytes and the image mode. Sources already
+    in the target space (identical bytes, or an sRGB profile when the
+    target is sRGB) are remembered as needing no transform.
+    """
+
+    def __init__(self, target: str = 'srgb', maxsize: int = TRANSFORM_CACHE_SIZE) -> None:
+        """Initialize the cache.
+
+        Args:
+            target: "srgb", or the path of an ICC profile file
+            maxsize: Transforms kept before the least recently used is dropped
+
+        Raises:
+            ValueError: If the target profile cannot be loaded
+        """
+        self.target = target
+        self.maxsize = maxsize
+        self.profile = load_target_profile(target)
+        self.profile_bytes = self.profile.tobytes()
+        self._target_hash = hashlib.blake2b(self.profile_bytes, digest_size=16).digest()
+        self._is_srgb = target.lower() == 'srgb'
+        self._transforms: OrderedDict[Tuple[bytes, str], Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, icc_profile: bytes, mode: str) -> Tuple[Any, bool]:
+        """Get the transform for a source profile and image mode.
+
+        Returns:
+            Tuple of (transform, cache hit). The transform is None if the
+            source needs no conversion.
+
+        Raises:
+            ImageCms.PyCMSError: If the source profile is unusable (this is
+                cached too, so a bad profile is only parsed once); the
+                exception's cache_hit attribute says whether it was
+        """
+        key = (hashlib.blake2b(icc_profile, digest_size=16).digest(), mode)
+        with self._lock:
+            hit = key in self._transforms
+            if hit:
+                self._transforms.move_to_end(key)
+                self.stats['hits'] += 1
+                transform = self._transforms[key]
+            else:
+                self.stats['misses'] += 1
+        if hit:
+            return self._checked(transform, True), True
+
+        try:
+            transform = self._build(key[0], icc_profile, mode)
+        except (OSError, ImageCms.PyCMSError):
+            transform = _UNUSABLE
+        with self._lock:
+            self._transforms[key] = transform
+            if len(self._transforms) > self.maxsize:
+                self._transforms.popitem(last=False)
+                self.stats['evictions'] += 1
+        return self._checked(transform, False), False
+
+    @staticmethod
+    def _checked(transform: Any, hit: bool) -> Any:
+        """Pass a cached transform through, raising for an unusable profile."""
+        if transform is _UNUSABLE:
+            error = ImageCms.PyCMSError("Unusable ICC profile")
+            error.cache_hit = hit
+            raise error
+        return transform
+
+    def _build(self, profile_hash: bytes, icc_profile: bytes, mode: str) -> Any:
+        """Build a transform, or None when the source is already the target."""
+        if profile_hash == self._target_hash and mode == TRANSFORM_MODES[mode]:
+            return None
+        source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+        if (
+            self._is_srgb
+            and mode == TRANSFORM_MODES[mode]
+            and ImageCms.getProfileDescription(source).strip().lower().startswith('srgb')
+        ):
+            return None
+        return ImageCms.buildTransform(
+            source,
+            self.profile,
+            mode,
+            TRANSFORM_MODES[mode],
+            renderingIntent=ImageCms.Intent.PERCEPTUAL,
+        )
+
+    def is_target(self, img: Image.Image) -> bool:
+        """Whether convert() would leave an image's pixels as they are.
+
+        Only the image's mode and embedded profile are looked at, so this is
+        cheap on an image that has not been decoded yet.
+        """
+        icc_profile = img.info.get('icc_profile')
+        if not icc_profile or img.mode not in TRANSFORM_MODES:
+            return True
+        try:
+            transform, _ = self.get(icc_profile, img.mode)
+        except (OSError, ImageCms.PyCMSError):
+            return True  # Unusable profile; convert() leaves the image alone
+        return transform is None
+
+    def convert(
+        self, img: Image.Image, metadata: Dict[str, Any]
+    ) -> Tuple[Image.Image, Dict[str, Any]]:
+        """Convert an image's embedded profile to the target.
+
+        metadata['icc_profile'] is replaced by the target profile when the
+        pixels are converted.
+
+        Args:
+            img: Decoded image
+            metadata: Metadata dictionary from extract_metadata()
+
+        Returns:
+            Tuple of (image, info). info['status'] is 'none' (no embedded
+            profile or unsupported mode), 'identity' (already in the target
+            space), 'converted' or 'failed' (unusable profile; image left
+            as is); info['cache_hit'] says whether the transform lookup hit
+            (None when no lookup was needed).
+        """
+        icc_profile = metadata.get('icc_profile')
+        if not icc_profile or img.mode not in TRANSFORM_MODES:
+            return img, {'status': 'none', 'cache_hit': None}
+        hit = None
+        try:
+            transform, hit = self.get(icc_profile, img.mode)
+            if transform is None:
+                return img, {'status': 'identity', 'cache_hit': hit}
+            converted = ImageCms.applyTransform(img, transform)
+        except (OSError, ImageCms.PyCMSError) as e:
+            return img, {'status': 'failed', 'cache_hit': getattr(e, 'cache_hit', hit)}
+        metadata['icc_profile'] = self.profile_bytes
+        return converted, {'status': 'converted', 'cache_hit': hit}
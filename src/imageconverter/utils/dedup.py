@@ -0,0 +1,50 @@
+"""Detection of byte-identical input files."""
+
+from pathlib import Path
+from typing import Dict, List
+
+from .cache import hash_file
+
+
+class DuplicateIndex:
+    """Finds inputs identical to one seen earlier, by size and then content.
+
+    Files are grouped by size first, which costs only a stat, and a file is
+    hashed only when another file of the same size turns up. Most batches
+    therefore hash only a small fraction of their inputs.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._by_size: Dict[int, List[Path]] = {}
+        self._hashes: Dict[Path, str] = {}
+
+    @property
+    def hashed(self) -> int:
+        """Number of files hashed so far."""
+        return len(self._hashes)
+
+    def _hash(self, path: Path) -> str:
+        if path not in self._hashes:
+            self._hashes[path] = hash_file(path)
+        return self._hashes[path]
+
+    def find(self, path: Path, size: int) -> Path | None:
+        """Look up a file among the representatives seen so far.
+
+        Args:
+            path: Input file
+            size: Its size in bytes
+
+        Returns:
+            The earlier file it is identical to, or None; in that case the
+            file becomes the representative of its own content
+        """
+        representatives = self._by_size.setdefault(size, [])
+        if representatives:
+            content_hash = self._hash(path)
+            for representative in representatives:
+                if self._hash(representative) == content_hash:
+                    return representative
+        representatives.append(path)
+        return None
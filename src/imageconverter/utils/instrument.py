@@ -0,0 +1,325 @@
+"""Lightweight per-file instrumentation, run reports and profiling hooks."""
+
+import bisect
+import cProfile
+import heapq
+import itertools
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# Slowest files kept in a JSON (non-streaming) report
+SLOWEST_FILES = 20
+
+# Per-process cProfile profiler used by worker processes
+_worker_profiler: cProfile.Profile | None = None
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per named pipeline stage."""
+
+    def __init__(self, timings: Dict[str, float] | None = None) -> None:
+        """Initialize the timer.
+
+        Args:
+            timings: Existing stage timings to add to (None = start empty)
+        """
+        self.timings: Dict[str, float] = {} if timings is None else timings
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block, adding it to the named stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class _Histogram:
+    """Fixed-bucket latency histogram with count, sum and max."""
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS]
+        labels.append(f">{HISTOGRAM_BUCKETS_MS[-1]}ms")
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class RunReport:
+    """Machine-readable report of a batch run.
+
+    A .jsonl path streams one line per file as results arrive, followed
+    by a summary line, so memory stays flat. Any other path gets a single
+    JSON document with the summary, stage histograms and the slowest files.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Open the report for writing.
+
+        Args:
+            path: Report file (.jsonl for streaming)
+        """
+        self.path = path
+        self.streaming = path.suffix.lower() == ".jsonl"
+        self._stream = open(path, "w", encoding="utf-8") if self.streaming else None
+        self._histograms: Dict[str, _Histogram] = {}
+        self._slowest: List[tuple] = []  # Min-heap of (total, seq, entry)
+        self._seq = itertools.count()
+        self._totals = {"input_bytes": 0, "output_bytes": 0, "pixels": 0}
+        self._started = time.time()
+
+    def add(self, input_path: Path, record: Dict[str, Any]) -> None:
+        """Add one file's result record.
+
+        Args:
+            input_path: Input image path
+            record: Result record from the converter, as returned to process_batch()
+        """
+        entry = file_entry(input_path, record)
+        for stage, seconds in entry["timings"].items():
+            self._histograms.setdefault(stage, _Histogram()).add(seconds)
+        for output in entry["outputs"]:
+            for stage, seconds in output["timings"].items():
+                self._histograms.setdefault(f"output.{stage}", _Histogram()).add(seconds)
+            self._totals["output_bytes"] += output.get("bytes") or 0
+        self._totals["input_bytes"] += entry.get("input_bytes") or 0
+        self._totals["pixels"] += entry.get("pixels") or 0
+
+        if self._stream is not None:
+            self._stream.write(json.dumps(entry) + "\n")
+        else:
+            item = (entry["timings"].get("total", 0.0), next(self._seq), entry)
+            if len(self._slowest) < SLOWEST_FILES:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heappushpop(self._slowest, item)
+
+    def close(self, results: Dict[str, Any]) -> None:
+        """Write the summary and close the report.
+
+        Args:
+            results: Results dictionary returned by process_batch()
+        """
+        elapsed = time.time() - self._started
+        summary = {
+            "type": "summary",
+            "elapsed_s": round(elapsed, 3),
+            "results": {key: value for key, value in results.items() if key != "errors"},
+            "errors": len(results.get("errors", [])),
+            **self._totals,
+            "megapixels_per_s": round(self._totals["pixels"] / 1e6 / elapsed, 3) if elapsed else 0.0,
+            "stages": {name: hist.to_dict() for name, hist in self._histograms.items()},
+        }
+        if self._stream is not None:
+            self._stream.write(json.dumps(summary, default=str) + "\n")
+            self._stream.close()
+        else:
+            summary["slowest_files"] = [entry for *_, entry in sorted(self._slowest, reverse=True)]
+            self.path.write_text(json.dumps(summary, indent=2, default=str), encoding="utf-8")
+
+
+def file_entry(input_path: Path, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a converter result record into a JSON-serializable report entry."""
+    return {
+        "file": str(input_path),
+        "success": record["success"],
+        "error": record["message"] if not record["success"] else "",
+        "worker": record.get("worker"),
+        "input_bytes": record.get("input_bytes"),
+        "pixels": record.get("pixels"),
+        "peak_rss": record.get("peak_rss"),
+        "color": record.get("color"),
+        "duplicate_of": record.get("duplicate_of"),
+        "animation": record.get("animation"),
+        "timings": record.get("timings", {}),
+        "outputs": [
+            {
+                "format": output["format"],
+                "width": output["width"],
+                "path": str(output["output_path"]),
+                "success": output["success"],
+                "bytes": output.get("output_bytes"),
+                "action": output.get("action", "encoded"),
+                "link": output.get("link"),
+                "reencode_bytes": output.get("reencode_bytes"),
+                "quality": output.get("quality"),
+                "search": output.get("search"),
+                "frames": output.get("frames"),
+                "timings": output.get("timings", {}),
+            }
+            for output in record.get("outputs", [])
+        ],
+    }
+
+
+@contextmanager
+def profile_run(directory: Path | None, profiler: str = "cprofile") -> Iterator[None]:
+    """Profile the enclosed block of the main process.
+
+    cProfile writes directory/main.prof; pyinstrument (if installed) writes
+    directory/main.html. Does nothing when directory is None.
+
+    Args:
+        directory: Directory for profile output, or None to disable
+        profiler: "cprofile" or "pyinstrument"
+    """
+    if directory is None:
+        yield
+        return
+
+    directory.mkdir(parents=True, exist_ok=True)
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler  # Optional dependency
+
+        session = Profiler()
+        session.start()
+        try:
+            yield
+        finally:
+            session.stop()
+            (directory / "main.html").write_text(session.output_html(), encoding="utf-8")
+    else:
+        session = cProfile.Profile()
+        session.enable()
+        try:
+            yield
+        finally:
+            session.disable()
+            session.dump_stats(directory / "main.prof")
+
+
+@contextmanager
+def profile_worker(directory: str | None) -> Iterator[None]:
+    """Accumulate a cProfile of this worker process across tasks.
+
+    The profile so far is written to directory/worker-<pid>.prof after each
+    task. Does nothing when directory is None.
+    """
+    global _worker_profiler
+    if directory is None:
+        yield
+        return
+
+    if _worker_profiler is None:
+        _worker_profiler = cProfile.Profile()
+    _worker_profiler.enable()
+    try:
+        yield
+    finally:
+        _worker_profiler.disable()
+        _worker_profiler.dump_stats(Path(directory) / f"worker-{os.getpid()}.prof")
+
+
+def load_report_summary(path: Path) -> Dict[str, Any]:
+    """Read the summary of a report written by RunReport.
+
+    Args:
+        path: Report file (.json, or .jsonl whose last line is the summary)
+
+    Returns:
+        Summary dictionary
+
+    Raises:
+        ValueError: If the file holds no report summary
+    """
+    if path.suffix.lower() == ".jsonl":
+        summary = None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn line from an interrupted run
+                if entry.get("type") == "summary":
+                    summary = entry
+    else:
+        summary = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(summary, dict) or summary.get("type") != "summary":
+        raise ValueError(f"{path} is not a run report")
+    return summary
+
+
+def merge_report_summaries(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine the summaries of several runs (e.g. shards) into one.
+
+    Counts, bytes and stage histograms are summed. Shards run side by side,
+    so the merged elapsed time is that of the slowest one.
+
+    Args:
+        summaries: Summaries from load_report_summary()
+
+    Returns:
+        Merged summary in the same layout, plus per-run elapsed times
+    """
+    merged: Dict[str, Any] = {
+        "type": "summary",
+        "runs": len(summaries),
+        "elapsed_s": max((s["elapsed_s"] for s in summaries), default=0.0),
+        "run_elapsed_s": [s["elapsed_s"] for s in summaries],
+        "results": {},
+        "errors": 0,
+        "input_bytes": 0,
+        "output_bytes": 0,
+        "pixels": 0,
+        "stages": {},
+    }
+    slowest = []
+    for summary in summaries:
+        merged["errors"] += summary.get("errors", 0)
+        for key in ("input_bytes", "output_bytes", "pixels"):
+            merged[key] += summary.get(key, 0)
+        for key, value in summary.get("results", {}).items():
+            if key == "formats":
+                formats = merged["results"].setdefault("formats", {})
+                for fmt, counts in value.items():
+                    totals = formats.setdefault(fmt, {"successes": 0, "failures": 0})
+                    for name, count in counts.items():
+                        totals[name] = totals.get(name, 0) + count
+            elif isinstance(value, (int, float)):
+                merged["results"][key] = merged["results"].get(key, 0) + value
+        for name, stage in summary.get("stages", {}).items():
+            total = merged["stages"].setdefault(
+                name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": {}}
+            )
+            total["count"] += stage["count"]
+            total["total_ms"] += stage["total_ms"]
+            total["max_ms"] = max(total["max_ms"], stage["max_ms"])
+            for label, count in stage["buckets"].items():
+                total["buckets"][label] = total["buckets"].get(label, 0) + count
+        slowest.extend(summary.get("slowest_files", []))
+
+    for stage in merged["stages"].values():
+        stage["total_ms"] = round(stage["total_ms"], 3)
+        stage["mean_ms"] = round(stage["total_ms"] / stage["count"], 3) if stage["count"] else 0.0
+    elapsed = merged["elapsed_s"]
+    merged["megapixels_per_s"] = round(merged["pixels"] / 1e6 / elapsed, 3) if elapsed else 0.0
+    if slowest:
+        merged["slowest_files"] = heapq.nlargest(
+            SLOWEST_FILES, slowest, key=lambda entry: entry["timings"].get("total", 0.0)
+        )
+    return merged
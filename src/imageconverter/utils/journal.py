@@ -0,0 +1,182 @@
+"""Append-only journal of completed conversions for resumable batches."""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set
+
+# Options that decide which outputs a batch produces; resuming with
+# different values would silently skip work, so it is refused
+JOURNAL_OPTION_KEYS = (
+    'format', 'sizes', 'quality', 'lossless', 'effort', 'output_dir',
+    'filename_pattern', 'mirror_root', 'passthrough', 'reencode_threshold',
+    'color_target', 'target_size', 'target_ssim',
+)
+
+# Buffered records are written out after this many files or seconds
+FLUSH_INTERVAL = 200
+FLUSH_SECONDS = 2.0
+
+JOURNAL_VERSION = 1
+
+
+def journal_options(options: Dict[str, Any]) -> Dict[str, Any]:
+    """Pick the output-affecting options recorded in a journal's run header."""
+    return {key: options.get(key) for key in JOURNAL_OPTION_KEYS}
+
+
+def iter_journal(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a journal, skipping a torn final line.
+
+    Args:
+        path: Journal file
+
+    Yields:
+        Run headers ({"run": ...}) and file records, in order
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial line from a killed run
+
+
+def is_journal(path: Path) -> bool:
+    """Whether a file is a journal (it starts with a run header)."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return 'run' in json.loads(f.readline())
+    except (OSError, ValueError, TypeError):
+        return False
+
+
+def summarize_journal(path: Path) -> Dict[str, Any]:
+    """Summarize a journal by streaming it, in constant memory.
+
+    Args:
+        path: Journal file
+
+    Returns:
+        Dictionary with runs, completed (files converted across all runs),
+        failures (failed files in the latest run), output_bytes and
+        duration (summed conversion seconds)
+    """
+    summary = {'runs': 0, 'completed': 0, 'failures': 0, 'output_bytes': 0, 'duration': 0.0}
+    for entry in iter_journal(path):
+        if 'run' in entry:
+            summary['runs'] += 1
+            summary['failures'] = 0
+            continue
+        if entry['status'] == 'ok':
+            summary['completed'] += 1
+        else:
+            summary['failures'] += 1
+        summary['output_bytes'] += entry.get('bytes', 0)
+        summary['duration'] += entry.get('duration', 0.0)
+    summary['duration'] = round(summary['duration'], 3)
+    return summary
+
+
+class Journal:
+    """Append-only JSONL record of every file a batch finishes.
+
+    Each finished file appends one compact line (input, outputs, status,
+    bytes, duration). Lines are buffered and written in batches, so a
+    crash loses at most the last few seconds of progress. Resuming reads
+    the journal back and skips inputs that already converted successfully,
+    without touching their outputs.
+    """
+
+    def __init__(self, path: Path, options: Dict[str, Any], resume: bool = False) -> None:
+        """Open the journal, starting a new run.
+
+        Args:
+            path: Journal file
+            options: Batch options; their output-affecting subset is
+                recorded and must match when resuming
+            resume: Continue an existing journal instead of replacing it
+
+        Raises:
+            ValueError: If resuming a journal written with different options
+        """
+        self.path = path
+        self.completed: Set[str] = set()
+        run_options = journal_options(options)
+
+        if resume and path.exists():
+            for entry in iter_journal(path):
+                if 'run' in entry:
+                    if entry['options'] != run_options:
+                        raise ValueError(
+                            f"Journal {path} was written with different options; "
+                            "rerun them unchanged or start a new journal"
+                        )
+                elif entry['status'] == 'ok':
+                    self.completed.add(entry['input'])
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self._file.tell() and not self._ends_with_newline(path):
+            self._file.write('\n')  # Terminate a torn final line
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._write({'run': JOURNAL_VERSION, 'started': time.time(), 'options': run_options})
+        self.flush()
+
+    def is_completed(self, input_path: Path) -> bool:
+        """Whether a previous run already converted this input."""
+        return os.path.abspath(input_path) in self.completed
+
+    def record(self, input_path: Path, file_record: Dict[str, Any]) -> None:
+        """Append a finished file.
+
+        Args:
+            input_path: Input image path
+            file_record: Result record from the converter
+        """
+        outputs = file_record.get('outputs', [])
+        entry = {
+            'input': os.path.abspath(input_path),
+            'outputs': [str(output['output_path']) for output in outputs if output['success']],
+            'status': 'ok' if file_record['success'] else 'failed',
+            'bytes': sum(output.get('output_bytes') or 0 for output in outputs),
+            'duration': round(file_record.get('timings', {}).get('total', 0.0), 4),
+        }
+        if not file_record['success']:
+            entry['error'] = file_record['message']
+        self._write(entry)
+
+    @staticmethod
+    def _ends_with_newline(path: Path) -> bool:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._buffer.append(json.dumps(entry, separators=(',', ':')))
+        if (
+            len(self._buffer) >= FLUSH_INTERVAL
+            or time.monotonic() - self._last_flush >= FLUSH_SECONDS
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered records to the journal file."""
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer.clear()
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Flush buffered records and close the journal."""
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
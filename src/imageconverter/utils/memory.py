@@ -0,0 +1,79 @@
+"""Process memory measurement utilities."""
+
+import math
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PROC_STATUS = "/proc/self/status"
+_PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def reset_peak_rss() -> bool:
+    """Reset this process's peak RSS counter so the next reading is per job.
+
+    Only Linux supports this (by writing "5" to /proc/self/clear_refs).
+
+    Returns:
+        True if the counter was reset
+    """
+    try:
+        with open(_PROC_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int | None:
+    """Get the peak resident set size of this process in bytes.
+
+    On Linux this is VmHWM, which reset_peak_rss() can rewind. Elsewhere it
+    is the lifetime peak from getrusage().
+
+    Returns:
+        Peak RSS in bytes, or None if it cannot be measured
+    """
+    try:
+        with open(_PROC_STATUS) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def parse_size(value: str) -> int:
+    """Parse a human-readable byte size such as "512M", "8G" or "1048576".
+
+    Args:
+        value: Size with an optional K/M/G/T suffix (powers of 1024)
+
+    Returns:
+        Size in bytes
+
+    Raises:
+        ValueError: If the value cannot be parsed, or is not finite and positive
+    """
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    text = value.strip().upper().removesuffix("B").removesuffix("I")
+    multiplier = 1
+    if text and text[-1] in units:
+        multiplier = units[text[-1]]
+        text = text[:-1]
+    number = float(text)
+    if not math.isfinite(number) or number <= 0:
+        raise ValueError(f"Size must be a positive number: {value}")
+    size = int(number * multiplier)
+    if size <= 0:
+        raise ValueError(f"Size must be positive: {value}")
+    return size
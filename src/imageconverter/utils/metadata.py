@@ -1,8 +1,28 @@
 """Metadata extraction and preservation utilities."""
 
+import struct
 from pathlib import Path
 from typing import Dict, Any
 from PIL import Image
+from .output import OutputWriter
+
+
+# Metadata keys each output format accepts as Image.save() parameters
+SAVE_METADATA_KEYS = {
+    'webp': ('exif', 'icc_profile'),
+    'jpeg': ('exif', 'icc_profile', 'dpi'),
+    'png': ('exif', 'icc_profile', 'dpi'),
+    'avif': ('exif', 'icc_profile'),
+    'jpeg-xl': ('icc_profile',),
+}
+
+# Formats whose EXIF is inserted into the encoded container by splice_metadata()
+SPLICE_EXIF_FORMATS = {'jpeg-xl'}
+
+# JPEG XL container signature box and file-type box (ISO/IEC 18181-2)
+_JXL_CODESTREAM_MAGIC = b'\xff\x0a'
+_JXL_SIGNATURE_BOX = b'\x00\x00\x00\x0cJXL \r\n\x87\n'
+_JXL_FTYP_BOX = b'\x00\x00\x00\x14ftypjxl \x00\x00\x00\x00jxl '
 
 
 def extract_metadata(image: Image.Image) -> Dict[str, Any]:
@@ -17,9 +37,7 @@ def extract_metadata(image: Image.Image) -> Dict[str, Any]:
     metadata = {}
 
     # Extract EXIF data
-    if hasattr(image, '_getexif') and image._getexif():
-        metadata['exif'] = image.info.get('exif', b'')
-    elif 'exif' in image.info:
+    if image.info.get('exif'):
         metadata['exif'] = image.info['exif']
 
     # Extract other metadata
@@ -30,23 +48,114 @@ def extract_metadata(image: Image.Image) -> Dict[str, Any]:
     return metadata
 
 
-def apply_metadata(output_path: Path, metadata: Dict[str, Any]) -> None:
-    """Apply metadata to a saved image.
+def metadata_save_kwargs(metadata: Dict[str, Any], output_format: str) -> Dict[str, Any]:
+    """Select the metadata an encoder can embed during its single save.
+
+    Args:
+        metadata: Metadata dictionary from extract_metadata()
+        output_format: Output format (webp, jpeg, jpeg-xl, avif, png)
+
+    Returns:
+        Dictionary of kwargs to merge into Image.save()
+    """
+    return {
+        key: metadata[key]
+        for key in SAVE_METADATA_KEYS.get(output_format, ())
+        if metadata.get(key)
+    }
+
+
+def splice_metadata(data: bytes, metadata: Dict[str, Any], output_format: str) -> bytes:
+    """Insert metadata the encoder could not take into already-encoded bytes.
+
+    This works at the container level and never touches pixel data.
+
+    Args:
+        data: Encoded image bytes
+        metadata: Metadata dictionary from extract_metadata()
+        output_format: Output format (webp, jpeg, jpeg-xl, avif, png)
+
+    Returns:
+        Encoded image bytes with the metadata inserted
+    """
+    exif = metadata.get('exif')
+    if exif and output_format in SPLICE_EXIF_FORMATS:
+        data = _splice_jxl_exif(data, exif)
+    return data
+
+
+def needs_splice(metadata: Dict[str, Any], output_format: str) -> bool:
+    """Check whether splice_metadata() has anything to add for a format."""
+    return bool(metadata.get('exif')) and output_format in SPLICE_EXIF_FORMATS
+
+
+def _iter_boxes(data: bytes):
+    """Yield (box_type, start, end) for each top-level ISO BMFF box."""
+    pos = 0
+    while pos + 8 <= len(data):
+        size, box_type = struct.unpack('>I4s', data[pos:pos + 8])
+        if size == 1:
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+        elif size == 0:
+            size = len(data) - pos
+        if size < 8:
+            return
+        yield box_type, pos, pos + size
+        pos += size
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    """Build an ISO BMFF box."""
+    return struct.pack('>I4s', len(payload) + 8, box_type) + payload
+
+
+def _splice_jxl_exif(data: bytes, exif: bytes) -> bytes:
+    """Add an Exif box to a JPEG XL file, wrapping a bare codestream if needed."""
+    if exif.startswith(b'Exif\x00\x00'):
+        exif = exif[6:]
+    # Exif box payload: offset to the TIFF header, then the TIFF data
+    exif_box = _box(b'Exif', b'\x00\x00\x00\x00' + exif)
+
+    if data.startswith(_JXL_CODESTREAM_MAGIC):
+        return _JXL_SIGNATURE_BOX + _JXL_FTYP_BOX + exif_box + _box(b'jxlc', data)
+
+    if not data.startswith(_JXL_SIGNATURE_BOX):
+        return data
+
+    insert_at = None
+    for box_type, _, end in _iter_boxes(data):
+        if box_type == b'Exif':
+            return data  # Encoder already embedded it
+        if box_type in (b'JXL ', b'ftyp', b'jxll'):
+            insert_at = end
+    if insert_at is None:
+        return data
+    return data[:insert_at] + exif_box + data[insert_at:]
+
+
+def apply_metadata(
+    output_path: Path, metadata: Dict[str, Any], output_format: str | None = None
+) -> None:
+    """Apply metadata to a saved image without re-encoding it.
+
+    Other formats take their metadata in the save itself (see
+    metadata_save_kwargs()), so only JPEG XL outputs are changed.
 
     Args:
         output_path: Path to the saved image
         metadata: Metadata dictionary from extract_metadata()
+        output_format: Format the image was saved in (default: detected
+            from the file's signature)
     """
-    if not metadata:
+    if not metadata.get('exif'):
+        return
+
+    data = output_path.read_bytes()
+    if output_format is None:
+        is_jxl = data.startswith((_JXL_CODESTREAM_MAGIC, _JXL_SIGNATURE_BOX))
+        output_format = 'jpeg-xl' if is_jxl else ''
+    if not needs_splice(metadata, output_format):
         return
 
-    try:
-        with Image.open(output_path) as img:
-            # Apply EXIF if present
-            if 'exif' in metadata and metadata['exif']:
-                # Need to save with exif parameter
-                img.save(output_path, exif=metadata['exif'])
-    except Exception:
-        # Silently fail if metadata cannot be applied
-        # (some formats don't support EXIF)
-        pass
+    # Replace the file atomically, so a crash never leaves it half-rewritten
+    OutputWriter().write_bytes(output_path, splice_metadata(data, metadata, output_format))
@@ -1,7 +1,11 @@
 """Path handling utilities."""
 
 from pathlib import Path
+from string import Formatter
+from typing import Dict, Set, Tuple
+import os
 import platform
+import threading
 
 
 def get_config_dir() -> Path:
@@ -40,3 +44,145 @@ def ensure_dir_exists(path: Path) -> None:
         path: Directory path to ensure exists
     """
     path.mkdir(parents=True, exist_ok=True)
+
+
+# Fields available to filename patterns
+PATTERN_FIELDS = frozenset({"stem", "parent", "w", "h", "hash8"})
+
+
+class OutputPathAllocator:
+    """Hands out unique output paths without probing the filesystem per file.
+
+    Each output directory is listed once, the first time a name is
+    allocated in it; after that, collisions are resolved against an
+    in-memory set, with a per-name counter so thousands of inputs sharing
+    a stem cost O(1) each rather than one stat() per "_N" candidate.
+    Allocation is guarded by a lock, so threads can share an allocator.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        pattern: str | None = None,
+        mirror_root: Path | None = None,
+    ) -> None:
+        """Initialize the allocator.
+
+        Args:
+            output_dir: Output directory
+            pattern: Filename template (without extension) using {stem},
+                {parent}, {w}, {h} and {hash8}, e.g. "{parent}_{stem}_{w}x{h}".
+                None = "{stem}"
+            mirror_root: Input root whose subfolder structure is mirrored
+                under output_dir (None = write everything into output_dir)
+
+        Raises:
+            ValueError: If the pattern is malformed or uses unknown fields
+        """
+        self.output_dir = output_dir
+        self.pattern = pattern or "{stem}"
+        self.mirror_root = Path(os.path.abspath(mirror_root)) if mirror_root else None
+        self.fields = self._parse_pattern(self.pattern)
+        self._taken: Dict[Path, Set[str]] = {}
+        self._counters: Dict[Tuple[Path, str], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse_pattern(pattern: str) -> Set[str]:
+        """Validate a filename pattern and return the fields it uses."""
+        try:
+            fields = {name for _, name, _, _ in Formatter().parse(pattern) if name is not None}
+        except ValueError as e:
+            raise ValueError(f"Invalid filename pattern {pattern!r}: {e}")
+        unknown = fields - PATTERN_FIELDS
+        if unknown:
+            raise ValueError(
+                f"Unknown filename pattern field(s): {', '.join(sorted(unknown))} "
+                f"(available: {', '.join(sorted(PATTERN_FIELDS))})"
+            )
+        if "" in fields or Path(pattern).is_absolute() or ".." in Path(pattern).parts:
+            raise ValueError(f"Invalid filename pattern {pattern!r}")
+        return fields
+
+    @property
+    def needs_size(self) -> bool:
+        """Whether the pattern needs the output's dimensions ({w}/{h})."""
+        return bool(self.fields & {"w", "h"})
+
+    @property
+    def needs_hash(self) -> bool:
+        """Whether the pattern needs the input's content hash ({hash8})."""
+        return "hash8" in self.fields
+
+    def allocate(
+        self,
+        input_path: Path,
+        ext: str,
+        width: int | None = None,
+        size: Tuple[int, int] | None = None,
+        content_hash: str | None = None,
+    ) -> Path:
+        """Reserve a unique output path for an input.
+
+        Args:
+            input_path: Input image path
+            ext: Output extension including the dot
+            width: Width of a resized variant; "_{width}w" is added to the
+                name unless the pattern already contains {w}
+            size: Output (width, height), required if the pattern uses {w}/{h}
+            content_hash: Input content hash, required if the pattern uses {hash8}
+
+        Returns:
+            Output file path, not yet created
+        """
+        w, h = size or (None, None)
+        stem = self.pattern.format(
+            stem=input_path.stem,
+            parent=input_path.parent.name,
+            w=w,
+            h=h,
+            hash8=(content_hash or "")[:8],
+        )
+        if width is not None and "w" not in self.fields:
+            stem = f"{stem}_{width}w"
+
+        directory = self.output_dir
+        if self.mirror_root is not None:
+            try:
+                relative = Path(os.path.abspath(input_path.parent)).relative_to(self.mirror_root)
+                directory = directory / relative
+            except ValueError:
+                pass  # Outside the mirrored tree; write to the top level
+        # The pattern may itself contain subfolders, e.g. "{parent}/{stem}"
+        directory = (directory / stem).parent
+        name = Path(stem).name
+
+        with self._lock:
+            taken = self._taken_in(directory)
+            candidate = f"{name}{ext}"
+            if os.path.normcase(candidate) in taken:
+                key = (directory, os.path.normcase(f"{name}{ext}"))
+                counter = self._counters.get(key, 1)
+                while os.path.normcase(f"{name}_{counter}{ext}") in taken:
+                    counter += 1
+                self._counters[key] = counter + 1
+                candidate = f"{name}_{counter}{ext}"
+            taken.add(os.path.normcase(candidate))
+        return directory / candidate
+
+    def reserve(self, path: Path) -> None:
+        """Mark a path as taken, e.g. an output being overwritten in place."""
+        with self._lock:
+            self._taken_in(path.parent).add(os.path.normcase(path.name))
+
+    def _taken_in(self, directory: Path) -> Set[str]:
+        """Names taken in a directory, listing it on first use (lock held)."""
+        taken = self._taken.get(directory)
+        if taken is None:
+            try:
+                with os.scandir(directory) as entries:
+                    taken = {os.path.normcase(entry.name) for entry in entries}
+            except OSError:
+                taken = set()  # Not created yet
+            self._taken[directory] = taken
+        return taken
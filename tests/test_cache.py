@@ -0,0 +1,43 @@
+"""Tests for the incremental conversion cache's reuse of output paths."""
+
+from pathlib import Path
+
+import pytest
+
+from imageconverter.utils.cache import ConversionCache, options_key
+
+
+def test_encode_option_change_reuses_output(tmp_path: Path) -> None:
+    source = tmp_path / 'a.png'
+    source.write_bytes(b'png')
+    output = tmp_path / 'out' / 'a.webp'
+    output.parent.mkdir()
+    output.write_bytes(b'webp')
+    options = {'format': 'webp', 'output_dir': str(tmp_path / 'out'), 'quality': 80}
+    cache = ConversionCache(tmp_path / 'cache.sqlite3')
+    cache.store(source, options_key(options), source.stat(), 'hash', output)
+
+    # Another quality misses, but names the output to overwrite
+    lowered = options_key({**options, 'quality': 70})
+    up_to_date, entry = cache.check(source, lowered, source.stat())
+    assert not up_to_date
+    assert entry is not None and entry.output_path == output
+
+    # Another format goes elsewhere
+    other_format = options_key({**options, 'format': 'avif'})
+    up_to_date, entry = cache.check(source, other_format, source.stat())
+    assert not up_to_date and entry is None
+
+    # Once overwritten, the entry for the old quality no longer matches the file
+    cache.store(source, lowered, source.stat(), 'hash', output)
+    assert cache.lookup(source, options_key(options)) is None
+    cache.close()
+
+
+def test_output_dir_is_keyed_by_resolved_path(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    assert options_key({'output_dir': 'out'}) == options_key({'output_dir': './out'})
+    absolute = str(tmp_path / 'out')
+    assert options_key({'output_dir': 'out'}) == options_key({'output_dir': absolute})
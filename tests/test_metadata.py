@@ -0,0 +1,80 @@
+"""Tests for single-pass metadata preservation and the JPEG XL Exif splice."""
+
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from PIL import Image, ImageCms
+
+from imageconverter.core.converter import ImageConverter, OutputTarget
+from imageconverter.utils.metadata import _iter_boxes, splice_metadata
+
+CAMERA_MAKE = 'TestMake'
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    """A JPEG carrying EXIF, an ICC profile and a DPI."""
+    exif = Image.Exif()
+    exif[0x010F] = CAMERA_MAKE  # Make
+    icc = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    path = tmp_path / 'source.jpg'
+    Image.new('RGB', (64, 48), (200, 120, 40)).save(
+        path, exif=exif.tobytes(), icc_profile=icc, dpi=(300, 300)
+    )
+    return path
+
+
+@pytest.mark.parametrize('output_format', ['jpeg', 'png', 'webp'])
+def test_one_encode_per_output(source: Path, tmp_path: Path, output_format: str) -> None:
+    targets = [
+        OutputTarget(output_format, tmp_path / f'full.{output_format}'),
+        OutputTarget(output_format, tmp_path / f'small.{output_format}', 32),
+    ]
+    original_save = Image.Image.save
+    with mock.patch.object(
+        Image.Image, 'save', autospec=True, side_effect=original_save
+    ) as save:
+        record = ImageConverter().convert_multi(source, targets)
+
+    assert record['success'], record['message']
+    assert save.call_count == len(targets)
+    for target in targets:
+        with Image.open(target.path) as img:
+            assert img.getexif().get(0x010F) == CAMERA_MAKE
+            assert img.info.get('icc_profile')
+            if output_format != 'webp':  # WebP has no resolution field
+                assert tuple(round(value) for value in img.info['dpi']) == (300, 300)
+
+
+def test_splice_wraps_bare_jxl_codestream() -> None:
+    codestream = b'\xff\x0a' + b'\x00' * 16
+    data = splice_metadata(codestream, {'exif': b'Exif\x00\x00II*\x00'}, 'jpeg-xl')
+
+    boxes = [(box_type, data[start:end]) for box_type, start, end in _iter_boxes(data)]
+    assert [box_type for box_type, _ in boxes] == [b'JXL ', b'ftyp', b'Exif', b'jxlc']
+    # Exif payload: 4-byte TIFF header offset, then the TIFF data without "Exif\0\0"
+    assert boxes[2][1][8:] == b'\x00\x00\x00\x00II*\x00'
+    assert boxes[3][1][8:] == codestream
+
+
+def test_splice_inserts_exif_after_container_header() -> None:
+    unchanged = splice_metadata(b'\xff\x0a' + b'\x00' * 16, {}, 'jpeg-xl')
+    assert unchanged.startswith(b'\xff\x0a')  # Nothing to add: left untouched
+
+    wrapped = splice_metadata(b'\xff\x0a' + b'\x00' * 16, {'exif': b'II*\x00'}, 'jpeg-xl')
+    without_exif = b''.join(
+        wrapped[start:end] for box_type, start, end in _iter_boxes(wrapped)
+        if box_type != b'Exif'
+    )
+    data = splice_metadata(without_exif, {'exif': b'II*\x00'}, 'jpeg-xl')
+    assert [box_type for box_type, _, _ in _iter_boxes(data)] == [
+        b'JXL ', b'ftyp', b'Exif', b'jxlc'
+    ]
+    # An Exif box the encoder already wrote is kept as is
+    assert splice_metadata(data, {'exif': b'MM\x00*'}, 'jpeg-xl') == data
+
+
+def test_splice_leaves_other_formats_alone() -> None:
+    data = b'RIFF\x00\x00\x00\x00WEBP'
+    assert splice_metadata(data, {'exif': b'II*\x00'}, 'webp') == data
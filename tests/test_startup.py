@@ -0,0 +1,56 @@
+"""Tests that the CLI starts without importing Pillow, rich.progress or format plugins."""
+
+import statistics
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+# Modules "imgconvert --help" must not import (they are loaded once a command runs)
+DEFERRED = ('PIL', 'rich.progress', 'pillow_heif', 'pillow_jxl')
+
+# Cumulative import time allowed for imageconverter.cli: twice the 150 ms
+# start-up budget the bench checks (see README), so slow CI machines pass
+# while a new heavy import at start-up still fails
+IMPORT_BUDGET_MS = 300
+
+
+def _import_times(*args: str) -> Dict[str, int]:
+    """Run Python with -X importtime and map each imported module to its cumulative µs."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3:
+            try:
+                times[fields[2].strip()] = int(fields[1])
+            except ValueError:  # The column header line
+                continue
+    return times
+
+
+@pytest.mark.parametrize('args', [
+    ('-c', 'import imageconverter.cli'),
+    ('-m', 'imageconverter.cli', '--help'),
+], ids=['import', 'help'])
+def test_cli_startup_defers_heavy_imports(args: tuple) -> None:
+    modules = _import_times(*args)
+    assert 'imageconverter' in modules  # The -X importtime output was parsed
+    loaded = [
+        name for name in modules
+        if any(name == prefix or name.startswith(prefix + '.') for prefix in DEFERRED)
+    ]
+    assert not loaded, f"imported at start-up: {', '.join(loaded)}"
+
+
+def test_cli_import_time_within_budget() -> None:
+    # Median of a few runs, so one slow run (cold caches) does not fail it
+    runs = [_import_times('-c', 'import imageconverter.cli') for _ in range(3)]
+    import_ms = statistics.median(times['imageconverter.cli'] for times in runs) / 1000
+    assert import_ms <= IMPORT_BUDGET_MS, (
+        f"importing imageconverter.cli took {import_ms:.0f} ms (budget {IMPORT_BUDGET_MS} ms)"
+    )
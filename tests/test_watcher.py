@@ -0,0 +1,81 @@
+"""Tests for the hot-folder watcher's handling of files that vanish mid-conversion."""
+
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+from PIL import Image
+
+from imageconverter.core.converter import ImageConverter
+from imageconverter.core.watcher import FolderWatcher
+
+
+def _watch_once(watcher: FolderWatcher) -> None:
+    """Poll once and wait for the conversions it started."""
+    watcher.poll()
+    watcher.close()
+
+
+@pytest.fixture
+def watched(tmp_path: Path) -> Path:
+    """A watched folder holding one image."""
+    root = tmp_path / 'in'
+    root.mkdir()
+    Image.new('RGB', (32, 32), 'red').save(root / 'a.png')
+    return root
+
+
+def test_file_deleted_before_conversion(
+    watched: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    results: Dict[str, Dict[str, Any]] = {}
+    options = {
+        'output_dir': str(tmp_path / 'out'),
+        'format': 'webp',
+        'filename_pattern': '{stem}_{hash8}',  # The watcher hashes the input itself
+    }
+    watcher = FolderWatcher(
+        watched, options, workers=1, settle_time=0,
+        on_result=lambda path, record: results.__setitem__(path.name, record),
+    )
+    # The file is listed by the scan, then deleted before it is converted
+    snapshot = watcher.scan()
+    (watched / 'a.png').unlink()
+    monkeypatch.setattr(watcher, 'scan', lambda: snapshot)
+    _watch_once(watcher)
+
+    assert not results['a.png']['success']
+    assert watcher.stats()['failed'] == 1
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != 'fork',
+    reason="the patched converter only reaches forked workers",
+)
+def test_file_deleted_during_conversion(
+    watched: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    convert_multi = ImageConverter.convert_multi
+
+    def convert_then_delete(self: ImageConverter, input_path: Path, *args: Any) -> Any:
+        record = convert_multi(self, input_path, *args)
+        Path(input_path).unlink()  # Gone before --incremental hashes it
+        return record
+
+    monkeypatch.setattr(ImageConverter, 'convert_multi', convert_then_delete)
+    results: Dict[str, Dict[str, Any]] = {}
+    options = {
+        'output_dir': str(tmp_path / 'out'),
+        'format': 'webp',
+        'incremental': True,
+        'cache_path': tmp_path / 'cache.sqlite3',
+    }
+    watcher = FolderWatcher(
+        watched, options, workers=1, settle_time=0,
+        on_result=lambda path, record: results.__setitem__(path.name, record),
+    )
+    _watch_once(watcher)
+
+    assert not results['a.png']['success']
+    assert watcher.stats()['failed'] == 1